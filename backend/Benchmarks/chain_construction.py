@@ -0,0 +1,127 @@
+"""
+Micro-benchmark of the per-request chain construction removed by Chains/registry.py.
+
+Before the registry, every graph QA request built a FewShotPromptTemplate and a
+GraphCypherQAChain, and every vector search request built a RetrievalQA chain. This builds the
+same objects with the same arguments against a fake LLM, graph and embeddings (no OpenAI or Neo4j
+needed) and compares that with fetching the shared instances from a ChainRegistry.
+
+Usage (in the backend folder):
+    python -m Benchmarks.chain_construction --requests 200
+"""
+import argparse
+import statistics
+import time
+
+from langchain.chains.retrieval_qa.base import RetrievalQA
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.example_selectors import MaxMarginalRelevanceExampleSelector
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.prompts import FewShotPromptTemplate, PromptTemplate
+from langchain_core.vectorstores import InMemoryVectorStore
+from langchain_neo4j.chains.graph_qa.cypher import GraphCypherQAChain
+
+from Chains.registry import ChainRegistry, GRAPH_QA_CHAIN, GRAPH_QA_CHAIN_WITH_CONTEXT, VECTOR_GRAPH_CHAIN
+from Prompts.prompt_examples import examples
+
+
+class FakeGraph:
+    """Minimal GraphStore with a fixed schema."""
+
+    schema = "Node properties: Publication {omid: STRING, title: STRING, year: INTEGER}, Author {name: STRING}"
+    structured_schema = {"node_props": {}, "rel_props": {}, "relationships": [], "metadata": {}}
+
+    @property
+    def get_schema(self):
+        return self.schema
+
+    @property
+    def get_structured_schema(self):
+        return self.structured_schema
+
+    def query(self, query, params={}):
+        return []
+
+    def refresh_schema(self):
+        pass
+
+    def add_graph_documents(self, graph_documents, include_source=False):
+        pass
+
+
+llm = FakeListChatModel(responses=["MATCH (p:Publication) RETURN p.title"])
+graph = FakeGraph()
+embeddings = DeterministicFakeEmbedding(size=256)
+example_selector = MaxMarginalRelevanceExampleSelector.from_examples(
+    examples=examples, embeddings=embeddings, vectorstore_cls=InMemoryVectorStore, k=5, input_keys=["question"],
+)
+example_prompt = PromptTemplate(input_variables=["question", "query"], template="Question: {question}\nCypher query: {query}")
+vector_store = InMemoryVectorStore.from_texts(["title: A\nvenue: B", "title: C\nvenue: D"], embeddings)
+
+
+def build_prompt(prefix, input_variables):
+    return FewShotPromptTemplate(
+        example_selector=example_selector,
+        example_prompt=example_prompt,
+        prefix=prefix,
+        suffix="Question: {question}, \nCypher Query: ",
+        input_variables=input_variables,
+    )
+
+
+def build_graph_qa_chain(prompt):
+    return GraphCypherQAChain.from_llm(
+        cypher_llm=llm, qa_llm=llm, validate_cypher=True, graph=graph, verbose=False, cypher_prompt=prompt,
+        return_intermediate_steps=True, top_k=10, return_direct=True, allow_dangerous_requests=True,
+    )
+
+
+def build_vector_graph_chain():
+    return RetrievalQA.from_chain_type(
+        llm, chain_type="stuff", retriever=vector_store.as_retriever(search_kwargs={"k": 3}),
+        verbose=False, return_source_documents=True,
+    )
+
+
+def per_request_construction():
+    '''What one graph QA, one graph QA with context and one vector search request used to build'''
+    build_graph_qa_chain(build_prompt("Task: Generate Cypher.\n", ["question", "query"]))
+    build_graph_qa_chain(build_prompt("Task: Generate Cypher.\nContext: ['omid: omid:br/1, title: A']\n", ["question", "query"]))
+    build_vector_graph_chain()
+
+
+def registry_lookup(registry):
+    registry.get(GRAPH_QA_CHAIN)
+    registry.get(GRAPH_QA_CHAIN_WITH_CONTEXT)
+    registry.get(VECTOR_GRAPH_CHAIN)
+
+
+def measure(function, requests):
+    '''Return per-request timings in microseconds'''
+    timings = []
+    for _ in range(requests):
+        start_time = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start_time) * 1e6)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-request chain construction with the chain registry.")
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    registry = ChainRegistry()
+    registry.register(GRAPH_QA_CHAIN, lambda: build_graph_qa_chain(build_prompt("Task: Generate Cypher.\n", ["question", "query"])))
+    registry.register(GRAPH_QA_CHAIN_WITH_CONTEXT, lambda: build_graph_qa_chain(build_prompt("Task: Generate Cypher.\nContext: {context}\n", ["question", "query", "context"])))
+    registry.register(VECTOR_GRAPH_CHAIN, build_vector_graph_chain)
+    registry_lookup(registry)  # first build, as on the first request
+
+    for label, timings in (("per-request construction", measure(per_request_construction, args.requests)),
+                           ("registry lookup", measure(lambda: registry_lookup(registry), args.requests))):
+        print(f"{label:>25}: mean {statistics.mean(timings):10.1f} us, "
+              f"median {statistics.median(timings):10.1f} us, max {max(timings):10.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark of the Cypher auto-parameterization in Tools/cypher_parameters.py.
+
+Builds a realistic mix of generated queries: the patterns of Prompts/prompt_examples.py with
+their placeholder authors, titles, venues, publishers and years replaced by values sampled from
+the sampled metadata CSV. Without parameterization every distinct value is a new query string
+that Neo4j has to plan; with it the mix collapses to one template per pattern.
+
+Always reports the number of distinct query strings (query plans) and the cost of the rewrite.
+With --neo4j it also EXPLAINs the mix against the database in both forms, after clearing the
+query caches, and compares the server-side planning time (result_available_after of EXPLAIN).
+
+Usage (in the backend folder):
+    python -m Benchmarks.parameterization --queries 1000
+    python -m Benchmarks.parameterization --queries 1000 --neo4j
+"""
+import argparse
+import csv
+import os
+import random
+import statistics
+import time
+
+from dotenv import load_dotenv
+
+from Prompts.prompt_examples import examples
+from Tools.cypher_parameters import parameterize
+
+load_dotenv()
+
+METADATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "graph_database_setup",
+                             "sampled_citations_metadata_clean.csv")
+# The loader splits authors on ';' (graph_database_setup/bulk_loader.py)
+AUTHOR_SEPARATOR = ";"
+PLACEHOLDERS = {"'Author Name'": "author", "'Publication Title'": "title", "'Venue Name'": "venue",
+                "'Publisher Name'": "publisher", "2020": "year", "2010": "year"}
+# Shapes the prompt examples do not cover, whose numbers must stay inline: Neo4j rejects parameters in them
+INLINE_PATTERNS = [
+    ("MATCH (p:Publication {title: 'Publication Title'})-[:CITED]->{1,3}(q:Publication) "
+     "WHERE q.year > 2010 RETURN DISTINCT q.title LIMIT 10", "{1,3}"),
+    ("MATCH (a:Author {name: 'Author Name'})-[:AUTHORED]->(p:Publication) ((:Publication)-[:CITED]->(:Publication)){2} "
+     "RETURN count(*)", "{2}"),
+    ("MATCH (p:Publication {venue: 'Venue Name'})<-[:CITED]-{1,}(q:Publication) RETURN q.title SKIP 5 LIMIT 10", "{1,}"),
+    ("MATCH (p:Publication {title: 'Publication Title'})-[:CITED*1..3]->(q:Publication) WHERE q.year = 2020 RETURN q.title", "*1..3"),
+]
+# Number literals in other bases, lifted with their value (the query must still parse)
+NUMBER_LITERALS = [("0x7E4", 2020), ("0X7e4", 2020), ("0o3744", 2020)]
+
+
+def metadata_values(path=METADATA_FILE):
+    '''Distinct authors, titles, venues, publishers and years of the sampled metadata'''
+    values = {"author": set(), "title": set(), "venue": set(), "publisher": set(), "year": set()}
+    with open(path, newline="", encoding="utf-8") as file:
+        for row in csv.DictReader(file):
+            values["author"].update(name.strip() for name in row["author"].split(AUTHOR_SEPARATOR) if name.strip())
+            for column in ("title", "venue", "publisher"):
+                if row[column]:
+                    values[column].add(row[column])
+            if row["pub_year"]:
+                values["year"].add(int(float(row["pub_year"])))
+    return {column: sorted(found) for column, found in values.items()}
+
+
+def cypher_string(value):
+    return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+def query_mix(count, values, seed=0):
+    '''Generated-looking queries: random prompt example patterns filled with random metadata values'''
+    rng = random.Random(seed)
+    patterns = [example["query"] for example in examples] + [pattern for pattern, _ in INLINE_PATTERNS]
+    queries = []
+    for _ in range(count):
+        query = rng.choice(patterns)
+        for placeholder, column in PLACEHOLDERS.items():
+            while placeholder in query:
+                value = rng.choice(values[column])
+                query = query.replace(placeholder, str(value) if column == "year" else cypher_string(value), 1)
+        queries.append(query)
+    return queries
+
+
+def explain_mix(driver, queries, parameterized):
+    '''Server planning time (ms) of each query EXPLAINed in order, after clearing the query caches'''
+    driver.execute_query("CALL db.clearQueryCaches()")
+    timings = []
+    for query in queries:
+        params = {}
+        if parameterized:
+            query, params = parameterize(query)
+        _, summary, _ = driver.execute_query(f"EXPLAIN {query}", params)
+        timings.append(summary.result_available_after)
+    return timings
+
+
+def report(label, timings):
+    print(f"{label:>20}: total {sum(timings):8.0f} ms, mean {statistics.mean(timings):6.2f} ms, "
+          f"median {statistics.median(timings):6.2f} ms, max {max(timings):6.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the query plans saved by parameterizing generated Cypher.")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--neo4j", action="store_true", help="Also compare planning time on the database (NEO4J_* variables)")
+    args = parser.parse_args()
+
+    queries = query_mix(args.queries, metadata_values(), args.seed)
+    start_time = time.perf_counter()
+    templates = [parameterize(query)[0] for query in queries]
+    rewrite_us = (time.perf_counter() - start_time) / len(queries) * 1e6
+    print(f"{len(queries)} queries from {len(examples)} patterns")
+    print(f"  distinct query strings: {len(set(queries))} with literals, {len(set(templates))} parameterized")
+    print(f"  parameterize(): {rewrite_us:.1f} us per query")
+    lifted = [inline for pattern, inline in INLINE_PATTERNS if inline not in parameterize(pattern)[0]]
+    print(f"  quantifiers and ranges kept inline: {'yes' if not lifted else 'no, lifted in ' + ', '.join(lifted)}")
+    misread = [literal for literal, value in NUMBER_LITERALS
+               if parameterize(f"MATCH (p:Publication) WHERE p.year = {literal} RETURN p.title") != ("MATCH (p:Publication) WHERE p.year = $lit0 RETURN p.title", {"lit0": value})]
+    print(f"  hex and octal literals lifted with their value: {'yes' if not misread else 'no, misread ' + ', '.join(misread)}")
+
+    if args.neo4j:
+        from neo4j import GraphDatabase
+
+        driver = GraphDatabase.driver(os.environ.get("NEO4J_URI"),
+                                      auth=(os.environ.get("NEO4J_USERNAME"), os.environ.get("NEO4J_PASSWORD")))
+        try:
+            report("literals", explain_mix(driver, queries, parameterized=False))
+            report("parameterized", explain_mix(driver, queries, parameterized=True))
+        finally:
+            driver.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Offline end-to-end benchmark of the compiled workflows (Graph/graph.py).
+
+Replays the recorded question corpus (Benchmarks/questions.jsonl: query template, generated
+Cypher and vector search questions) through app, async_app or speculative_app with the stand-ins
+of Benchmarks/stand_ins.py: a scripted chat model with a simulated latency, the local hashing
+embeddings, an in-memory graph loaded from the sample CSVs and an in-memory vector index. Routing,
+decomposition, few-shot selection, the Cypher cache, parameterization, guard, query templates and
+formatter are the real ones, so no OpenAI or Neo4j is needed.
+
+Reports p50/p95/p99 latencies end to end, per question kind and per workflow node, and the memory
+allocated per question (tracemalloc, in a separate untimed pass). Each run is appended to
+Benchmarks/results/pipeline.jsonl with the commit it ran on and compared with the last run of the
+same configuration on a clean tree (runs with uncommitted changes are never the baseline); with
+--check the exit code is 1 when a latency regressed.
+
+--retrieval selects the lanes of vector search (Chains/vector_graph_chain.py); the keyword lane
+searches the local BM25 index of the in-memory graph's publications (Indexes/fulltext.py), and the
+seconds of each lane are reported as the vector_search.<lane> nodes.
+
+Usage (in the backend folder):
+    python -m Benchmarks.pipeline --workflow sync --rounds 3 --llm-latency 0.2 --db-latency 0.01
+    python -m Benchmarks.pipeline --workflow speculative --check
+    python -m Benchmarks.pipeline --retrieval hybrid
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime, timezone
+
+# Stand-ins and temporary caches must be configured before the backend modules are imported
+CACHE_DIR = tempfile.mkdtemp(prefix="pipeline_benchmark_")
+os.environ.update({
+    "WARM_UP": "off",
+    "OPENAI_API_KEY": "benchmark",
+    "OPENAI_EMBEDDING_MODEL": "local-hashing",
+    "EMBEDDING_CACHE_DIR": os.path.join(CACHE_DIR, "embeddings"),
+    "CYPHER_CACHE_PATH": os.path.join(CACHE_DIR, "cypher_cache.sqlite"),
+    "ROUTER_LOG_PATH": os.path.join(CACHE_DIR, "route_decisions.jsonl"),
+})
+# Per-request logs would be part of the measured latency (Tools/tracing.py)
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from langchain_core.example_selectors import MaxMarginalRelevanceExampleSelector
+from langchain_core.vectorstores import InMemoryVectorStore
+
+from Benchmarks.stand_ins import ArrayVectorStore, InMemoryGraph, Latency, ScriptedChatModel
+from Chains.graph_qa_chain import cypher_cache
+from Chains.registry import registry, LLM, GRAPH, ASYNC_GRAPH, EXAMPLE_SELECTOR, VECTOR_INDEX, FULLTEXT_INDEX, VECTOR_GRAPH_CHAIN
+from Chains.vector_graph_chain import build_vector_graph_chain
+from Graph.graph import app, async_app, speculative_app
+from Indexes.embedding_cache import get_cached_embeddings
+from Indexes.fulltext import LocalFulltextIndex, PublicationFulltextIndex
+from Indexes.vector_replica import PublicationVectorReplica, VectorReplica
+from Prompts.prompt_examples import examples
+from Tools.tracing import llm_metrics
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+QUESTIONS_FILE = os.path.join(BENCHMARK_DIR, "questions.jsonl")
+RESULTS_FILE = os.path.join(BENCHMARK_DIR, "results", "pipeline.jsonl")
+WORKFLOWS = {"sync": app, "async": async_app, "speculative": speculative_app}
+PERCENTILES = (50, 95, 99)
+# Latency changes below this many milliseconds are noise, whatever their ratio
+NOISE_FLOOR_MS = 2.0
+
+
+def load_questions(path=QUESTIONS_FILE):
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def build_vector_index(backend, graph, embeddings):
+    '''The in-memory vector index, or the replica of Indexes/vector_replica.py filled with the same documents'''
+    vector_index = ArrayVectorStore.from_graph(graph, embeddings)
+    if backend == "array":
+        return vector_index
+    replica = VectorReplica(os.path.join(CACHE_DIR, "vector_replica"), os.environ["OPENAI_EMBEDDING_MODEL"])
+    replica.upsert([{**metadata, "title": publication.get("title"), "venue": publication.get("venue"), "embedding": vector, "embedded_at": 0}
+                    for publication, metadata, vector in zip(graph.nodes["Publication"], vector_index.metadatas, vector_index.vectors)])
+    replica.load()
+    return PublicationVectorReplica(embeddings, replica)
+
+
+def configure(corpus, llm_latency, db_latency, jitter, seed, vector_index_backend="array", retrieval="vector"):
+    '''Register the stand-ins in place of OpenAI and Neo4j, then build every component before timing'''
+    embeddings = get_cached_embeddings(os.environ["OPENAI_EMBEDDING_MODEL"])
+    graph = InMemoryGraph.from_csv(latency=Latency(db_latency, jitter, seed))
+    vector_index = build_vector_index(vector_index_backend, graph, embeddings)
+    registry.register(LLM, lambda: ScriptedChatModel(corpus=corpus, latency=llm_latency, jitter=jitter, seed=seed, callbacks=[llm_metrics]))
+    registry.register(GRAPH, lambda: graph)
+    registry.register(ASYNC_GRAPH, graph.async_driver)
+    registry.register(VECTOR_INDEX, lambda: vector_index)
+    registry.register(FULLTEXT_INDEX, lambda: PublicationFulltextIndex(load_local=lambda: LocalFulltextIndex(graph.nodes["Publication"])))
+    registry.register(VECTOR_GRAPH_CHAIN, lambda: build_vector_graph_chain(retrieval))
+    registry.register(EXAMPLE_SELECTOR, lambda: MaxMarginalRelevanceExampleSelector.from_examples(
+        examples=examples, embeddings=embeddings, vectorstore_cls=InMemoryVectorStore, k=5, input_keys=["question"],
+    ))
+    registry.reset()
+    failed = registry.warm_up()
+    if failed:
+        raise RuntimeError(f"Stand-ins could not be built: {failed}")
+    return graph
+
+
+def percentiles(values):
+    '''p50/p95/p99 in milliseconds (nearest rank)'''
+    ordered = sorted(values)
+    return {f"p{p}": round(ordered[min(len(ordered) - 1, max(0, -(-p * len(ordered) // 100) - 1))] * 1000, 2) for p in PERCENTILES}
+
+
+def replay(workflow, corpus, rounds, warm_cypher_cache):
+    '''Run every question of the corpus once per round; returns (kind, seconds, node timings) per question'''
+    samples = []
+    loop = asyncio.new_event_loop() if workflow is not app else None
+    try:
+        for round_number in range(rounds):
+            if not warm_cypher_cache:
+                # Every round generates its Cypher again, as for questions never seen before
+                cypher_cache.set_schema_version(f"benchmark:round{round_number}")
+            for entry in corpus:
+                start_time = time.perf_counter()
+                if loop is None:
+                    result = workflow.invoke({"question": entry["question"]})
+                else:
+                    result = loop.run_until_complete(workflow.ainvoke({"question": entry["question"]}))
+                seconds = time.perf_counter() - start_time
+                timings = {name: value for name, value in result.get("timings", {}).items() if isinstance(value, (int, float))}
+                samples.append((entry["kind"], seconds, timings))
+    finally:
+        if loop is not None:
+            loop.close()
+    return samples
+
+
+def allocations(workflow, corpus):
+    '''Peak and retained KiB allocated per question, traced in a separate pass since tracemalloc slows everything down'''
+    peaks, retained = [], []
+    loop = asyncio.new_event_loop() if workflow is not app else None
+    tracemalloc.start()
+    try:
+        for entry in corpus:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            if loop is None:
+                workflow.invoke({"question": entry["question"]})
+            else:
+                loop.run_until_complete(workflow.ainvoke({"question": entry["question"]}))
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append((peak - before) / 1024)
+            retained.append((current - before) / 1024)
+    finally:
+        tracemalloc.stop()
+        if loop is not None:
+            loop.close()
+    return {
+        "peak_kib_p50": round(statistics.median(peaks), 1),
+        "peak_kib_max": round(max(peaks), 1),
+        "retained_kib_total": round(sum(retained), 1),
+    }
+
+
+def summarize(samples):
+    by_kind, by_node = defaultdict(list), defaultdict(list)
+    for kind, seconds, timings in samples:
+        by_kind[kind].append(seconds)
+        for node, node_seconds in timings.items():
+            by_node[node].append(node_seconds)
+    return {
+        "questions": len(samples),
+        "end_to_end": percentiles([seconds for _, seconds, _ in samples]),
+        "kinds": {kind: percentiles(values) for kind, values in sorted(by_kind.items())},
+        "nodes": {node: percentiles(values) for node, values in sorted(by_node.items())},
+    }
+
+
+def git_revision():
+    '''(commit, dirty) of the working tree, or (None, None) outside a git checkout'''
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, cwd=BENCHMARK_DIR).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True, check=True, cwd=BENCHMARK_DIR).stdout
+        return commit, bool(status.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def previous_run(config, path=RESULTS_FILE):
+    '''Last stored run with the same configuration on a clean tree, or None; dirty runs measured uncommitted code'''
+    if not os.path.exists(path):
+        return None
+    last = None
+    with open(path) as file:
+        for line in file:
+            if line.strip():
+                record = json.loads(line)
+                if record.get("config") == config and not record.get("dirty"):
+                    last = record
+    return last
+
+
+def regressions(current, previous, threshold):
+    '''(metric, previous ms, current ms) of the latencies that grew by more than the threshold ratio'''
+    found = []
+
+    def compare(name, now, before):
+        for key, value in now.items():
+            if key in before and value - before[key] > NOISE_FLOOR_MS and value > before[key] * (1 + threshold):
+                found.append((f"{name} {key}", before[key], value))
+
+    compare("end to end", current["end_to_end"], previous["end_to_end"])
+    for group in ("kinds", "nodes"):
+        for name, values in current[group].items():
+            compare(name, values, previous[group].get(name, {}))
+    return found
+
+
+def print_table(title, rows, previous=None):
+    print(f"\n{title}")
+    print(f"  {'':<34}" + "".join(f"{p:>10}" for p in ("p50 ms", "p95 ms", "p99 ms")))
+    for name, values in rows.items():
+        line = f"  {name:<34}" + "".join(f"{values[f'p{p}']:>10.1f}" for p in PERCENTILES)
+        if previous and name in previous:
+            line += f"   (p50 was {previous[name]['p50']:.1f})"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workflow", choices=sorted(WORKFLOWS), default="sync")
+    parser.add_argument("--rounds", type=int, default=3, help="Passes over the question corpus")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Median seconds of an LLM call")
+    parser.add_argument("--db-latency", type=float, default=0.01, help="Median seconds of a graph query")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Log-normal sigma of the simulated latencies (0 = fixed)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--vector-index", choices=["array", "replica"], default="array",
+                        help="In-memory vector store, or the local replica of Indexes/vector_replica.py")
+    parser.add_argument("--retrieval", choices=["vector", "fulltext", "hybrid"], default="vector",
+                        help="Lanes of vector search: vector index, keyword search first, or both fused (RETRIEVAL_MODE)")
+    parser.add_argument("--warm-cypher-cache", action="store_true", help="Keep the Cypher cache across rounds")
+    parser.add_argument("--questions", default=QUESTIONS_FILE)
+    parser.add_argument("--no-save", action="store_true", help="Do not append this run to the results file")
+    parser.add_argument("--check", action="store_true", help="Exit with 1 if a latency regressed against the last clean-tree run of the same configuration")
+    parser.add_argument("--regression-threshold", type=float, default=0.25, help="Allowed relative increase of a percentile")
+    args = parser.parse_args()
+
+    corpus = load_questions(args.questions)
+    config = {
+        "workflow": args.workflow, "rounds": args.rounds, "questions": len(corpus), "llm_latency": args.llm_latency,
+        "db_latency": args.db_latency, "jitter": args.jitter, "seed": args.seed, "warm_cypher_cache": args.warm_cypher_cache,
+    }
+    if args.vector_index != "array":
+        config["vector_index"] = args.vector_index
+    if args.retrieval != "vector":
+        config["retrieval"] = args.retrieval
+    configure(corpus, args.llm_latency, args.db_latency, args.jitter, args.seed, args.vector_index, args.retrieval)
+    workflow = WORKFLOWS[args.workflow]
+
+    # One untimed question of each kind, so that the first timed ones do not pay for lazy setup (indexes, prompts)
+    replay(workflow, list({entry["kind"]: entry for entry in corpus}.values()), 1, True)
+    start_time = time.perf_counter()
+    metrics = summarize(replay(workflow, corpus, args.rounds, args.warm_cypher_cache))
+    metrics["seconds"] = round(time.perf_counter() - start_time, 2)
+    metrics["memory"] = allocations(workflow, corpus)
+
+    previous = previous_run(config)
+    print(f"{args.workflow} workflow, {metrics['questions']} questions in {metrics['seconds']} s "
+          f"(LLM {args.llm_latency * 1000:.0f} ms, graph {args.db_latency * 1000:.0f} ms, jitter {args.jitter})")
+    if previous:
+        print(f"Compared with {previous['commit'] or 'an unknown commit'} of {previous['timestamp']}")
+    print_table("End to end", {"all": metrics["end_to_end"], **metrics["kinds"]},
+                previous and {"all": previous["metrics"]["end_to_end"], **previous["metrics"]["kinds"]})
+    print_table("Per node", metrics["nodes"], previous and previous["metrics"]["nodes"])
+    print(f"\nMemory per question: peak {metrics['memory']['peak_kib_p50']} KiB (median), {metrics['memory']['peak_kib_max']} KiB (max); "
+          f"retained {metrics['memory']['retained_kib_total']} KiB over the corpus")
+
+    found = regressions(metrics, previous["metrics"], args.regression_threshold) if previous else []
+    for name, before, now in found:
+        print(f"Regression: {name} {before:.1f} ms -> {now:.1f} ms")
+
+    if not args.no_save:
+        commit, dirty = git_revision()
+        os.makedirs(os.path.dirname(RESULTS_FILE), exist_ok=True)
+        with open(RESULTS_FILE, "a") as file:
+            file.write(json.dumps({
+                "commit": commit, "dirty": dirty, "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "python": platform.python_version(), "platform": platform.platform(),
+                "config": config, "metrics": metrics,
+            }) + "\n")
+    if args.check and found:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Throughput of the Flask server (main.py) against the async server (async_main.py).
+
+Both apps are driven through their test clients with the same questions, so the routing, JSON
+contract and workflow are the real ones. The LLM, Neo4j graph and async Neo4j driver are
+replaced by fakes that wait a fixed latency (time.sleep in the sync path, asyncio.sleep in
+the async path), and the prompt examples are fixed, so no OpenAI or Neo4j is needed. Flask gets a pool of worker threads, as with a threaded WSGI server; the
+async app runs every request on one event loop.
+
+Usage (in the backend folder):
+    python -m Benchmarks.serving --requests 200 --workers 8 --llm-latency 0.2 --db-latency 0.02
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Fakes and temporary caches must be configured before the backend modules are imported
+CACHE_DIR = tempfile.mkdtemp(prefix="serving_benchmark_")
+os.environ.update({
+    "WARM_UP": "off",
+    "OPENAI_API_KEY": "benchmark",
+    "OPENAI_EMBEDDING_MODEL": "local-hashing",  # never called, the example selector is replaced
+    "EMBEDDING_CACHE_DIR": os.path.join(CACHE_DIR, "embeddings"),
+    "CYPHER_CACHE_PATH": os.path.join(CACHE_DIR, "cypher_cache.sqlite"),
+    "ROUTER_LOG_PATH": os.path.join(CACHE_DIR, "route_decisions.jsonl"),
+})
+# Every answer goes to the formatter LLM unless FORMATTER_FAST_PATH_SHARE is set (Tools/result_formatter.py)
+os.environ.setdefault("FORMATTER_FAST_PATH_SHARE", "0")
+# The benchmark repeats its questions; the answer cache would serve all but the first (Tools/answer_cache.py)
+os.environ.setdefault("ANSWER_CACHE_SIZE", "0")
+# Per-request logs would be part of the measured latency (Tools/tracing.py)
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from langchain_core.example_selectors.base import BaseExampleSelector
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+import main as flask_main
+import async_main
+from Benchmarks.chain_construction import FakeGraph
+from Chains.registry import registry, LLM, GRAPH, ASYNC_GRAPH, EXAMPLE_SELECTOR, FEW_SHOT_PROMPT, GRAPH_QA_CHAIN
+from Prompts.prompt_examples import examples
+
+CYPHER = "MATCH (p:Publication) WHERE p.pub_year = 2020 RETURN count(p) AS count"
+ROWS = [{"count": 42}]
+
+
+class SlowChatModel(BaseChatModel):
+    """Chat model that answers with a fixed message after a fixed latency."""
+
+    response: str = CYPHER
+    latency: float = 0.2
+
+    @property
+    def _llm_type(self):
+        return "slow-fake"
+
+    def _result(self):
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.response))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        return self._result()
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self._result()
+
+
+class SlowGraph(FakeGraph):
+    """Neo4jGraph stand-in for the sync path."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def query(self, query, params={}):
+        time.sleep(self.latency)
+        return ROWS
+
+
+class FixedExampleSelector(BaseExampleSelector):
+    """Always selects the first prompt examples, so the benchmark measures serving rather than example search."""
+
+    def add_example(self, example):
+        pass
+
+    def select_examples(self, input_variables):
+        return examples[:5]
+
+
+class Record(dict):
+    def data(self):
+        return dict(self)
+
+
+class SlowAsyncDriver:
+    """AsyncDriver stand-in for the async path."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    async def execute_query(self, query, params=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return [Record(row) for row in ROWS], None, None
+
+
+def configure(llm_latency, db_latency):
+    registry.register(LLM, lambda: SlowChatModel(latency=llm_latency))
+    registry.register(GRAPH, lambda: SlowGraph(db_latency))
+    registry.register(ASYNC_GRAPH, lambda: SlowAsyncDriver(db_latency))
+    registry.register(EXAMPLE_SELECTOR, FixedExampleSelector)
+    registry.reset()
+    # Build what the graph QA path uses before timing
+    registry.warm_up([LLM, GRAPH, ASYNC_GRAPH, EXAMPLE_SELECTOR, FEW_SHOT_PROMPT, GRAPH_QA_CHAIN])
+
+
+def questions(count, offset):
+    '''Distinct graph questions (routed by the keyword rules, never served from the Cypher cache)'''
+    return [{"role": "user", "content": f"How many publications were published in 2020 by author {offset + i}?"}
+            for i in range(count)]
+
+
+def check(body):
+    '''The response follows the JSON contract of main.py'''
+    assert set(body) == {"role", "content", "id", "created_at"} and body["content"] in (CYPHER, "**Count**: 42"), body
+
+
+def run_flask(requests, workers):
+    client = flask_main.app.test_client()
+
+    def post(message):
+        start_time = time.perf_counter()
+        check(client.post("/", json=message).get_json())
+        return time.perf_counter() - start_time
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        start_time = time.perf_counter()
+        latencies = list(executor.map(post, questions(requests, 0)))
+    return time.perf_counter() - start_time, latencies
+
+
+async def run_async(requests):
+    client = async_main.app.test_client()
+
+    async def post(message):
+        start_time = time.perf_counter()
+        response = await client.post("/", json=message)
+        check(await response.get_json())
+        return time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    latencies = await asyncio.gather(*(post(message) for message in questions(requests, requests)))
+    return time.perf_counter() - start_time, latencies
+
+
+def report(label, seconds, latencies):
+    latencies = sorted(latencies)
+    print(f"{label:>22}: {len(latencies) / seconds:8.1f} req/s, "
+          f"p50 {1000 * statistics.median(latencies):8.1f} ms, "
+          f"p95 {1000 * latencies[int(0.95 * (len(latencies) - 1))]:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the Flask and the async server under concurrent requests.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=8, help="Flask worker threads")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Seconds per LLM call")
+    parser.add_argument("--db-latency", type=float, default=0.02, help="Seconds per Neo4j query")
+    args = parser.parse_args()
+
+    configure(args.llm_latency, args.db_latency)
+    print(f"{args.requests} requests, 2 LLM calls ({args.llm_latency} s) and 1 Neo4j query ({args.db_latency} s) each")
+
+    # The workflow nodes print their state; keep the benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        flask_seconds, flask_latencies = run_flask(args.requests, args.workers)
+        async_seconds, async_latencies = asyncio.run(run_async(args.requests))
+    report(f"flask ({args.workers} workers)", flask_seconds, flask_latencies)
+    report("async (1 event loop)", async_seconds, async_latencies)
+
+
+if __name__ == "__main__":
+    main()
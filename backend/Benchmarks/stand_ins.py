@@ -0,0 +1,568 @@
+"""
+Stand-ins for OpenAI and Neo4j used by the offline benchmarks (Benchmarks/pipeline.py).
+
+- ScriptedChatModel answers the router, decomposer, Cypher generation and formatter calls from
+  a recorded question corpus, after a simulated latency, and reports token usage
+- InMemoryGraph holds the sample CSVs as the bulk loader would write them to Neo4j and executes
+  the subset of Cypher the workflow produces (the query templates, the entity index and graph
+  version queries, and MATCH ... WHERE ... RETURN queries like the prompt examples); it also
+  serves as the sync and async neo4j driver, so generated Cypher goes through the real guard
+- ArrayVectorStore replaces the Neo4j vector index with an in-memory matrix of the publications
+"""
+import asyncio
+import os
+import random
+import re
+import sys
+import time
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+from langchain_core.documents import Document
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from langchain_core.vectorstores import VectorStore
+from pydantic import PrivateAttr
+
+from Tools.cypher_parameters import unescape
+
+# The loader is shared with graph_database_setup/ (next to backend/), as in Indexes/schema.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from graph_database_setup.bulk_loader import CITATIONS_FILE, METADATA_FILE, publication_rows
+from graph_database_setup.graph_version import READ_GRAPH_VERSION_QUERY, BUMP_GRAPH_VERSION_QUERY
+
+CYPHER_SUFFIX = re.compile(r"Question: (?P<question>[^\n]*), \nCypher Query:\s*$")
+OMID = re.compile(r"omid:br/\w+")
+
+
+class Latency:
+    """Simulated latency: a median in seconds with a log-normal spread (jitter is its sigma)."""
+
+    def __init__(self, median=0.0, jitter=0.0, seed=0):
+        self.median = median
+        self.jitter = jitter
+        self.random = random.Random(seed)
+
+    def sample(self):
+        if not self.median:
+            return 0.0
+        return self.median * (self.random.lognormvariate(0.0, self.jitter) if self.jitter else 1.0)
+
+    def wait(self):
+        seconds = self.sample()
+        if seconds:
+            time.sleep(seconds)
+
+    async def await_(self):
+        seconds = self.sample()
+        if seconds:
+            await asyncio.sleep(seconds)
+
+
+def words(text):
+    return len(str(text).split())
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Chat model answering from a question corpus (Benchmarks/questions.jsonl): the LLM router gets the
+    entry's route, the decomposer its subqueries, Cypher generation its Cypher (with {omids}
+    replaced by the publications of the vector search context) and the formatter a short answer.
+    """
+
+    corpus: list = []
+    latency: float = 0.0
+    jitter: float = 0.0
+    seed: int = 0
+    _script: dict = PrivateAttr(default_factory=dict)
+    _latency: Latency = PrivateAttr()
+
+    def model_post_init(self, context):
+        super().model_post_init(context)
+        for entry in self.corpus:
+            self._script[entry["question"]] = entry
+            if entry.get("subqueries"):
+                self._script.setdefault(entry["subqueries"][1], entry)
+        self._latency = Latency(self.latency, self.jitter, self.seed)
+
+    @property
+    def _llm_type(self):
+        return "scripted"
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def entry(self, question):
+        entry = self._script.get(question.strip())
+        if entry is None:
+            raise ValueError(f"Question not in the benchmark corpus: {question!r}")
+        return entry
+
+    def respond(self, messages, tools=None):
+        prompt = "\n".join(str(message.content) for message in messages)
+        question = str(messages[-1].content)
+        if tools:
+            name = tools[0]["function"]["name"]
+            entry = self.entry(question)
+            if name == "RouteQuery":
+                calls = [{"name": name, "args": {"datasource": entry["route"]}}]
+            else:
+                # The speculative workflow also decomposes graph questions; those have no recorded subqueries
+                subqueries = entry.get("subqueries") or [question, question]
+                calls = [{"name": name, "args": {"sub_query": sub_query}} for sub_query in subqueries]
+            message = AIMessage(content="", tool_calls=[{**call, "id": f"call_{i}"} for i, call in enumerate(calls)])
+        else:
+            generation = CYPHER_SUFFIX.search(prompt)
+            if generation:
+                cypher = self.entry(generation.group("question"))["cypher"]
+                omids = list(dict.fromkeys(OMID.findall(prompt[:generation.start()])))
+                content = cypher.replace("{omids}", "[" + ", ".join(f"'{omid}'" for omid in omids) + "]")
+            else:
+                # Formatter and retrieval answers: a short paragraph over the raw result
+                content = "Here is what the graph contains for your question: " + prompt[-400:].strip()
+            message = AIMessage(content=content)
+        message.usage_metadata = {"input_tokens": words(prompt), "output_tokens": words(message.content) + 10 * len(message.tool_calls),
+                                  "total_tokens": words(prompt) + words(message.content)}
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self._latency.wait()
+        return self.respond(messages, kwargs.get("tools"))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await self._latency.await_()
+        return self.respond(messages, kwargs.get("tools"))
+
+
+class UnsupportedCypher(ValueError):
+    '''Cypher outside the subset InMemoryGraph executes'''
+
+
+class Record(dict):
+    def data(self):
+        return dict(self)
+
+
+class Summary:
+    '''Result summary without an EXPLAIN plan: the Cypher guard sees no estimates'''
+
+    plan = None
+
+
+VALUE = r"(?:\$\w+|-?\d+(?:\.\d+)?|\[[^\]]*\])"
+NODE = re.compile(r"^\(\s*(?P<var>\w*)\s*(?::\s*(?P<label>\w+))?\s*(?:\{(?P<props>[^}]*)\})?\s*\)")
+RELATIONSHIP = re.compile(r"^(?P<left><)?-\[\s*:\s*(?P<type>\w+)\s*\]-(?P<right>>)?")
+QUERY = re.compile(
+    r"^MATCH (?P<match>.+?)(?: WHERE (?P<where>.+?))? RETURN (?P<distinct>DISTINCT )?(?P<items>.+?)"
+    r"(?: ORDER BY (?P<order>.+?))?(?: SKIP (?P<skip>\S+))?(?: LIMIT (?P<limit>\S+))?$",
+    re.IGNORECASE,
+)
+COMPARISON = re.compile(rf"^(?P<var>\w+)\.(?P<prop>\w+)\s*(?P<op>=|<>|>=|<=|>|<|IN)\s*(?P<value>{VALUE})$", re.IGNORECASE)
+NULL_CHECK = re.compile(r"^(?P<var>\w+)\.(?P<prop>\w+) IS (?P<negated>NOT )?NULL$", re.IGNORECASE)
+ITEM = re.compile(r"^(?P<expression>.+?)(?: AS (?P<alias>\w+))?$", re.IGNORECASE)
+AGGREGATE = re.compile(r"^(?P<function>count|collect)\(\s*(?P<distinct>DISTINCT )?(?P<argument>\*|\w+(?:\.\w+)?)\s*\)$", re.IGNORECASE)
+OPERATORS = {
+    "=": lambda a, b: a == b,
+    "<>": lambda a, b: a != b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    "IN": lambda a, b: a in b,
+}
+
+
+def split_top_level(text, separator=","):
+    '''Split on a separator outside parentheses and brackets'''
+    parts, depth, start = [], 0, 0
+    for index, char in enumerate(text):
+        if char in "([{":
+            depth += 1
+        elif char in ")]}":
+            depth -= 1
+        elif char == separator and depth == 0:
+            parts.append(text[start:index].strip())
+            start = index + 1
+    parts.append(text[start:].strip())
+    return parts
+
+
+def normalize(cypher, params):
+    '''(one-line query, params) with string literals moved into parameters, so keywords inside strings are never matched'''
+    params = dict(params or {})
+
+    def lift(match):
+        name = f"_s{len(params)}"
+        params[name] = unescape(match.group(0))
+        return f"${name}"
+
+    text = re.sub(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"", lift, cypher)
+    return " ".join(text.split()).rstrip(";").strip(), params
+
+
+def resolve(value, params):
+    value = value.strip()
+    if value.startswith("$"):
+        return params[value[1:]]
+    if value.startswith("["):
+        return [resolve(item, params) for item in split_top_level(value[1:-1]) if item]
+    return float(value) if "." in value else int(value)
+
+
+class InMemoryGraph:
+    """
+    The sample CSVs as the bulk loader writes them to Neo4j (Publication and Author nodes, AUTHORED
+    and CITED relationships), queried with a small Cypher subset:
+    MATCH of comma-separated node or one-hop patterns (with inline properties), WHERE with AND-ed
+    comparisons, IN and IS [NOT] NULL, RETURN [DISTINCT] of properties, nodes, count() and
+    collect() with implicit grouping, ORDER BY, SKIP and LIMIT; plus the graph version queries.
+    Equality and IN lookups go through per-property indexes, as on the database's indexes.
+    Other queries raise UnsupportedCypher.
+    """
+
+    schema = (
+        "Node properties:\n"
+        "Publication {omid: STRING, title: STRING, year: INTEGER, month: INTEGER, day: INTEGER, venue: STRING, publisher: STRING}\n"
+        "Author {name: STRING}\n"
+        "Relationship properties:\n\n"
+        "The relationships:\n"
+        "(:Author)-[:AUTHORED]->(:Publication)\n"
+        "(:Publication)-[:CITED]->(:Publication)"
+    )
+    structured_schema = {
+        "node_props": {
+            "Publication": [{"property": prop, "type": kind} for prop, kind in (
+                ("omid", "STRING"), ("title", "STRING"), ("year", "INTEGER"), ("month", "INTEGER"),
+                ("day", "INTEGER"), ("venue", "STRING"), ("publisher", "STRING"))],
+            "Author": [{"property": "name", "type": "STRING"}],
+        },
+        "rel_props": {},
+        "relationships": [
+            {"start": "Author", "type": "AUTHORED", "end": "Publication"},
+            {"start": "Publication", "type": "CITED", "end": "Publication"},
+        ],
+        "metadata": {"constraint": [], "index": []},
+    }
+
+    def __init__(self, latency=None):
+        self.latency = latency or Latency()
+        self.nodes = defaultdict(list)
+        self.outgoing = defaultdict(lambda: defaultdict(list))
+        self.incoming = defaultdict(lambda: defaultdict(list))
+        self.edges = defaultdict(list)
+        self.indexes = {}
+        self.labels = {}
+        self.version = 0
+        self._driver = self
+
+    @classmethod
+    def from_csv(cls, metadata_file=METADATA_FILE, citations_file=CITATIONS_FILE, latency=None):
+        graph = cls(latency)
+        publications, authors = {}, {}
+        for row in publication_rows(pd.read_csv(metadata_file)):
+            authors_of = row.pop("authors")
+            publication = publications.get(row["omid"])
+            if publication is None:
+                publication = publications[row["omid"]] = graph.add_node("Publication", row)
+            for name in authors_of:
+                if name not in authors:
+                    authors[name] = graph.add_node("Author", {"name": name})
+                graph.add_edge(authors[name], "AUTHORED", publication)
+        for row in pd.read_csv(citations_file, usecols=["citing", "cited"]).dropna().itertuples(index=False):
+            if row.citing in publications and row.cited in publications:
+                graph.add_edge(publications[row.citing], "CITED", publications[row.cited])
+        return graph
+
+    def add_node(self, label, properties):
+        node = dict(properties)
+        self.nodes[label].append(node)
+        self.labels[id(node)] = label
+        return node
+
+    def add_edge(self, start, type, end):
+        if end not in self.outgoing[type][id(start)]:
+            self.outgoing[type][id(start)].append(end)
+            self.incoming[type][id(end)].append(start)
+            self.edges[type].append((start, end))
+
+    # GraphStore interface (Neo4jGraph)
+
+    @property
+    def get_schema(self):
+        return self.schema
+
+    @property
+    def get_structured_schema(self):
+        return self.structured_schema
+
+    def refresh_schema(self):
+        pass
+
+    def add_graph_documents(self, graph_documents, include_source=False):
+        raise NotImplementedError("The in-memory graph is read-only")
+
+    def query(self, query, params={}):
+        self.latency.wait()
+        return self.run(query, params)
+
+    # neo4j Driver / AsyncDriver interface, as used by the Cypher guard and aquery_graph
+
+    def execute_query(self, query, params=None, database_=None, **kwargs):
+        self.latency.wait()
+        return [Record(row) for row in self.run(getattr(query, "text", query), params)], Summary(), []
+
+    def async_driver(self):
+        return AsyncDriver(self)
+
+    # Execution
+
+    def run(self, cypher, params=None):
+        flat = " ".join(cypher.split())
+        if flat == " ".join(READ_GRAPH_VERSION_QUERY.split()):
+            return [{"version": self.version}]
+        if flat == " ".join(BUMP_GRAPH_VERSION_QUERY.split()):
+            self.version += 1
+            return [{"version": self.version}]
+        text, params = normalize(cypher, params)
+        if text.upper().startswith("EXPLAIN "):
+            self.plan(text[len("EXPLAIN "):])
+            return []
+        return self.execute(self.plan(text), params)
+
+    def plan(self, text):
+        '''Parse a query of the supported subset'''
+        query = QUERY.match(text)
+        if query is None:
+            raise UnsupportedCypher(f"Not supported by the in-memory graph: {text}")
+        patterns = [self.parse_pattern(pattern) for pattern in split_top_level(query.group("match"))]
+        predicates = []
+        for condition in re.split(r" AND ", query.group("where") or "", flags=re.IGNORECASE):
+            if not condition:
+                continue
+            comparison, null_check = COMPARISON.match(condition), NULL_CHECK.match(condition)
+            if comparison:
+                predicates.append((comparison["var"], comparison["prop"], comparison["op"].upper(), comparison["value"]))
+            elif null_check:
+                predicates.append((null_check["var"], null_check["prop"], "IS NOT NULL" if null_check["negated"] else "IS NULL", None))
+            else:
+                raise UnsupportedCypher(f"Condition not supported by the in-memory graph: {condition}")
+        items = []
+        for item in split_top_level(query.group("items")):
+            parsed = ITEM.match(item)
+            items.append((parsed["alias"] or parsed["expression"], parsed["expression"], AGGREGATE.match(parsed["expression"])))
+        order = []
+        for key in split_top_level(query.group("order") or ""):
+            if key:
+                expression, _, direction = key.partition(" ")
+                order.append((expression, direction.upper() == "DESC"))
+        return {"patterns": patterns, "predicates": predicates, "items": items, "distinct": bool(query.group("distinct")),
+                "order": order, "skip": query.group("skip"), "limit": query.group("limit")}
+
+    def parse_pattern(self, text):
+        nodes, relationship = [], None
+        rest = text
+        while rest:
+            node = NODE.match(rest)
+            if node is None:
+                raise UnsupportedCypher(f"Pattern not supported by the in-memory graph: {text}")
+            props = {}
+            for prop in split_top_level(node["props"] or ""):
+                if prop:
+                    key, _, value = prop.partition(":")
+                    props[key.strip()] = value.strip()
+            nodes.append((node["var"] or f"_anonymous{id(node)}", node["label"], props))
+            rest = rest[node.end():].strip()
+            if rest:
+                if relationship is not None:
+                    raise UnsupportedCypher(f"Only one-hop patterns are supported by the in-memory graph: {text}")
+                found = RELATIONSHIP.match(rest)
+                if found is None or bool(found["left"]) == bool(found["right"]):
+                    raise UnsupportedCypher(f"Relationship not supported by the in-memory graph: {text}")
+                relationship = (found["type"], bool(found["left"]))
+                rest = rest[found.end():].strip()
+        return nodes, relationship
+
+    def index(self, label, prop):
+        key = (label, prop)
+        if key not in self.indexes:
+            index = defaultdict(list)
+            for node in self.nodes[label] if label else [node for nodes in self.nodes.values() for node in nodes]:
+                if node.get(prop) is not None:
+                    index[node[prop]].append(node)
+            self.indexes[key] = index
+        return self.indexes[key]
+
+    def candidates(self, var, label, equalities):
+        '''Nodes a variable can bind to, through an index when it has an equality condition'''
+        if var in equalities:
+            prop, values = equalities[var]
+            index = self.index(label, prop)
+            return [node for value in dict.fromkeys(values) for node in index.get(value, [])]
+        if label:
+            return self.nodes[label]
+        return [node for nodes in self.nodes.values() for node in nodes]
+
+    def match_pattern(self, pattern, equalities):
+        nodes, relationship = pattern
+        if relationship is None:
+            var, label, _ = nodes[0]
+            return [{var: node} for node in self.candidates(var, label, equalities)]
+        (type, reverse), (first, second) = relationship, nodes
+        start, end = (second, first) if reverse else (first, second)
+        rows = []
+        if start[0] in equalities or end[0] not in equalities:
+            starts = self.candidates(start[0], start[1], equalities) if start[0] in equalities else None
+            pairs = ((node, other) for node in starts for other in self.outgoing[type][id(node)]) if starts is not None else self.edges[type]
+            for node, other in pairs:
+                if (start[1] is None or self.labels[id(node)] == start[1]) and (end[1] is None or self.labels[id(other)] == end[1]):
+                    rows.append({start[0]: node, end[0]: other})
+        else:
+            for other in self.candidates(end[0], end[1], equalities):
+                for node in self.incoming[type][id(other)]:
+                    if start[1] is None or self.labels[id(node)] == start[1]:
+                        rows.append({start[0]: node, end[0]: other})
+        return rows
+
+    def execute(self, plan, params):
+        predicates = [(var, prop, op, resolve(value, params) if value is not None else None) for var, prop, op, value in plan["predicates"]]
+        for nodes, _ in plan["patterns"]:
+            predicates += [(var, prop, "=", resolve(value, params)) for var, _, props in nodes for prop, value in props.items()]
+        equalities = {}
+        for var, prop, op, value in predicates:
+            if op == "=" and not isinstance(value, list):
+                equalities.setdefault(var, (prop, [value]))
+            elif op == "IN" and all(not isinstance(item, (list, dict)) for item in value):
+                equalities.setdefault(var, (prop, value))
+
+        # Bind the patterns, joining them on their shared variables
+        rows = None
+        for pattern in plan["patterns"]:
+            matched = self.match_pattern(pattern, equalities)
+            if rows is None:
+                rows = matched
+                continue
+            shared = sorted(set(rows[0]) & set(matched[0])) if rows and matched else []
+            lookup = defaultdict(list)
+            for row in matched:
+                lookup[tuple(id(row[var]) for var in shared)].append(row)
+            rows = [{**row, **other} for row in rows for other in lookup[tuple(id(row[var]) for var in shared)]]
+
+        def satisfies(row):
+            for var, prop, op, value in predicates:
+                actual = row[var].get(prop)
+                if op == "IS NULL" or op == "IS NOT NULL":
+                    if (actual is None) != (op == "IS NULL"):
+                        return False
+                elif actual is None or not OPERATORS[op](actual, value):
+                    return False
+            return True
+
+        rows = [row for row in rows if satisfies(row)]
+        results = self.project(rows, plan["items"])
+        if plan["distinct"]:
+            results = list({repr(sorted(result.items())): result for result in results}.values())
+        for expression, descending in reversed(plan["order"]):
+            results.sort(key=lambda result: (result.get(expression) is None, result.get(expression)), reverse=descending)
+        skip = resolve(plan["skip"], params) if plan["skip"] else 0
+        limit = resolve(plan["limit"], params) if plan["limit"] else None
+        return results[skip:skip + limit if limit is not None else None]
+
+    def value(self, row, expression):
+        var, _, prop = expression.partition(".")
+        node = row[var]
+        return node.get(prop) if prop else dict(node)
+
+    def project(self, rows, items):
+        aggregates = [(name, aggregate) for name, _, aggregate in items if aggregate]
+        keys = [(name, expression) for name, expression, aggregate in items if not aggregate]
+        if not aggregates:
+            return [{name: self.value(row, expression) for name, expression in keys} for row in rows]
+        groups = {}
+        for row in rows:
+            group = tuple(repr(self.value(row, expression)) for _, expression in keys)
+            groups.setdefault(group, (row, []))[1].append(row)
+        if not groups and not keys:
+            groups[()] = (None, [])
+        results = []
+        for first, members in groups.values():
+            result = {name: self.value(first, expression) for name, expression in keys}
+            for name, aggregate in aggregates:
+                argument = aggregate["argument"]
+                if argument == "*":
+                    values = members
+                elif "." not in argument and aggregate["distinct"]:
+                    # Distinct nodes by identity, not by properties
+                    values = [dict(node) for node in {id(row[argument]): row[argument] for row in members}.values()]
+                else:
+                    values = [self.value(row, argument) for row in members]
+                values = [value for value in values if value is not None]
+                if aggregate["distinct"] and "." in argument:
+                    values = list({repr(value): value for value in values}.values())
+                result[name] = len(values) if aggregate["function"].lower() == "count" else values
+            results.append(result)
+        return results
+
+
+class AsyncDriver:
+    """neo4j AsyncDriver over an InMemoryGraph."""
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    async def execute_query(self, query, params=None, database_=None, **kwargs):
+        await self.graph.latency.await_()
+        return [Record(row) for row in self.graph.run(getattr(query, "text", query), params)], Summary(), []
+
+
+class ArrayVectorStore(VectorStore):
+    """
+    Vector index of the publications as one normalized float32 matrix, with the documents of
+    Neo4jVector.from_existing_graph (the title and venue as text, the other properties as metadata).
+    """
+
+    def __init__(self, embedding, texts=(), metadatas=None):
+        self.embedding = embedding
+        self.texts = []
+        self.metadatas = []
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.add_texts(texts, metadatas)
+
+    @property
+    def embeddings(self):
+        return self.embedding
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        return cls(embedding, texts, metadatas)
+
+    @classmethod
+    def from_graph(cls, graph, embedding):
+        texts, metadatas = [], []
+        for publication in graph.nodes["Publication"]:
+            texts.append(f"\ntitle: {publication.get('title')}\nvenue: {publication.get('venue')}")
+            metadatas.append({key: value for key, value in publication.items() if key not in ("title", "venue")})
+        return cls(embedding, texts, metadatas)
+
+    def add_texts(self, texts, metadatas=None, **kwargs):
+        texts = list(texts)
+        if not texts:
+            return []
+        vectors = np.asarray(self.embedding.embed_documents(texts), dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        self.vectors = vectors if not len(self.texts) else np.vstack([self.vectors, vectors])
+        self.texts += texts
+        self.metadatas += list(metadatas or [{} for _ in texts])
+        return [str(index) for index in range(len(self.texts) - len(texts), len(self.texts))]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        vector = np.asarray(self.embedding.embed_query(query), dtype=np.float32)
+        scores = self.vectors @ (vector / max(np.linalg.norm(vector), 1e-12))
+        top = np.argpartition(-scores, min(k, len(scores) - 1))[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(Document(page_content=self.texts[i], metadata=dict(self.metadatas[i])), float(scores[i])) for i in top]
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [document for document, _ in self.similarity_search_with_score(query, k)]
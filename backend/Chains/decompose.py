@@ -1,10 +1,10 @@
-import os
-
-from langchain_openai import ChatOpenAI
 from pydantic import BaseModel, Field
 from langchain.output_parsers import PydanticToolsParser
 from langchain_core.prompts import ChatPromptTemplate
 
+from Chains.llm import get_llm
+from Chains.registry import registry, QUERY_ANALYZER
+
 class SubQuery(BaseModel):
     """Decompose a given question/query into sub-queries"""
 
@@ -13,18 +13,6 @@ class SubQuery(BaseModel):
         description="A unique paraphrasing of the original questions.",
     )
 
-api_key=os.environ.get("OPENAI_API_KEY")
-
-# Initialize the appropriate LLM based on provider
-if (api_key != ""):
-    llm = ChatOpenAI(
-        model=os.environ.get("OPENAI_GENERATIVE_MODEL"),
-        temperature=0,
-        api_key=os.environ.get("OPENAI_API_KEY")
-    )
-else:
-    raise ValueError("Please set your preferred Generative AI provider (GOOGLE or OPENAI) in .env file")
-
 system = """You are an expert at converting user questions into Neo4j Cypher queries. \
 
 Perform query decomposition. Given a user question, break it down into two distinct subqueries that \
@@ -45,6 +33,14 @@ prompt = ChatPromptTemplate.from_messages(
     ]
 )
 
-llm_with_tools = llm.bind_tools([SubQuery])
 parser = PydanticToolsParser(tools=[SubQuery])
-query_analyzer = prompt | llm_with_tools | parser  # Structured output with Pydantic
\ No newline at end of file
+
+def build_query_analyzer():
+    '''Create the query decomposition chain; the shared LLM client is created on first use'''
+    llm_with_tools = get_llm().bind_tools([SubQuery])
+    return prompt | llm_with_tools | parser  # Structured output with Pydantic
+
+registry.register(QUERY_ANALYZER, build_query_analyzer)
+
+def get_query_analyzer():
+    return registry.get(QUERY_ANALYZER)
\ No newline at end of file
@@ -0,0 +1,173 @@
+# Import Python Libraries
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+# Import Custom Libraries
+from Chains.router import get_question_router
+from Tools.tracing import get_logger, metrics
+
+logger = get_logger("fast_router")
+
+VECTOR_SEARCH = "vector search"
+GRAPH_QUERY = "graph query"
+DATASOURCES = (VECTOR_SEARCH, GRAPH_QUERY)
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".cache")
+ROUTER_LOG_PATH = os.environ.get("ROUTER_LOG_PATH", os.path.join(CACHE_DIR, "route_decisions.jsonl"))
+# Below this confidence the question goes to the LLM router
+ROUTER_CONFIDENCE = float(os.environ.get("ROUTER_CONFIDENCE", "0.9"))
+# The learned model is only trusted once it has seen this many LLM decisions per datasource
+ROUTER_MIN_SAMPLES = int(os.environ.get("ROUTER_MIN_SAMPLES", "20"))
+RULE_CONFIDENCE = 0.95
+
+# Keyword rules, following the routing instructions in Chains/router.py
+RULES = {
+    VECTOR_SEARCH: [
+        r"\bsimilar\b", r"\brelated\b", r"\brelevant\b", r"\bidentical\b", r"\bclosest\b",
+        r"\b(articles?|papers?|publications?|works?|research) (about|on|regarding|concerning)\b",
+        r"\bsemantic(ally)?\b", r"\btopics?\b",
+    ],
+    GRAPH_QUERY: [
+        r"^\s*(match|merge|create|return|with)\b", r"\bhow many\b", r"\bcount\b", r"\bnumber of\b",
+        r"\btop \d+\b", r"\bmost cited\b", r"\bauthored by\b", r"\bpublished (in|by|after|before)\b",
+        r"\b(in|after|before|since) (19|20)\d\d\b", r"\bwho (authored|wrote|published)\b",
+        r"\bcitation (count|velocity)\b", r"\bimpact score\b",
+    ],
+}
+_RULES = {datasource: [re.compile(pattern) for pattern in patterns] for datasource, patterns in RULES.items()}
+
+
+def tokenize(question):
+    '''Lowercase word unigrams and bigrams'''
+    words = re.findall(r"[a-z0-9]+", question.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class NaiveBayesRouter:
+    """Multinomial naive Bayes over question tokens, updated online from logged LLM decisions."""
+
+    def __init__(self):
+        self.token_counts = {datasource: Counter() for datasource in DATASOURCES}
+        self.token_totals = Counter()
+        self.class_counts = Counter()
+        self.vocabulary = set()
+
+    def learn(self, question, datasource):
+        tokens = tokenize(question)
+        self.token_counts[datasource].update(tokens)
+        self.token_totals[datasource] += len(tokens)
+        self.class_counts[datasource] += 1
+        self.vocabulary.update(tokens)
+
+    def is_trained(self, min_samples=ROUTER_MIN_SAMPLES):
+        return all(self.class_counts[datasource] >= min_samples for datasource in DATASOURCES)
+
+    def predict(self, question):
+        '''Return (datasource, posterior probability)'''
+        tokens = tokenize(question)
+        total = sum(self.class_counts.values())
+        vocabulary_size = len(self.vocabulary) + 1
+        scores = {}
+        for datasource in DATASOURCES:
+            counts = self.token_counts[datasource]
+            denominator = self.token_totals[datasource] + vocabulary_size
+            scores[datasource] = math.log((self.class_counts[datasource] + 1) / (total + len(DATASOURCES))) + sum(
+                math.log((counts[token] + 1) / denominator) for token in tokens
+            )
+        best = max(scores, key=scores.get)
+        normalizer = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1 / normalizer
+
+
+class FastRouter:
+    """
+    Route questions locally when possible: keyword rules first, then the naive Bayes model,
+    and the LLM router only when neither is confident. Every LLM decision is appended to a JSONL
+    log and fed to the model, so the fast path covers more traffic over time.
+    """
+
+    def __init__(self, get_llm_router, log_path=ROUTER_LOG_PATH, confidence=ROUTER_CONFIDENCE):
+        self.get_llm_router = get_llm_router
+        self.log_path = log_path
+        self.confidence = confidence
+        self.model = NaiveBayesRouter()
+        self.routes = Counter()
+        self.seconds = defaultdict(float)
+        self.lock = threading.Lock()
+        if os.path.exists(log_path):
+            with open(log_path) as log:
+                for line in log:
+                    decision = json.loads(line)
+                    self.model.learn(decision["question"], decision["datasource"])
+
+    def classify(self, question):
+        '''Local decision: (datasource, confidence, source), or (None, confidence, source) when not confident'''
+        matches = {datasource: any(rule.search(question.lower()) for rule in rules) for datasource, rules in _RULES.items()}
+        if matches[VECTOR_SEARCH] != matches[GRAPH_QUERY]:
+            return (VECTOR_SEARCH if matches[VECTOR_SEARCH] else GRAPH_QUERY), RULE_CONFIDENCE, "rules"
+        if self.model.is_trained():
+            datasource, probability = self.model.predict(question)
+            if probability >= self.confidence:
+                return datasource, probability, "model"
+            return None, probability, "model"
+        return None, 0.0, "rules"
+
+    def route(self, question):
+        '''Return the datasource for a question'''
+        start_time = time.perf_counter()
+        datasource, confidence, source = self.classify(question)
+        if datasource is None:
+            source = "llm"
+            datasource = self.get_llm_router().invoke({"question": question}).datasource
+            self.record(question, datasource)
+        return self._routed(datasource, confidence, source, start_time)
+
+    async def aroute(self, question, decision=None):
+        '''
+        route() for the async workflow: the LLM router fallback is awaited. A decision already returned by
+        classify() is reused, so the route agrees with it even if the model learned in between.
+        '''
+        start_time = time.perf_counter()
+        datasource, confidence, source = decision or self.classify(question)
+        if datasource is None:
+            source = "llm"
+            datasource = (await self.get_llm_router().ainvoke({"question": question})).datasource
+            self.record(question, datasource)
+        return self._routed(datasource, confidence, source, start_time)
+
+    def _routed(self, datasource, confidence, source, start_time):
+        with self.lock:
+            self.routes[source] += 1
+            self.seconds[source] += time.perf_counter() - start_time
+        logger.debug("Route: %s (%s, confidence %.2f)", datasource, source, confidence)
+        return datasource
+
+    def record(self, question, datasource):
+        '''Log an LLM decision and learn from it'''
+        with self.lock:
+            self.model.learn(question, datasource)
+            os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+            with open(self.log_path, "a") as log:
+                log.write(json.dumps({"question": question, "datasource": datasource}) + "\n")
+
+    def stats(self):
+        with self.lock:
+            total = sum(self.routes.values())
+            fast = total - self.routes["llm"]
+            return {
+                "routes": total,
+                "fast_path": fast,
+                "fast_path_share": fast / total if total else 0.0,
+                "by_source": dict(self.routes),
+                "mean_latency_ms": {source: 1000 * self.seconds[source] / count for source, count in self.routes.items()},
+                "model_samples": dict(self.model.class_counts),
+            }
+
+
+fast_router = FastRouter(get_question_router)
+metrics.collector("fast_router", fast_router.stats)
@@ -1,73 +1,268 @@
 # Import Python Libraries
 import os
 
-from langchain_openai import ChatOpenAI
-from langchain_neo4j.chains.graph_qa.cypher import GraphCypherQAChain
+from langchain_neo4j.chains.graph_qa.cypher import GraphCypherQAChain, extract_cypher
 from langchain_neo4j import Neo4jGraph
+from neo4j import AsyncGraphDatabase
 from langchain_neo4j.graphs.graph_store import GraphStore
 
 # Import Custom Libraries
 from Prompts.prompt_template import create_few_shot_prompt, create_few_shot_prompt_with_context
+from Prompts.prompt_examples import examples
 from Graph.state import GraphState
+from Indexes.schema import setup_graph_schema, READ_GRAPH_VERSION_QUERY, BUMP_GRAPH_VERSION_QUERY, GRAPH_VERSION_LABEL
+from Indexes.embedding_cache import get_cached_embeddings
+from Tools.cypher_cache import CypherCache, fingerprint, schema_fingerprint, prompt_fingerprint
+from Tools.answer_cache import SemanticAnswerCache, is_write_query
+from Tools.cypher_guard import CypherGuard, GuardedGraph
+from Tools.cypher_parameters import cypher_parameterizer
+from Tools.query_templates import QueryTemplates, EntityIndex, ENTITY_QUERIES
+from Chains.registry import registry, GRAPH, ASYNC_GRAPH, ENTITY_INDEX, ANSWER_CACHE, GRAPH_QA_CHAIN, GRAPH_QA_CHAIN_WITH_CONTEXT
+from Chains.llm import get_llm
+from Tools.tracing import get_logger, metrics, span
 
-# Instantiate a Neo4j graph
-graph = Neo4jGraph(
-    url=os.environ.get('NEO4J_URI'),
-    username=os.environ.get('NEO4J_USERNAME'),
-    password=os.environ.get('NEO4J_PASSWORD')
-)
-graph.refresh_schema()
-
-api_key=os.environ.get("OPENAI_API_KEY")
-
-# Initialize the appropriate LLM based on provider
-if (api_key != ""):
-    llm = ChatOpenAI(
-        model=os.environ.get("OPENAI_GENERATIVE_MODEL"),
-        temperature=0,
-        api_key=os.environ.get("OPENAI_API_KEY")
+logger = get_logger("graph_qa_chain")
+
+# Number of result rows returned by a graph query
+TOP_K = 10
+
+# Generated Cypher is cached per question, schema version and prompt
+cypher_cache = CypherCache()
+
+def read_graph_version():
+    return query_graph(READ_GRAPH_VERSION_QUERY, kind="graph_version")[0]["version"]
+
+# Generated Cypher is EXPLAINed, limited and run with a timeout before it reaches the database
+cypher_guard = CypherGuard(limit=TOP_K, graph_version=read_graph_version)
+
+def build_answer_cache():
+    '''Answers are cached per question (and its paraphrases) until the graph data changes'''
+    answer_cache = SemanticAnswerCache(get_cached_embeddings(os.environ.get("OPENAI_EMBEDDING_MODEL")), read_graph_version)
+    metrics.collector("answer_cache", answer_cache.stats)
+    return answer_cache
+
+registry.register(ANSWER_CACHE, build_answer_cache)
+
+def get_answer_cache():
+    '''Return the shared answer cache; the embeddings client is created on first use'''
+    return registry.get(ANSWER_CACHE)
+
+async def aget_answer_cache():
+    '''get_answer_cache for coroutines'''
+    return await registry.aget(ANSWER_CACHE)
+
+def graph_written(cypher):
+    '''After a generated write query: drop the cached answers and bump the graph version for the other processes'''
+    logger.info("Write query, invalidating cached answers: %s", cypher)
+    get_answer_cache().invalidate()
+    cypher_guard.invalidate()
+    registry.reset(ENTITY_INDEX)
+    query_graph(BUMP_GRAPH_VERSION_QUERY, kind="graph_version")
+
+async def agraph_written(cypher):
+    '''graph_written for the async workflow'''
+    logger.info("Write query, invalidating cached answers: %s", cypher)
+    (await aget_answer_cache()).invalidate()
+    cypher_guard.invalidate()
+    registry.reset(ENTITY_INDEX)
+    await aquery_graph(BUMP_GRAPH_VERSION_QUERY, kind="graph_version")
+
+def build_graph():
+    '''Make sure the constraints and indexes used by the generated Cypher exist, then connect to Neo4j and read the schema'''
+    setup_graph_schema()
+
+    # Instantiate a Neo4j graph; the schema is read once, by refresh_graph_schema
+    graph = Neo4jGraph(
+        url=os.environ.get('NEO4J_URI'),
+        username=os.environ.get('NEO4J_USERNAME'),
+        password=os.environ.get('NEO4J_PASSWORD'),
+        refresh_schema=False
+    )
+    refresh_graph_schema(graph)
+    return graph
+
+registry.register(GRAPH, build_graph)
+
+def get_graph():
+    '''Return the shared Neo4j graph, connected on first use'''
+    return registry.get(GRAPH)
+
+def build_async_graph():
+    '''Async Neo4j driver for the async workflow; connections are opened on first query'''
+    return AsyncGraphDatabase.driver(
+        os.environ.get('NEO4J_URI'),
+        auth=(os.environ.get('NEO4J_USERNAME'), os.environ.get('NEO4J_PASSWORD'))
     )
-else:
-    raise ValueError("Please set your preferred Generative AI provider (GOOGLE or OPENAI) in .env file")
 
-def get_graph_qa_chain(state: GraphState):
+registry.register(ASYNC_GRAPH, build_async_graph)
+
+def query_graph(cypher, params=None, kind="query"):
+    '''Run a Cypher query with the shared graph, traced as a Neo4j span of the given kind'''
+    graph = get_graph()
+    with span("neo4j", kind) as record:
+        rows = graph.query(cypher, params or {})
+        record["rows"] = len(rows)
+    return rows
+
+async def aquery_graph(cypher, params=None, kind="query"):
+    '''Run a Cypher query with the async driver and return the rows as dicts, like Neo4jGraph.query'''
+    driver = await registry.aget(ASYNC_GRAPH)
+    with span("neo4j", kind) as record:
+        records, _, _ = await driver.execute_query(cypher, params or {})
+        record["rows"] = len(records)
+    return [record.data() for record in records]
+
+def guarded_graph():
+    '''The shared graph for generated Cypher: literals become parameters, then the cost guard runs'''
+    return GuardedGraph(get_graph(), cypher_guard, cypher_parameterizer)
+
+def query_generated(cypher):
+    '''Run generated Cypher with its literals as parameters, through the cost guard'''
+    return guarded_graph().query(cypher)
+
+async def aquery_generated(cypher):
+    '''query_generated for the async workflow'''
+    template, params = cypher_parameterizer.parameterize(cypher)
+    return await cypher_guard.arun(await registry.aget(ASYNC_GRAPH), template, params)
+
+def build_entity_index():
+    '''Author names, venues and publishers of the graph, for the entity extractor of the query templates'''
+    return EntityIndex((entity, row.get("value")) for entity, query in ENTITY_QUERIES.items() for row in query_graph(query, kind="entity_index"))
+
+registry.register(ENTITY_INDEX, build_entity_index)
+
+# Common question shapes run precompiled Cypher instead of LLM generation (Tools/query_templates.py)
+query_templates = QueryTemplates(lambda: registry.get(ENTITY_INDEX), lambda: registry.aget(ENTITY_INDEX))
+
+def template_result(question, match, result):
+    '''Result of a query template, shaped like the result of the graph QA chain'''
+    logger.debug("Query template %s: %s", match["template"], match["params"])
+    return {"query": question, "result": result,
+            "intermediate_steps": [{"query": match["cypher"], "params": match["params"], "template": match["template"]}]}
+
+def run_template(question, match):
+    '''Run a matched query template'''
+    return template_result(question, match, query_graph(match["cypher"], match["params"], kind="template"))
+
+async def arun_template(question, match):
+    '''run_template for the async workflow'''
+    return template_result(question, match, await aquery_graph(match["cypher"], match["params"], kind="template"))
+
+def refresh_graph_schema(graph=None):
+    '''Refresh the graph schema; if it changed, invalidate the Cypher cache and rebuild the chains, which embed the schema'''
+    graph = graph or get_graph()
+    graph.refresh_schema()
+    if cypher_cache.set_schema_version(schema_fingerprint(graph)):
+        logger.info("Cypher cache: schema version %s", cypher_cache.schema_version)
+        registry.reset(GRAPH_QA_CHAIN, GRAPH_QA_CHAIN_WITH_CONTEXT)
+
+def build_graph_qa_chain():
     
     """Create a Neo4j Graph Cypher QA Chain"""
-    print("Get Graph QA Chain Function:")
-    prompt = state["prompt"]
-    print(f"Prompt: {prompt}")
-    print(f"Graph type: {type(graph)}")
-    print(f"LLM Type: {type(llm)}")
-    print(f"Prompt Type: {type(prompt)}")
     
     graph_qa_chain = GraphCypherQAChain.from_llm(
-            cypher_llm = llm, #should use gpt-4 for production
-            qa_llm = llm,
+            cypher_llm = get_llm(), #should use gpt-4 for production
+            qa_llm = get_llm(),
             validate_cypher= True,
-            graph=graph,
-            verbose=True,
-            cypher_prompt = prompt,
-            # return_intermediate_steps = True,
+            graph=guarded_graph(),
+            verbose=False,
+            cypher_prompt = create_few_shot_prompt(),
+            return_intermediate_steps = True,
+            top_k = TOP_K,
             return_direct = True,
+            exclude_types = [GRAPH_VERSION_LABEL],
             allow_dangerous_requests=True
         )
     return graph_qa_chain
 
-def get_graph_qa_chain_with_context(state: GraphState):
+def build_graph_qa_chain_with_context():
     
-    """Create a Neo4j Graph Cypher QA Chain. Using this as GraphState so it can access state['prompt']"""
-    
-    prompt_with_context = state["prompt_with_context"] 
+    """Create a Neo4j Graph Cypher QA Chain whose prompt takes the vector search results as the 'context' input"""
     
     graph_qa_chain = GraphCypherQAChain.from_llm(
-            cypher_llm = llm, #should use gpt-4 for production
-            qa_llm = llm,
+            cypher_llm = get_llm(), #should use gpt-4 for production
+            qa_llm = get_llm(),
             validate_cypher= True,
-            graph=graph,
+            graph=guarded_graph(),
             verbose=False,
-            cypher_prompt = prompt_with_context,
-            # return_intermediate_steps = True,
+            cypher_prompt = create_few_shot_prompt_with_context(),
+            return_intermediate_steps = True,
+            top_k = TOP_K,
             return_direct = True,
+            exclude_types = [GRAPH_VERSION_LABEL],
             allow_dangerous_requests = True
         )
-    return graph_qa_chain
\ No newline at end of file
+    return graph_qa_chain
+
+# The counters of the caches and guards are exported on /metrics
+metrics.collector("cypher_cache", cypher_cache.stats)
+metrics.collector("cypher_guard", cypher_guard.stats)
+metrics.collector("cypher_parameters", cypher_parameterizer.stats)
+metrics.collector("query_templates", query_templates.stats)
+
+registry.register(GRAPH_QA_CHAIN, build_graph_qa_chain)
+registry.register(GRAPH_QA_CHAIN_WITH_CONTEXT, build_graph_qa_chain_with_context)
+
+def get_graph_qa_chain(state: GraphState = None):
+    """Return the shared Graph Cypher QA Chain, built on first use"""
+    return registry.get(GRAPH_QA_CHAIN)
+
+def get_graph_qa_chain_with_context(state: GraphState = None):
+    """Return the shared Graph Cypher QA Chain with context, built on first use. Pass the context as an input"""
+    return registry.get(GRAPH_QA_CHAIN_WITH_CONTEXT)
+
+def invoke_graph_qa_chain(graph_qa_chain, prompt, question, context=None):
+    '''Answer a question with cached Cypher when available, otherwise generate it with the chain and cache it'''
+    key = cypher_cache.key(question, fingerprint(prompt_fingerprint(prompt, examples), context))
+    cypher = cypher_cache.get(key)
+    if cypher is not None:
+        logger.debug("Cypher cache hit: %s", cypher)
+        try:
+            result = query_generated(cypher)[:TOP_K]
+            return {"query": question, "result": result, "intermediate_steps": [{"query": cypher}]}
+        except Exception as e:
+            logger.warning("Cached Cypher failed, regenerating: %s", e)
+            cypher_cache.discard(key)
+
+    inputs = {"query": question}
+    if context is not None:
+        inputs["context"] = context
+    result = graph_qa_chain.invoke(inputs)
+    cypher = result["intermediate_steps"][0]["query"]
+    if is_write_query(cypher):
+        # Never replayed from the Cypher cache
+        graph_written(cypher)
+    elif cypher:
+        cypher_cache.put(key, question, cypher)
+    logger.debug("Cypher cache: %s", cypher_cache.stats())
+    return result
+
+async def ainvoke_graph_qa_chain(graph_qa_chain, prompt, question, context=None):
+    '''
+    invoke_graph_qa_chain for the async workflow. Follows GraphCypherQAChain with return_direct:
+    the Cypher is generated with the chain's async LLM call and run with the async Neo4j driver.
+    '''
+    key = cypher_cache.key(question, fingerprint(prompt_fingerprint(prompt, examples), context))
+    cypher = cypher_cache.get(key)
+    if cypher is not None:
+        logger.debug("Cypher cache hit: %s", cypher)
+        try:
+            result = (await aquery_generated(cypher))[:TOP_K]
+            return {"query": question, "result": result, "intermediate_steps": [{"query": cypher}]}
+        except Exception as e:
+            logger.warning("Cached Cypher failed, regenerating: %s", e)
+            cypher_cache.discard(key)
+
+    args = {"question": question, "examples": None, "schema": graph_qa_chain.graph_schema, "query": question}
+    if context is not None:
+        args["context"] = context
+    cypher = extract_cypher(await graph_qa_chain.cypher_generation_chain.ainvoke(args))
+    if graph_qa_chain.cypher_query_corrector:
+        cypher = graph_qa_chain.cypher_query_corrector(cypher)
+    result = (await aquery_generated(cypher))[:TOP_K] if cypher else []
+    if is_write_query(cypher):
+        await agraph_written(cypher)
+    elif cypher:
+        cypher_cache.put(key, question, cypher)
+    logger.debug("Cypher cache: %s", cypher_cache.stats())
+    return {"query": question, "result": result, "intermediate_steps": [{"query": cypher}]}
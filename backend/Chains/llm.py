@@ -0,0 +1,28 @@
+# Import Python Libraries
+import os
+from langchain_openai import ChatOpenAI
+
+# Import Custom Libraries
+from Chains.registry import registry, LLM
+from Tools.tracing import llm_metrics
+
+def build_llm():
+    '''Create the ChatOpenAI client shared by the router, decomposer, graph QA chains and formatter'''
+    api_key = os.environ.get("OPENAI_API_KEY")
+
+    # Initialize the appropriate LLM based on provider
+    if (api_key != ""):
+        return ChatOpenAI(
+            model=os.environ.get("OPENAI_GENERATIVE_MODEL"),
+            temperature=0,
+            api_key=api_key,
+            # Duration and tokens of every call, by workflow node, for /metrics
+            callbacks=[llm_metrics],
+        )
+    raise ValueError("Please set your OpenAI API Key in .env file")
+
+registry.register(LLM, build_llm)
+
+def get_llm():
+    '''Return the shared LLM client, created on first use'''
+    return registry.get(LLM)
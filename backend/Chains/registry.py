@@ -0,0 +1,118 @@
+# Import Python Libraries
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from Tools.tracing import get_logger
+
+logger = get_logger("registry")
+
+# Shared resources
+LLM = "llm"
+GRAPH = "graph"
+ASYNC_GRAPH = "async_graph"
+EXAMPLE_SELECTOR = "example_selector"
+VECTOR_INDEX = "vector_index"
+FULLTEXT_INDEX = "fulltext_index"
+ENTITY_INDEX = "entity_index"
+ANSWER_CACHE = "answer_cache"
+
+# Prompts and chains
+FEW_SHOT_PROMPT = "few_shot_prompt"
+FEW_SHOT_PROMPT_WITH_CONTEXT = "few_shot_prompt_with_context"
+QUESTION_ROUTER = "question_router"
+QUERY_ANALYZER = "query_analyzer"
+GRAPH_QA_CHAIN = "graph_qa_chain"
+GRAPH_QA_CHAIN_WITH_CONTEXT = "graph_qa_chain_with_context"
+VECTOR_GRAPH_CHAIN = "vector_graph_chain"
+
+
+class ChainRegistry:
+    """
+    Builds each registered chain or shared resource (LLM client, Neo4j graph, vector index, ...)
+    once per process, on first use, and returns the same instance afterwards.
+
+    Chains hold no per-request state (questions, context and prompts inputs are passed to
+    invoke), so one instance can serve concurrent requests. Each name has its own lock, so
+    independent resources can be built in parallel and a factory may get() the resources it
+    depends on. A factory that raises is retried on the next get().
+    """
+
+    def __init__(self):
+        self.factories = {}
+        self.instances = {}
+        self.build_seconds = {}
+        self.errors = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    def register(self, name, factory):
+        '''Register a zero-argument factory under a name'''
+        with self.lock:
+            self.factories[name] = factory
+            self.locks.setdefault(name, threading.Lock())
+
+    def get(self, name):
+        '''Return the chain registered under a name, building it on first use'''
+        instance = self.instances.get(name)
+        if instance is None:
+            with self.locks[name]:
+                instance = self.instances.get(name)
+                if instance is None:
+                    start_time = time.perf_counter()
+                    try:
+                        instance = self.factories[name]()
+                    except Exception as e:
+                        self.errors[name] = f"{type(e).__name__}: {e}"
+                        raise
+                    self.build_seconds[name] = time.perf_counter() - start_time
+                    self.errors.pop(name, None)
+                    self.instances[name] = instance
+                    logger.info("Built %s in %.1f ms", name, self.build_seconds[name] * 1000)
+        return instance
+
+    async def aget(self, name):
+        '''get() for coroutines: a chain that is not built yet is built in a worker thread, so the event loop is not blocked'''
+        instance = self.instances.get(name)
+        if instance is None:
+            instance = await asyncio.to_thread(self.get, name)
+        return instance
+
+    def reset(self, *names):
+        '''Drop built chains (all of them by default) so they are rebuilt on next use, e.g. after a schema change'''
+        with self.lock:
+            for name in names or list(self.instances):
+                self.instances.pop(name, None)
+
+    def warm_up(self, names=None, workers=4):
+        '''Build the given resources (all registered ones by default) in parallel. Returns the names that failed.'''
+        names = list(names or self.factories)
+
+        def build(name):
+            try:
+                self.get(name)
+                return None
+            except Exception as e:
+                logger.warning("Warm-up of %s failed: %s", name, e)
+                return name
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return [name for name in executor.map(build, names) if name is not None]
+
+    def is_ready(self, names=None):
+        return all(name in self.instances for name in (names or self.factories))
+
+    def report(self):
+        '''Per-component build time in seconds, or the last error for components that are not built'''
+        return {
+            name: {
+                "ready": name in self.instances,
+                "seconds": round(self.build_seconds[name], 4) if name in self.build_seconds else None,
+                "error": self.errors.get(name),
+            }
+            for name in self.factories
+        }
+
+
+registry = ChainRegistry()
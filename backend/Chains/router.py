@@ -1,11 +1,11 @@
-import os
-
 from typing import Literal
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
 
+from Chains.llm import get_llm
+from Chains.registry import registry, QUESTION_ROUTER
+
 class RouteQuery(BaseModel):
     """Route a user query to the most relevant datasource."""
 
@@ -17,20 +17,6 @@ class RouteQuery(BaseModel):
 # Loading environment variables from .env file
 load_dotenv()
 
-api_key=os.environ.get("OPENAI_API_KEY")
-
-# Initialize the appropriate LLM based on provider
-if (api_key != ""):
-    llm = ChatOpenAI(
-        model=os.environ.get("OPENAI_GENERATIVE_MODEL"),
-        temperature=0,
-        api_key=os.environ.get("OPENAI_API_KEY")
-    )
-else:
-    raise ValueError("Please set your preferred Generative AI provider (GOOGLE or OPENAI) in .env file")
-
-structured_llm_router = llm.with_structured_output(RouteQuery)
-
 system = """You are an expert at routing a user question to perform vector search or graph query. 
 The vector store contains documents related to authors, author properties such as name, articles, and article properties such as year and publisher . Here are three routing situations:
 If the user question is about similarity search, perform vector search. The user query may include term like similar, related, relvant, identitical, closest etc to suggest vector search. For all else, use graph query.
@@ -55,4 +41,12 @@ route_prompt = ChatPromptTemplate.from_messages(
     ]
 )
 
-question_router = route_prompt | structured_llm_router
\ No newline at end of file
+def build_question_router():
+    '''Create the LLM router; the shared LLM client is created on first use'''
+    structured_llm_router = get_llm().with_structured_output(RouteQuery)
+    return route_prompt | structured_llm_router
+
+registry.register(QUESTION_ROUTER, build_question_router)
+
+def get_question_router():
+    return registry.get(QUESTION_ROUTER)
\ No newline at end of file
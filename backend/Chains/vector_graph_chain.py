@@ -1,34 +1,131 @@
 # Import Python Libraries
+import asyncio
 import os
-from langchain_openai import ChatOpenAI
-from langchain.chains.retrieval_qa.base import RetrievalQA
+import time
 
 # Import Custom Libraries
-from Indexes import index
+from Indexes import fulltext, index, vector_replica
+from Chains.graph_qa_chain import query_graph, aquery_graph, read_graph_version
+from Chains.registry import registry, VECTOR_GRAPH_CHAIN, VECTOR_INDEX, FULLTEXT_INDEX
+from Tools.tracing import metrics, span
 
-api_key=os.environ.get("OPENAI_API_KEY")
+# "neo4j" searches the Neo4j vector index; "replica" a local copy of it (Indexes/vector_replica.py)
+VECTOR_INDEX_BACKEND = os.environ.get("VECTOR_INDEX_BACKEND", "neo4j")
+# Lanes of vector search: "vector" (vector index only), "fulltext" (keyword search, the vector index when it
+# finds nothing) or "hybrid" (both, merged by reciprocal rank fusion)
+RETRIEVAL_MODE = os.environ.get("RETRIEVAL_MODE", "vector")
+# Number of articles returned by vector search
+VECTOR_SEARCH_K = 3
+# Candidates of each lane merged by the hybrid mode, and the rank offset of reciprocal rank fusion
+HYBRID_CANDIDATES = 10
+RRF_K = 60
 
-# Replace the llm initialization with modular version
-genai_provider = os.environ.get("GENAI")
+def build_vector_index():
+    '''
+    The publication vector index. The Neo4j one is created on first use: from_existing_graph embeds
+    any Publication without an embedding. The replica copies the embeddings on first use, then follows the graph version.
+    '''
+    if VECTOR_INDEX_BACKEND == "replica":
+        replica = vector_replica.get_publication_vector_replica(
+            lambda cypher, params: query_graph(cypher, params, kind="vector_replica"), read_graph_version,
+        )
+        metrics.collector("vector_replica", replica.stats)
+        return replica
+    return index.get_publication_vector_index()
 
-if (api_key != ""):    
-    llm = ChatOpenAI(
-        model=os.environ.get("OPENAI_GENERATIVE_MODEL"), 
-        temperature=0,
-        api_key=os.environ.get("OPENAI_API_KEY")
+registry.register(VECTOR_INDEX, build_vector_index)
+
+def build_fulltext_index():
+    '''Keyword search on the Neo4j fulltext index of titles and venues, or its local BM25 fallback (Indexes/fulltext.py)'''
+    fulltext_index = fulltext.get_publication_fulltext_index(
+        lambda cypher, params: query_graph(cypher, params, kind="fulltext"),
+        lambda cypher, params: aquery_graph(cypher, params, kind="fulltext"),
     )
-else:
-    raise ValueError("Please set your OpenAI API Key in .env file")
+    metrics.collector("fulltext", fulltext_index.stats)
+    return fulltext_index
+
+registry.register(FULLTEXT_INDEX, build_fulltext_index)
+
+def reciprocal_rank_fusion(rankings, k, rrf_k=RRF_K):
+    '''Merge ranked lists of documents by the sum of 1 / (rrf_k + rank) over the lists; documents are identified by omid'''
+    scores = {}
+    documents = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking, start=1):
+            key = document.metadata.get("omid") or document.page_content
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            documents.setdefault(key, document)
+    return [documents[key] for key in sorted(scores, key=scores.get, reverse=True)[:k]]
+
+class RetrievalLanes:
+    """
+    Retrieval chain of vector search over one or more lanes (retrievers). Returns the documents of
+    the first lane that finds any, or with fuse=True the reciprocal rank fusion of all lanes (run
+    concurrently by ainvoke). The seconds spent in each lane are returned as "timings" and
+    recorded as retrieval spans (Tools/tracing.py).
+    """
+
+    def __init__(self, lanes, k=VECTOR_SEARCH_K, fuse=False):
+        self.lanes = lanes
+        self.k = k
+        self.fuse = fuse
+
+    def result(self, query, rankings, timings):
+        documents = reciprocal_rank_fusion(rankings, self.k) if self.fuse else next((ranking for ranking in rankings if ranking), [])
+        return {"query": query, "source_documents": documents[:self.k], "timings": timings}
 
-vector_index = index.get_publication_vector_index()
+    def invoke(self, inputs, config=None):
+        query = inputs["query"]
+        rankings, timings = [], {}
+        for name, retriever in self.lanes:
+            start_time = time.perf_counter()
+            with span("retrieval", name):
+                rankings.append(retriever.invoke(query, config))
+            timings[f"vector_search.{name}"] = round(time.perf_counter() - start_time, 4)
+            if rankings[-1] and not self.fuse:
+                break
+        return self.result(query, rankings, timings)
+
+    async def ainvoke(self, inputs, config=None):
+        query = inputs["query"]
+        timings = {}
+
+        async def search(name, retriever):
+            start_time = time.perf_counter()
+            with span("retrieval", name):
+                documents = await retriever.ainvoke(query, config)
+            timings[f"vector_search.{name}"] = round(time.perf_counter() - start_time, 4)
+            return documents
+
+        if self.fuse:
+            rankings = await asyncio.gather(*(search(name, retriever) for name, retriever in self.lanes))
+            return self.result(query, rankings, timings)
+        rankings = []
+        for name, retriever in self.lanes:
+            rankings.append(await search(name, retriever))
+            if rankings[-1]:
+                break
+        return self.result(query, rankings, timings)
+
+def build_vector_graph_chain(mode=None):
+    '''
+    Create the retrieval chain of the RETRIEVAL_MODE lanes. Returns the top K most relevant articles as "source_documents".
+    Only the documents are used (Graph/nodes.py parse_vector_search), so there is no "stuff" QA LLM call as in RetrievalQA.
+    '''
+    mode = mode or RETRIEVAL_MODE
+    if mode not in ("vector", "fulltext", "hybrid"):
+        raise ValueError(f"Unknown RETRIEVAL_MODE {mode!r}, expected vector, fulltext or hybrid")
+    k = HYBRID_CANDIDATES if mode == "hybrid" else VECTOR_SEARCH_K
+    vector_lane = ("vector", registry.get(VECTOR_INDEX).as_retriever(search_kwargs={'k': k}))
+    if mode == "vector":
+        return RetrievalLanes([vector_lane])
+    fulltext_lane = ("fulltext", registry.get(FULLTEXT_INDEX).as_retriever(k=k))
+    if mode == "fulltext":
+        return RetrievalLanes([fulltext_lane, vector_lane])
+    return RetrievalLanes([vector_lane, fulltext_lane], fuse=True)
+
+registry.register(VECTOR_GRAPH_CHAIN, build_vector_graph_chain)
 
 def get_vector_graph_chain():
-    '''Create a Neo4j Retrieval QA Chain. Returns top K most relevant articles'''
-    vector_graph_chain = RetrievalQA.from_chain_type(
-        llm, 
-        chain_type="stuff", 
-        retriever = vector_index.as_retriever(search_kwargs={'k':3}), 
-        verbose=True,
-        return_source_documents=True,
-    )
-    return vector_graph_chain
\ No newline at end of file
+    '''Return the shared retrieval chain, built on first use'''
+    return registry.get(VECTOR_GRAPH_CHAIN)
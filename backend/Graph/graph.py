@@ -1,60 +1,148 @@
 # Import Python Libraries
+import inspect
+import time
+
 from dotenv import load_dotenv
 from langgraph.graph import END, StateGraph
 
 # Import Custom Libraries
-from Chains.router import question_router
+from Chains.fast_router import fast_router
+from Chains.graph_qa_chain import query_templates
+from Tools.tracing import get_logger, span
 from Graph.state import GraphState
-from Graph.labels import DECOMPOSER, VECTOR_SEARCH, GRAPH_QA, GRAPH_QA_WITH_CONTEXT, PROMPT_TEMPLATE, PROMPT_TEMPLATE_WITH_CONTEXT, FORMAT_RESPONSE
-from Graph.nodes import decomposer, vector_search, graph_qa, graph_qa_with_context, prompt_template, prompt_template_with_context, format_response
+from Graph.labels import DECOMPOSER, VECTOR_SEARCH, GRAPH_QA, GRAPH_QA_WITH_CONTEXT, PROMPT_TEMPLATE, PROMPT_TEMPLATE_WITH_CONTEXT, FORMAT_RESPONSE, SPECULATE, TEMPLATE_QUERY
+from Graph.nodes import decomposer, vector_search, graph_qa, graph_qa_with_context, template_query, prompt_template, prompt_template_with_context, format_response
+from Graph.nodes import adecomposer, avector_search, agraph_qa, agraph_qa_with_context, atemplate_query, aformat_response, aspeculate
 
 load_dotenv()
 
+logger = get_logger("graph")
+
 def route_question(state: GraphState):
-    print("---ROUTE QUESTION---")
+    logger.debug("Route question")
     question = state["question"]
-    source = question_router.invoke({"question": question})
-    if source.datasource == "vector search":
-        print("---ROUTE QUESTION TO VECTOR SEARCH---")
+    # Questions with a query template run precompiled Cypher, without routing or Cypher generation
+    if query_templates.match(question):
+        logger.debug("Route question to query template")
+        return "template_query"
+    # Keyword rules and a model trained on past LLM decisions; the LLM router only for uncertain questions
+    datasource = fast_router.route(question)
+    logger.debug("Router: %s", fast_router.stats())
+    if datasource == "vector search":
+        logger.debug("Route question to vector search")
         return "decomposer"
-    elif source.datasource == "graph query":
-        print("---ROUTE QUESTION TO GRAPH QA---")
+    elif datasource == "graph query":
+        logger.debug("Route question to graph QA")
         return "prompt_template"
     
 
-workflow = StateGraph(GraphState)
+async def aroute_question(state: GraphState):
+    logger.debug("Route question")
+    if await query_templates.amatch(state["question"]):
+        logger.debug("Route question to query template")
+        return "template_query"
+    datasource = await fast_router.aroute(state["question"])
+    logger.debug("Router: %s", fast_router.stats())
+    if datasource == "vector search":
+        logger.debug("Route question to vector search")
+        return "decomposer"
+    elif datasource == "graph query":
+        logger.debug("Route question to graph QA")
+        return "prompt_template"
+
+def route_speculated(state: GraphState):
+    '''Branch on the route decided by the speculate node; its decomposition replaces the decomposer node'''
+    if state["datasource"] == TEMPLATE_QUERY:
+        return "template_query"
+    if state["datasource"] == "vector search":
+        return "vector_search"
+    return "prompt_template"
+
+def timed(name, node):
+    '''Wrap a node so that it records its duration in the "timings" state field and as a node span (Tools/tracing.py)'''
+    if inspect.iscoroutinefunction(node):
+        async def timed_node(state: GraphState):
+            start_time = time.perf_counter()
+            with span("node", name):
+                update = await node(state)
+            return {**update, "timings": {**update.get("timings", {}), name: round(time.perf_counter() - start_time, 4)}}
+    else:
+        def timed_node(state: GraphState):
+            start_time = time.perf_counter()
+            with span("node", name):
+                update = node(state)
+            return {**update, "timings": {**update.get("timings", {}), name: round(time.perf_counter() - start_time, 4)}}
+    return timed_node
+
+def build_workflow(route, decomposer, vector_search, graph_qa, graph_qa_with_context, template_query, format_response, speculate=None):
+    '''
+    Compile the workflow with the given router and I/O nodes (sync functions for app, coroutines for async_app).
+    With a speculate node, it is the entry point and replaces the router and the decomposer node.
+    '''
+    workflow = StateGraph(GraphState)
+
+    def add_node(name, node):
+        workflow.add_node(name, timed(name, node))
+
+    # Nodes for graph qa
+    add_node(PROMPT_TEMPLATE, prompt_template)
+    add_node(GRAPH_QA, graph_qa)
+
+    # Nodes for graph qa with vector search
+    add_node(VECTOR_SEARCH, vector_search)
+    add_node(PROMPT_TEMPLATE_WITH_CONTEXT, prompt_template_with_context)
+    add_node(GRAPH_QA_WITH_CONTEXT, graph_qa_with_context)
+
+    # Node for questions matched by a query template
+    add_node(TEMPLATE_QUERY, template_query)
+
+    add_node(FORMAT_RESPONSE, format_response)
+
+    if speculate is None:
+        add_node(DECOMPOSER, decomposer)
 
-# Nodes for graph qa
-workflow.add_node(PROMPT_TEMPLATE, prompt_template)
-workflow.add_node(GRAPH_QA, graph_qa)
+        # Set conditional entry point for vector search or graph qa
+        workflow.set_conditional_entry_point(
+            route,
+            {
+                'decomposer': DECOMPOSER, # vector search
+                'prompt_template': PROMPT_TEMPLATE, # for graph qa
+                'template_query': TEMPLATE_QUERY # for template matched questions
+            },
+        )
+        workflow.add_edge(DECOMPOSER, VECTOR_SEARCH)
+    else:
+        # Route, decompose and select examples concurrently, then branch
+        add_node(SPECULATE, speculate)
+        workflow.set_entry_point(SPECULATE)
+        workflow.add_conditional_edges(
+            SPECULATE,
+            route,
+            {
+                'vector_search': VECTOR_SEARCH,
+                'prompt_template': PROMPT_TEMPLATE,
+                'template_query': TEMPLATE_QUERY
+            },
+        )
 
-# Nodes for graph qa with vector search
-workflow.add_node(DECOMPOSER, decomposer)
-workflow.add_node(VECTOR_SEARCH, vector_search)
-workflow.add_node(PROMPT_TEMPLATE_WITH_CONTEXT, prompt_template_with_context)
-workflow.add_node(GRAPH_QA_WITH_CONTEXT, graph_qa_with_context)
+    # Edges for graph qa with vector search
+    workflow.add_edge(VECTOR_SEARCH, PROMPT_TEMPLATE_WITH_CONTEXT)
+    workflow.add_edge(PROMPT_TEMPLATE_WITH_CONTEXT, GRAPH_QA_WITH_CONTEXT)
+    workflow.add_edge(GRAPH_QA_WITH_CONTEXT, FORMAT_RESPONSE)
 
-workflow.add_node(FORMAT_RESPONSE, format_response)
+    # Edges for graph qa
+    workflow.add_edge(PROMPT_TEMPLATE, GRAPH_QA)
+    workflow.add_edge(GRAPH_QA, FORMAT_RESPONSE)
+    workflow.add_edge(TEMPLATE_QUERY, FORMAT_RESPONSE)
 
-# Set conditional entry point for vector search or graph qa
-workflow.set_conditional_entry_point(
-    route_question,
-    {
-        'decomposer': DECOMPOSER, # vector search
-        'prompt_template': PROMPT_TEMPLATE # for graph qa
-    },
-)
+    workflow.add_edge(FORMAT_RESPONSE, END)
 
-# Edges for graph qa with vector search
-workflow.add_edge(DECOMPOSER, VECTOR_SEARCH)
-workflow.add_edge(VECTOR_SEARCH, PROMPT_TEMPLATE_WITH_CONTEXT)
-workflow.add_edge(PROMPT_TEMPLATE_WITH_CONTEXT, GRAPH_QA_WITH_CONTEXT)
-workflow.add_edge(GRAPH_QA_WITH_CONTEXT, FORMAT_RESPONSE)
+    return workflow.compile()
 
-# Edges for graph qa
-workflow.add_edge(PROMPT_TEMPLATE, GRAPH_QA)
-workflow.add_edge(GRAPH_QA, FORMAT_RESPONSE)
+app = build_workflow(route_question, decomposer, vector_search, graph_qa, graph_qa_with_context, template_query, format_response)
 
-workflow.add_edge(FORMAT_RESPONSE, END)
+# Same workflow for the async server (async_main.py): run with ainvoke, many questions share one event loop
+async_app = build_workflow(aroute_question, adecomposer, avector_search, agraph_qa, agraph_qa_with_context, atemplate_query, aformat_response)
 
-app = workflow.compile()
+# Async workflow with speculative execution (SPECULATIVE_EXECUTION=on, see graphRAG.py)
+speculative_app = build_workflow(route_speculated, None, avector_search, agraph_qa, agraph_qa_with_context, atemplate_query, aformat_response, speculate=aspeculate)
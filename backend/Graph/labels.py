@@ -9,4 +9,7 @@ PROMPT_TEMPLATE_WITH_CONTEXT = "prompt_template_with_context"
 CREATE_CONTEXT = "create_context"
 CREATE_PREFIX = "create_prefix"
 DECOMPOSER = "decomposer"
-FORMAT_RESPONSE = "format_response"
\ No newline at end of file
+FORMAT_RESPONSE = "format_response"
+SPECULATE = "speculate"
+ANSWER_CACHE = "answer_cache"
+TEMPLATE_QUERY = "template_query"
\ No newline at end of file
@@ -1,48 +1,37 @@
-# Import Python libraries
-import os
-from langchain_neo4j import Neo4jGraph
-from langchain_openai import ChatOpenAI
+# Import Python Libraries
+import asyncio
+import time
 
 # Import Custom libraries
 from Chains.vector_graph_chain import get_vector_graph_chain
-from Chains.graph_qa_chain import get_graph_qa_chain, get_graph_qa_chain_with_context
-from Chains.decompose import query_analyzer
-from Prompts.prompt_template import create_few_shot_prompt, create_few_shot_prompt_with_context
+from Chains.graph_qa_chain import get_graph_qa_chain, get_graph_qa_chain_with_context, invoke_graph_qa_chain, ainvoke_graph_qa_chain
+from Chains.graph_qa_chain import query_templates, run_template, arun_template
+from Chains.decompose import get_query_analyzer
+from Chains.llm import get_llm
+from Chains.registry import registry, LLM, QUERY_ANALYZER, VECTOR_GRAPH_CHAIN, GRAPH_QA_CHAIN, GRAPH_QA_CHAIN_WITH_CONTEXT, EXAMPLE_SELECTOR
+from Chains.fast_router import fast_router, VECTOR_SEARCH, GRAPH_QUERY
+from Prompts.prompt_template import create_few_shot_prompt, create_few_shot_prompt_with_context, format_context, use_examples
 from Prompts.prompt_examples import examples
 from Prompts.prompt_formatter import create_formatter_prompt
 from Graph.state import GraphState
+from Graph.labels import TEMPLATE_QUERY
 from Tools.parse_vector_search import DocumentModel, Metadata
+from Tools.result_formatter import result_formatter
+from Tools.tracing import get_logger
 
-neo4j_url = os.environ.get("NEO4J_URI")
-neo4j_user = os.environ.get("NEO4J_USERNAME")
-neo4j_pwd = os.environ.get("NEO4J_PASSWORD")
+logger = get_logger("nodes")
 
-graph = Neo4jGraph(
-    url=neo4j_url,
-    username=neo4j_user,
-    password=neo4j_pwd
-)
-
-api_key = os.environ.get("OPENAI_API_KEY")
-
-# Initialize the appropriate LLM based on provider
-if (api_key != ""):
-    llm = ChatOpenAI(
-        model=os.environ.get("OPENAI_GENERATIVE_MODEL"), 
-        temperature=0,
-        api_key=api_key
-    )
-else:
-    raise ValueError("Please set your OpenAI API Key in .env file")
+# The formatter prompt holds no per-request data, so it is built once
+format_prompt = create_formatter_prompt()
 
 def decomposer(state: GraphState):
     
     '''Returns a dictionary of at least one of the GraphState'''    
     '''Decompose a given question to sub-queries'''
-    print("Decomposer Node:")
+    logger.debug("Decomposer node")
     question = state["question"]
-    print(f"question: {question}")
-    subqueries = query_analyzer.invoke(question)
+    logger.debug("Question: %s", question)
+    subqueries = get_query_analyzer().invoke(question)
     # print({"subqueries": subqueries, "question":question})
     return {"subqueries": subqueries, "question":question}
     
@@ -50,7 +39,7 @@ def vector_search(state: GraphState):
     
     ''' Returns a dictionary of at least one of the GraphState'''
     ''' Perform a vector similarity search and return article id as a parsed output'''
-    print("Vector Search Node:")
+    logger.debug("Vector Search node")
     question = state["question"]
     queries = state["subqueries"]
     # print(f"question: {question}")
@@ -58,13 +47,13 @@ def vector_search(state: GraphState):
     
     vector_graph_chain = get_vector_graph_chain()
     # print(vector_graph_chain)
-    print("Begin vector graph chain")
     chain_result = vector_graph_chain.invoke({
         "query": queries[0].sub_query},
     )
-    print("End vector graph chain")
+    return parse_vector_search(chain_result, question, queries)
 
-    # Convert the result to a list of DocumentModel instances
+def parse_vector_search(chain_result, question, queries):
+    '''Convert the retrieval chain's source documents to the article ids and documents of the GraphState'''
     documents = []
     for doc in chain_result['source_documents']:
         temp_doc = DocumentModel(
@@ -91,13 +80,15 @@ def vector_search(state: GraphState):
     extracted_data = [{"title": doc.extract_title(), "omid": doc.metadata.omid, "year": doc.metadata.year} for doc in documents]
     article_ids = [{"omid": doc.metadata.omid, "title": doc.extract_title()} for doc in documents]
     # print({"article_ids": article_ids, "documents": extracted_data, "question":question, "subqueries": queries})
-    return {"article_ids": article_ids, "documents": extracted_data, "question":question, "subqueries": queries}
+    # Seconds spent in each retrieval lane (Chains/vector_graph_chain.py)
+    timings = chain_result.get("timings", {})
+    return {"article_ids": article_ids, "documents": extracted_data, "question":question, "subqueries": queries, "timings": timings}
 
 def prompt_template(state: GraphState):
     
     '''Returns a dictionary of at least one of the GraphState'''
     '''Create a simple prompt tempalate for graph qa chain'''
-    print("Prompt Template Node:")
+    logger.debug("Prompt Template node")
     question = state["question"]
 
     # Create a prompt template
@@ -109,30 +100,34 @@ def graph_qa(state: GraphState):
     
     ''' Returns a dictionary of at least one of the GraphState '''
     ''' Invoke a Graph QA Chain '''
-    print("Graph QA Node:")
+    logger.debug("Graph QA node")
     question = state["question"]
-    print(f"State: {state}")
-    graph_qa_chain = get_graph_qa_chain(state)
-    # print(f"Graph QA Chain: {graph_qa_chain}")
-    result = graph_qa_chain.invoke(
-        {
-            #"context": graph.schema, 
-            "query": question,
-        },
-    )
+    logger.debug("State: %s", state)
+    # Reuses cached Cypher for this question and prompt; otherwise generates it with the shared chain
+    result = invoke_graph_qa_chain(get_graph_qa_chain(), state["prompt"], question)
     return {"documents": result, "question":question}
     
+def template_query(state: GraphState):
+    '''Run the precompiled Cypher of a question matched by a query template, without the LLM'''
+    logger.debug("Template Query node")
+    question = state["question"]
+    match = query_templates.match(question, count=False)
+    if match is None:
+        # The entity index was rebuilt since routing and no longer knows the name
+        return graph_qa({**state, **prompt_template(state)})
+    return {"documents": run_template(question, match), "question": question}
+
 def prompt_template_with_context(state: GraphState):
     
     '''Returns a dictionary of at least one of the GraphState'''
     '''Create a dynamic prompt template for graph qa with context chain'''
-    print("Prompt Template with Context Node:")
+    logger.debug("Prompt Template with Context node")
     question = state["question"]
     queries = state["subqueries"]
-    print(f"State: {state}")
+    logger.debug("State: %s", state)
 
-    # Create a prompt template
-    prompt_with_context = create_few_shot_prompt_with_context(state)
+    # Get the prompt template; the vector search context is passed as an input in graph_qa_with_context
+    prompt_with_context = create_few_shot_prompt_with_context()
     
     return {"prompt_with_context": prompt_with_context, "question":question, "subqueries": queries}
 
@@ -144,31 +139,39 @@ def graph_qa_with_context(state: GraphState):
     queries = state["subqueries"]
     prompt_with_context = state["prompt_with_context"]
 
-    # Instantiate graph_qa_chain_with_context
-    # Pass the GraphState as 'state'. This chain uses state['prompt'] as input argument
-    graph_qa_chain = get_graph_qa_chain_with_context(state)
-    
-    result = graph_qa_chain.invoke(
-        {
-            "query": queries[1].sub_query,
-        },
-    )
+    # The shared graph_qa_chain_with_context takes the article ids from vector search as the 'context' input
+    context = format_context(state["article_ids"])
+    result = invoke_graph_qa_chain(get_graph_qa_chain_with_context(), prompt_with_context, queries[1].sub_query, context)
     return {"documents": result, "prompt_with_context":prompt_with_context, "subqueries": queries}
 
 def format_response(state: GraphState):
     """Format the raw response into a user-friendly output using full context from GraphState"""
-    print("Format Response Node:")
-    
+    logger.debug("Format Response node")
+    question = state["question"]
+    # Simple results are rendered with templates; the others are formatted by the LLM
+    formatted_response = template_response(state)
+    if formatted_response is None:
+        formatted_response = get_llm().invoke(format_prompt.format(**formatter_inputs(state))).content  # Using the shared llm client
+    return {"documents": formatted_response, "question": question, "formatted_response": formatted_response}
+
+def template_response(state: GraphState):
+    '''Templated answer for a simple result (Tools/result_formatter.py), or None to call the formatter LLM'''
+    raw_response = state["documents"]
+    raw_result = raw_response["result"] if isinstance(raw_response, dict) and "result" in raw_response else raw_response
+    has_subqueries = state.get("subqueries") is not None
+    formatted_response = result_formatter.format(state["question"], raw_result, vector_search=has_subqueries)
+    logger.debug("Formatter: %s", result_formatter.stats())
+    return formatted_response
+
+def formatter_inputs(state: GraphState):
+    '''Formatter prompt inputs from the full context in the GraphState'''
     # Extract all relevant information from state
     raw_response = state["documents"]
     question = state["question"]
     has_subqueries = "subqueries" in state and state["subqueries"] is not None
     article_context = state.get("article_ids", [])
     
-    # Use existing LLM instance and get formatter prompt
-    format_prompt = create_formatter_prompt()
-    
-    # Format the response
+    # Unwrap the result of the graph QA chain
     if isinstance(raw_response, dict) and "result" in raw_response:
         raw_result = raw_response["result"]
     else:
@@ -184,15 +187,127 @@ def format_response(state: GraphState):
     if article_context:
         article_context_info = f"Articles Found in Context:\n{article_context}"
     
-    formatted_response = llm.invoke(  # Using the existing llm from nodes.py
-        format_prompt.format(
-            question=question,
-            query_type="Vector Search + Graph Query" if has_subqueries else "Direct Graph Query",
-            result=str(raw_result),
-            vector_search=str(has_subqueries),
-            subqueries_info=subqueries_info,
-            article_context_info=article_context_info
-        )
+    return dict(
+        question=question,
+        query_type="Vector Search + Graph Query" if has_subqueries else "Direct Graph Query",
+        result=str(raw_result),
+        vector_search=str(has_subqueries),
+        subqueries_info=subqueries_info,
+        article_context_info=article_context_info
     )
-    
-    return {"documents": formatted_response.content, "question": question, "formatted_response": formatted_response.content}
\ No newline at end of file
+
+# Async versions of the nodes that call the LLM or Neo4j, for the async workflow (Graph/graph.py async_app).
+# prompt_template and prompt_template_with_context do no I/O and are shared by both workflows.
+
+async def adecomposer(state: GraphState):
+    '''Decompose a given question to sub-queries'''
+    logger.debug("Decomposer node")
+    question = state["question"]
+    subqueries = await (await registry.aget(QUERY_ANALYZER)).ainvoke(question)
+    return {"subqueries": subqueries, "question":question}
+
+async def avector_search(state: GraphState):
+    '''Perform a vector similarity search and return article id as a parsed output'''
+    logger.debug("Vector Search node")
+    queries = state["subqueries"]
+    vector_graph_chain = await registry.aget(VECTOR_GRAPH_CHAIN)
+    chain_result = await vector_graph_chain.ainvoke({"query": queries[0].sub_query})
+    return parse_vector_search(chain_result, state["question"], queries)
+
+async def agraph_qa(state: GraphState):
+    '''Invoke the Graph QA chain with the async LLM and Neo4j clients'''
+    logger.debug("Graph QA node")
+    question = state["question"]
+    graph_qa_chain = await registry.aget(GRAPH_QA_CHAIN)
+    # The examples selected by the speculate node are not selected again
+    with use_examples(question, state.get("examples")):
+        result = await ainvoke_graph_qa_chain(graph_qa_chain, state["prompt"], question)
+    return {"documents": result, "question":question}
+
+async def atemplate_query(state: GraphState):
+    '''template_query with the async Neo4j driver'''
+    logger.debug("Template Query node")
+    question = state["question"]
+    match = await query_templates.amatch(question, count=False)
+    if match is None:
+        return await agraph_qa({**state, **prompt_template(state)})
+    return {"documents": await arun_template(question, match), "question": question}
+
+async def agraph_qa_with_context(state: GraphState):
+    '''Invoke the Graph QA chain with context with the async LLM and Neo4j clients'''
+    queries = state["subqueries"]
+    prompt_with_context = state["prompt_with_context"]
+    context = format_context(state["article_ids"])
+    graph_qa_chain = await registry.aget(GRAPH_QA_CHAIN_WITH_CONTEXT)
+    result = await ainvoke_graph_qa_chain(graph_qa_chain, prompt_with_context, queries[1].sub_query, context)
+    return {"documents": result, "prompt_with_context":prompt_with_context, "subqueries": queries}
+
+async def aformat_response(state: GraphState):
+    '''Format the raw response into a user-friendly output with the async LLM client'''
+    logger.debug("Format Response node")
+    question = state["question"]
+    formatted_response = template_response(state)
+    if formatted_response is None:
+        formatted_response = (await (await registry.aget(LLM)).ainvoke(format_prompt.format(**formatter_inputs(state)))).content
+    return {"documents": formatted_response, "question": question, "formatted_response": formatted_response}
+
+async def aspeculate(state: GraphState):
+    '''
+    Entry node of the speculative workflow: starts routing, decomposition (needed by vector search)
+    and few-shot example selection (needed by graph QA) together instead of one after the other.
+    Once the route is known, the step of the other branch is cancelled. When the local router is
+    already confident, only the step of its branch is started.
+
+    The selected examples are passed to the graph QA node in the "examples" state field, so the
+    Cypher prompt does not select them again.
+    '''
+    logger.debug("Speculate node")
+    question = state["question"]
+    # Questions with a query template need neither the router nor the speculative steps
+    if await query_templates.amatch(question):
+        return {"datasource": TEMPLATE_QUERY, "question": question}
+    start_time = time.perf_counter()
+    timings = {}
+
+    async def timed(name, step):
+        step_start = time.perf_counter()
+        result = await step
+        timings[name] = time.perf_counter() - step_start
+        return result
+
+    async def decompose():
+        return await (await registry.aget(QUERY_ANALYZER)).ainvoke(question)
+
+    async def select_examples():
+        return await (await registry.aget(EXAMPLE_SELECTOR)).aselect_examples({"question": question})
+
+    decision = fast_router.classify(question)
+    local_datasource = decision[0]
+    tasks = {}
+    if local_datasource != GRAPH_QUERY:
+        tasks[VECTOR_SEARCH] = asyncio.create_task(timed("decompose", decompose()))
+    if local_datasource != VECTOR_SEARCH:
+        tasks[GRAPH_QUERY] = asyncio.create_task(timed("few_shot", select_examples()))
+    try:
+        # Routed on the same local decision, so the branch started above is the one that is kept
+        datasource = await timed("route", fast_router.aroute(question, decision))
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        raise
+
+    # Cancel the losing branch; the winning branch's step keeps running and is awaited
+    for branch, task in tasks.items():
+        if branch != datasource and task.cancel():
+            timings["cancelled"] = "decompose" if branch == VECTOR_SEARCH else "few_shot"
+    update = {"datasource": datasource, "question": question}
+    if datasource == VECTOR_SEARCH:
+        update["subqueries"] = await (tasks.get(VECTOR_SEARCH) or timed("decompose", decompose()))
+    elif GRAPH_QUERY in tasks:
+        update["examples"] = await tasks[GRAPH_QUERY]
+
+    # Sequentially the route would be decided before its branch's step starts
+    timings["saved"] = timings["route"] + timings.get("decompose" if datasource == VECTOR_SEARCH else "few_shot", 0) - (time.perf_counter() - start_time)
+    timings = {name: round(value, 4) if isinstance(value, float) else value for name, value in timings.items()}
+    logger.debug("Speculation: %s", timings)
+    return {**update, "timings": {f"speculate.{name}": value for name, value in timings.items()}}
@@ -1,4 +1,9 @@
-from typing import List, TypedDict
+from typing import Annotated, List, TypedDict
+
+
+def merge_timings(left, right):
+    '''Reducer for GraphState.timings: each node adds its own entries'''
+    return {**(left or {}), **(right or {})}
 
 
 class GraphState(TypedDict):
@@ -12,6 +17,9 @@ class GraphState(TypedDict):
         prompt: prompt template object
         prompt_with_context: prompt template with context from vector search
         subqueries: decomposed queries
+        datasource: route decided by the speculate node
+        examples: few-shot examples selected by the speculate node for the Cypher prompt
+        timings: seconds spent per node (and per speculative step)
     """
 
     question: str
@@ -20,4 +28,7 @@ class GraphState(TypedDict):
     prompt: object
     prompt_with_context: object
     subqueries: object
-    formatted_response: str
\ No newline at end of file
+    formatted_response: str
+    datasource: str
+    examples: list
+    timings: Annotated[dict, merge_timings]
\ No newline at end of file
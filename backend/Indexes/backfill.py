@@ -0,0 +1,254 @@
+"""
+Backfill job for the node embeddings used by the vector indexes in Indexes/index.py.
+
+Neo4jVector.from_existing_graph embeds every node that has no embedding when an index is first
+opened, 1000 nodes at a time, so the first vector search after a large ingest can block for a
+long time. This job does the same work ahead of time:
+- nodes missing an embedding are paged through in key order (Publication.omid, Author.name),
+  using the uniqueness constraint indexes
+- each page is embedded in batches on several threads; rate limit, timeout and connection
+  errors pause all workers and are retried with exponential backoff (or the Retry-After delay)
+- vectors are written back with one UNWIND ... setNodeVectorProperty query per batch
+- the last key of every finished page is saved to a JSON checkpoint, so an interrupted run
+  resumes where it stopped; a label that completes is reset, so the next run (e.g. after an
+  ingest) pages through its nodes from the start and embeds the new ones
+
+The node text is built exactly as from_existing_graph builds it, so backfilled and
+index-created embeddings are interchangeable. With --model local-hashing (see
+Indexes/local_embeddings.py) the job runs without the OpenAI API.
+
+Usage (in the backend folder):
+    python -m Indexes.backfill
+    python -m Indexes.backfill --labels Publication --batch-size 512 --workers 8
+    python -m Indexes.backfill --model local-hashing --restart
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import openai
+from dotenv import load_dotenv
+from langchain_openai import OpenAIEmbeddings
+from neo4j import GraphDatabase
+
+from Indexes.local_embeddings import HashingEmbeddings, LOCAL_EMBEDDING_MODEL
+from Indexes.schema import bump_graph_version
+
+load_dotenv()
+
+EMBEDDING_NODE_PROPERTY = 'openai_embedding_vectors'
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".cache")
+CHECKPOINT_PATH = os.path.join(CACHE_DIR, "backfill_checkpoint.json")
+
+# Node label -> paging key, embedded properties and vector index (as in Indexes/index.py)
+TARGETS = {
+    "Publication": {"key": "omid", "properties": ["title", "venue"], "index": "publication_title_vector_openai"},
+    "Author": {"key": "name", "properties": ["name"], "index": "author_name_vector"},
+}
+
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError)
+MAX_RETRIES = 8
+MAX_DELAY = 60
+
+
+def fetch_query(label):
+    target = TARGETS[label]
+    return (
+        f"MATCH (n:`{label}`) "
+        f"WHERE n.{target['key']} > $after AND n.{EMBEDDING_NODE_PROPERTY} IS NULL "
+        "AND any(k IN $props WHERE n[k] IS NOT NULL) "
+        f"RETURN n.{target['key']} AS key, "
+        "reduce(str='', k IN $props | str + '\\n' + k + ':' + coalesce(n[k], '')) AS text "
+        f"ORDER BY n.{target['key']} LIMIT $limit"
+    )
+
+
+def write_query(label):
+    return (
+        "UNWIND $rows AS row "
+        f"MATCH (n:`{label}` {{{TARGETS[label]['key']}: row.key}}) "
+        "CALL db.create.setNodeVectorProperty(n, $property, row.embedding) "
+        # Stamp for the incremental sync of the vector replica (Indexes/vector_replica.py)
+        "SET n.embedded_at = timestamp() "
+        "RETURN count(*) AS written"
+    )
+
+
+def build_embeddings(model):
+    '''Embedding model for the backfill; OpenAI retries are disabled so rate limits reach the shared backoff'''
+    if model == LOCAL_EMBEDDING_MODEL:
+        return HashingEmbeddings()
+    return OpenAIEmbeddings(model=model, max_retries=0)
+
+
+def retry_after_seconds(error):
+    '''Delay requested by the API in a Retry-After header, if any'''
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class Backoff:
+    """
+    Rate limit backoff shared by the embedding workers: when one request is rate limited, every
+    worker waits before its next request instead of adding to the overload.
+    """
+
+    def __init__(self, max_retries=MAX_RETRIES, max_delay=MAX_DELAY):
+        self.max_retries = max_retries
+        self.max_delay = max_delay
+        self.resume_at = 0.0
+        self.retries = 0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            delay = self.resume_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def pause(self, error, attempt):
+        delay = retry_after_seconds(error) or min(2 ** attempt * (1 + random.random()), self.max_delay)
+        with self.lock:
+            self.resume_at = max(self.resume_at, time.monotonic() + delay)
+            self.retries += 1
+        print(f"{type(error).__name__}, retrying in {delay:.1f} s")
+
+    def call(self, function, *args):
+        for attempt in range(self.max_retries + 1):
+            self.wait()
+            try:
+                return function(*args)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                self.pause(e, attempt)
+
+
+def load_checkpoint(path, model):
+    '''Per-label progress of an earlier run with the same model, or an empty checkpoint'''
+    if os.path.exists(path):
+        with open(path) as file:
+            checkpoint = json.load(file)
+        if checkpoint.get("model") == model:
+            return checkpoint
+        print(f"Ignoring checkpoint for model {checkpoint.get('model')}")
+    return {"model": model, "labels": {}}
+
+
+def save_checkpoint(path, checkpoint):
+    '''Write the checkpoint atomically, so an interruption never leaves a partial file'''
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".tmp", "w") as file:
+        json.dump(checkpoint, file, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def backfill_label(driver, label, embeddings, checkpoint, checkpoint_path, page_size, batch_size, workers, backoff):
+    '''
+    Embed all nodes of a label that have no embedding, resuming an interrupted run from the checkpoint.
+
+    Returns:
+        int: Number of nodes embedded in this run.
+    '''
+    progress = checkpoint["labels"].setdefault(label, {"after": "", "embedded": 0})
+    # Checkpoints of completed runs used to be kept with done=True; they hold nothing to resume
+    if progress.pop("done", False):
+        progress["after"] = ""
+
+    props = TARGETS[label]["properties"]
+    embedded = 0
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            rows = driver.execute_query(
+                fetch_query(label), after=progress["after"], props=props, limit=page_size
+            ).records
+            if not rows:
+                break
+
+            batches = [rows[start:start + batch_size] for start in range(0, len(rows), batch_size)]
+            futures = {
+                executor.submit(backoff.call, embeddings.embed_documents, [row["text"] for row in batch]): batch
+                for batch in batches
+            }
+            for future in as_completed(futures):
+                batch = futures[future]
+                driver.execute_query(
+                    write_query(label),
+                    rows=[{"key": row["key"], "embedding": vector} for row, vector in zip(batch, future.result())],
+                    property=EMBEDDING_NODE_PROPERTY,
+                )
+
+            # The page is fully written: later runs continue after its last key
+            embedded += len(rows)
+            progress["after"] = rows[-1]["key"]
+            progress["embedded"] += len(rows)
+            save_checkpoint(checkpoint_path, checkpoint)
+            seconds = time.perf_counter() - start_time
+            print(f"{label}: {progress['embedded']} nodes embedded ({embedded / seconds:.1f} nodes/s)")
+            if len(rows) < page_size:
+                break
+
+    # Only interrupted runs resume: the next run looks for nodes ingested since from the first key
+    progress["after"] = ""
+    save_checkpoint(checkpoint_path, checkpoint)
+    if not embedded:
+        print(f"{label}: no node without an embedding ({progress['embedded']} embedded so far)")
+    return embedded
+
+
+def create_vector_index(driver, label, dimension):
+    '''Create the label's vector index if missing, as Neo4jVector would on first use'''
+    target = TARGETS[label]
+    driver.execute_query(
+        f"CREATE VECTOR INDEX {target['index']} IF NOT EXISTS "
+        f"FOR (n:`{label}`) ON (n.{EMBEDDING_NODE_PROPERTY}) "
+        f"OPTIONS {{indexConfig: {{`vector.dimensions`: {int(dimension)}, `vector.similarity_function`: 'cosine'}}}}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill the node embeddings used by the vector indexes.")
+    parser.add_argument("--labels", nargs="+", choices=list(TARGETS), default=list(TARGETS))
+    parser.add_argument("--model", default=os.environ.get("OPENAI_EMBEDDING_MODEL"),
+                        help=f"Embedding model, or {LOCAL_EMBEDDING_MODEL} to embed locally")
+    parser.add_argument("--page-size", type=int, default=4096, help="Nodes fetched and checkpointed at a time")
+    parser.add_argument("--batch-size", type=int, default=256, help="Texts per embedding request")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent embedding requests")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start from the first node")
+    parser.add_argument("--create-index", action="store_true", help="Create missing vector indexes afterwards")
+    args = parser.parse_args()
+
+    embeddings = build_embeddings(args.model)
+    checkpoint = {"model": args.model, "labels": {}} if args.restart else load_checkpoint(args.checkpoint, args.model)
+    backoff = Backoff()
+    driver = GraphDatabase.driver(
+        os.environ.get('NEO4J_URI'), auth=(os.environ.get('NEO4J_USERNAME'), os.environ.get('NEO4J_PASSWORD'))
+    )
+    try:
+        start_time = time.perf_counter()
+        for label in args.labels:
+            backfill_label(driver, label, embeddings, checkpoint, args.checkpoint,
+                           args.page_size, args.batch_size, args.workers, backoff)
+        # Vector search results, and the answers cached from them, change with the embeddings
+        print(f"Graph version: {bump_graph_version(driver)}")
+        if args.create_index:
+            dimension = len(embeddings.embed_query("dimension"))
+            for label in args.labels:
+                create_vector_index(driver, label, dimension)
+        print(f"Backfill finished in {time.perf_counter() - start_time:.1f} s "
+              f"({backoff.retries} rate limit retries): {checkpoint['labels']}")
+    finally:
+        driver.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+from Indexes.local_embeddings import HashingEmbeddings, LOCAL_EMBEDDING_MODEL
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".cache")
+EMBEDDING_CACHE_DIR = os.environ.get("EMBEDDING_CACHE_DIR", os.path.join(CACHE_DIR, "embeddings"))
+EMBEDDING_CACHE_SIZE = int(os.environ.get("EMBEDDING_CACHE_SIZE", "4096"))
+# Keys bound per SQLite statement, below the bound-variable limit of older SQLite builds (999)
+KEY_CHUNK_SIZE = 500
+
+
+def text_key(model, text):
+    '''Content address of an embedding: hash of the model name and the text'''
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Append-only float32 matrix on disk, one row per embedding, read through a memory map.
+
+    A SQLite index maps text keys to rows. Rows are allocated inside a write transaction and
+    written at their own offset, so several processes can share one store.
+    """
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.db = sqlite3.connect(os.path.join(directory, "index.sqlite"), check_same_thread=False, isolation_level=None)
+        self.db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, row INTEGER)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+        open(self.vectors_path, "ab").close()
+        self.dimension = self._meta("dimension")
+        self.vectors = None
+        self.lock = threading.Lock()
+
+    def _meta(self, name):
+        row = self.db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _rows(self, needed):
+        '''Memory map covering at least `needed` rows, remapped when other writers have grown the file'''
+        if self.vectors is None or len(self.vectors) < needed:
+            rows = os.path.getsize(self.vectors_path) // (4 * self.dimension)
+            self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dimension)) if rows else None
+        return self.vectors
+
+    def _stored_rows(self, keys):
+        '''{key: row} of the stored keys, queried in chunks of KEY_CHUNK_SIZE keys'''
+        found = {}
+        for start in range(0, len(keys), KEY_CHUNK_SIZE):
+            chunk = keys[start:start + KEY_CHUNK_SIZE]
+            found.update(self.db.execute(
+                f"SELECT key, row FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall())
+        return found
+
+    def get_many(self, keys):
+        '''Return {key: vector} for the keys that are stored'''
+        if not keys:
+            return {}
+        with self.lock:
+            if self.dimension is None:
+                # The store was empty when it was opened; another process may have filled it since
+                self.dimension = self._meta("dimension")
+                if self.dimension is None:
+                    return {}
+            found = self._stored_rows(keys)
+            if not found:
+                return {}
+            vectors = self._rows(max(found.values()) + 1)
+            return {key: np.array(vectors[row]) for key, row in found.items()}
+
+    def put_many(self, items):
+        '''Store {key: vector}; keys that are already stored are skipped'''
+        if not items:
+            return
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                dimension = self._meta("dimension")
+                if dimension is None:
+                    dimension = len(next(iter(items.values())))
+                    self.db.execute("INSERT INTO meta VALUES ('dimension', ?)", (dimension,))
+                self.dimension = dimension
+                next_row = self.db.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM embeddings").fetchone()[0]
+                stored = self._stored_rows(list(items))
+                new_keys = [key for key in items if key not in stored]
+                if new_keys:
+                    matrix = np.asarray([items[key] for key in new_keys], dtype=np.float32)
+                    if matrix.shape[1] != dimension:
+                        raise ValueError(f"Embedding dimension {matrix.shape[1]} does not match the store ({dimension})")
+                    fd = os.open(self.vectors_path, os.O_WRONLY)
+                    try:
+                        os.pwrite(fd, matrix.tobytes(), next_row * dimension * 4)
+                    finally:
+                        os.close(fd)
+                    self.db.executemany("INSERT INTO embeddings VALUES (?, ?)",
+                                        [(key, next_row + i) for i, key in enumerate(new_keys)])
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that looks each text up by (model, text) hash in an in-memory LRU, then in
+    the on-disk EmbeddingStore, and only sends the remaining texts to the wrapped model.
+    """
+
+    def __init__(self, embeddings, model, directory=EMBEDDING_CACHE_DIR, capacity=EMBEDDING_CACHE_SIZE):
+        self.embeddings = embeddings
+        self.model = model
+        self.store = EmbeddingStore(os.path.join(directory, hashlib.sha256(str(model).encode("utf-8")).hexdigest()[:16]))
+        self.capacity = capacity
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def _lookup(self, texts):
+        keys = [text_key(self.model, text) for text in texts]
+        vectors = {}
+        with self.lock:
+            for key in keys:
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    vectors[key] = self.memory[key]
+        vectors.update(self.store.get_many([key for key in set(keys) if key not in vectors]))
+        return keys, vectors
+
+    def _remember(self, vectors):
+        with self.lock:
+            for key, vector in vectors.items():
+                self.memory[key] = vector
+                self.memory.move_to_end(key)
+            while len(self.memory) > self.capacity:
+                self.memory.popitem(last=False)
+
+    def _embed(self, texts, embed_missing):
+        keys, vectors = self._lookup(texts)
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        if missing:
+            embedded = embed_missing(list(missing.values()))
+            new_vectors = {key: np.asarray(vector, dtype=np.float32) for key, vector in zip(missing, embedded)}
+            self.store.put_many(new_vectors)
+            vectors.update(new_vectors)
+        self._remember({key: vectors[key] for key in set(keys)})
+        with self.lock:
+            self.misses += len(missing)
+            self.hits += len(texts) - len(missing)
+        return [vectors[key].tolist() for key in keys]
+
+    def embed_documents(self, texts):
+        return self._embed(list(texts), self.embeddings.embed_documents)
+
+    def embed_query(self, text):
+        return self._embed([text], lambda texts: [self.embeddings.embed_query(texts[0])])[0]
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self.memory),
+            }
+
+
+_cached_embeddings = {}
+_cached_embeddings_lock = threading.Lock()
+
+
+def get_cached_embeddings(model):
+    '''Shared CachedEmbeddings around OpenAIEmbeddings (or the local hashing model) for a model, so every user of the model shares one cache'''
+    with _cached_embeddings_lock:
+        if model not in _cached_embeddings:
+            embeddings = HashingEmbeddings() if model == LOCAL_EMBEDDING_MODEL else OpenAIEmbeddings(model=model)
+            _cached_embeddings[model] = CachedEmbeddings(embeddings, model)
+        return _cached_embeddings[model]
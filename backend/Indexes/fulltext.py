@@ -0,0 +1,330 @@
+"""
+Keyword search over publication titles and venues, a retrieval lane beside the vector index.
+
+Many vector search questions are keyword lookups ("articles about photosynthesis"): matching the
+words of the sub-query against titles and venues finds the same articles without embedding the
+query. The question words ("find", "articles", "about", ...) are dropped, plurals are reduced to
+the singular, and the remaining keywords are searched in one of:
+- the Neo4j fulltext index publication_fulltext on title and venue (graph_database_setup/schema.py)
+- a local Okapi BM25 inverted index built from the metadata snapshot
+  (graph_database_setup/metadata_snapshot.py), when FULLTEXT_BACKEND=local or the Neo4j index
+  does not exist (the schema was not set up); it holds the publications of the metadata CSV.
+  Other Neo4j errors (connection, timeout) fall back to it for FULLTEXT_RETRY_INTERVAL seconds
+  only, after which Neo4j is tried again
+
+Both return the same documents as the vector index (title and venue as text, the other
+properties as metadata), so Graph/nodes.py parse_vector_search reads them unchanged.
+
+Usage (in the backend folder):
+    python -m Indexes.fulltext "articles about photosynthesis"   # search the local index
+"""
+import argparse
+import asyncio
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from Indexes.vector_replica import METADATA_FIELDS
+from Tools.tracing import get_logger
+
+# The metadata snapshot is shared with the loader in graph_database_setup/ (next to backend/)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from graph_database_setup.metadata_snapshot import LIST_SEPARATOR, load_metadata_snapshot
+
+logger = get_logger("fulltext")
+
+# "neo4j" searches the Neo4j fulltext index (the local index when it fails); "local" the local BM25 index
+FULLTEXT_BACKEND = os.environ.get("FULLTEXT_BACKEND", "neo4j")
+# Seconds the local index serves the searches after a transient Neo4j error, before Neo4j is tried again
+FULLTEXT_RETRY_INTERVAL = float(os.environ.get("FULLTEXT_RETRY_INTERVAL", "30"))
+
+FULLTEXT_INDEX_NAME = "publication_fulltext"
+# Okapi BM25 term frequency saturation and length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+FULLTEXT_QUERY = (
+    "CALL db.index.fulltext.queryNodes($index, $search, {limit: $k}) YIELD node, score "
+    "RETURN node.omid AS omid, "
+    + ", ".join(f"node.{field} AS {field}" for field in METADATA_FIELDS)
+    + ", score"
+)
+
+TOKEN = re.compile(r"[^\W_]+")
+# Error of db.index.fulltext.queryNodes when the index does not exist
+MISSING_INDEX = re.compile(r"no such fulltext (?:schema )?index", re.IGNORECASE)
+
+
+def stem(token):
+    '''Reduce a plural to its singular ("proteins" -> "protein"), the same way for documents and queries'''
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+# Words of the question rather than of the topic
+QUERY_STOPWORDS = frozenset(stem(word) for word in """
+    a about all an and any are article as at be by concerning discuss discussing find for from get give in into is it
+    list me mention mentioning of on or paper publication published regarding related relating search show similar
+    some that the their there these this those to topic what which with work
+""".split())
+
+
+def tokenize(text):
+    return [stem(token) for token in TOKEN.findall((text or "").lower())]
+
+
+def keywords(query):
+    '''Distinct terms of a query, without the question words'''
+    return list(dict.fromkeys(token for token in tokenize(query) if token not in QUERY_STOPWORDS))
+
+
+def lucene_query(terms):
+    '''Lucene query matching any of the terms, singular or plural (the tokens hold no Lucene syntax)'''
+    return " OR ".join(f"({term} OR {term}*)" for term in terms)
+
+
+def publication_document(publication):
+    '''Document of a publication, as returned by the vector index'''
+    metadata = {key: value for key, value in publication.items() if key in ["omid"] + METADATA_FIELDS and key not in ("title", "venue") and value is not None}
+    return Document(page_content=f"\ntitle: {publication.get('title') or ''}\nvenue: {publication.get('venue') or ''}", metadata=metadata)
+
+
+class BM25Index:
+    """
+    Inverted index of tokenized texts scored with Okapi BM25. The postings of each term are
+    contiguous slices of two arrays (the document rows and their precomputed term weight), so a
+    search adds up one slice per query term.
+    """
+
+    def __init__(self, texts, k1=BM25_K1, b=BM25_B):
+        vocabulary = {}
+        postings = []
+        lengths = []
+        for row, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                postings.append((vocabulary.setdefault(term, len(vocabulary)), row, count))
+        self.vocabulary = vocabulary
+        self.size = len(lengths)
+        terms, rows, counts = (np.array(column, dtype=np.int64) for column in zip(*postings)) if postings else (np.zeros(0, dtype=np.int64),) * 3
+        order = np.argsort(terms, kind="stable")
+        self.rows = rows[order].astype(np.int32)
+        self.offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(vocabulary)), out=self.offsets[1:])
+
+        lengths = np.array(lengths, dtype=np.float32)
+        average_length = lengths.mean() if len(lengths) and lengths.mean() > 0 else 1.0
+        tf = counts[order].astype(np.float32)
+        self.weights = tf * (k1 + 1) / (tf + k1 * (1 - b + b * lengths[self.rows] / average_length))
+        frequencies = np.diff(self.offsets).astype(np.float32)
+        self.idf = np.log1p((self.size - frequencies + 0.5) / (frequencies + 0.5))
+
+    def search(self, terms, k):
+        '''Rows and scores of the k best matching texts, best first; texts without any term are left out'''
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in terms:
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            scores[self.rows[start:end]] += self.idf[term_id] * self.weights[start:end]
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return candidates, scores[candidates]
+
+
+class LocalFulltextIndex:
+    """BM25 index of publication titles and venues, with the publications it returns."""
+
+    def __init__(self, publications):
+        self.publications = publications
+        self.index = BM25Index(f"{publication.get('title') or ''} {publication.get('venue') or ''}" for publication in publications)
+
+    def __len__(self):
+        return len(self.publications)
+
+    @classmethod
+    def from_snapshot(cls):
+        '''Index the publications of the metadata snapshot, building the snapshot first if needed'''
+        start_time = time.perf_counter()
+        df = load_metadata_snapshot().to_pandas(["omid", "title", "venue", "publisher", "pub_year", "pub_month", "pub_day"])
+        df = df[df["omid"].notna()]
+        publications = []
+        for omid, title, venue, publisher, year, month, day in df.itertuples(index=False):
+            publications.append({
+                "omid": omid, "title": title,
+                # Venue and publisher are split into lists in the snapshot; the graph holds the CSV strings
+                "venue": LIST_SEPARATOR.join(venue) or None, "publisher": LIST_SEPARATOR.join(publisher) or None,
+                "year": None if np.isnan(year) else int(year),
+                "month": None if np.isnan(month) else int(month),
+                "day": None if np.isnan(day) else int(day),
+            })
+        index = cls(publications)
+        logger.info("Local fulltext index: %d publications indexed in %.2f seconds", len(index), time.perf_counter() - start_time)
+        return index
+
+    def search(self, terms, k):
+        rows, scores = self.index.search(terms, k)
+        return [(publication_document(self.publications[row]), float(score)) for row, score in zip(rows, scores)]
+
+
+class PublicationFulltextIndex:
+    """
+    Keyword search of publications on the Neo4j fulltext index, or on the local BM25 index, which
+    is built on first use. When the Neo4j index does not exist, the local index serves every later
+    search; after any other Neo4j error, only the searches of the next retry_interval seconds.
+    """
+
+    def __init__(self, query=None, aquery=None, load_local=LocalFulltextIndex.from_snapshot, backend=FULLTEXT_BACKEND,
+                 retry_interval=FULLTEXT_RETRY_INTERVAL):
+        self.query = query
+        self.aquery = aquery
+        self.load_local = load_local
+        self.backend = backend if query is not None else "local"
+        self.retry_interval = retry_interval
+        self.retry_at = 0.0
+        self.local = None
+        self.searches = 0
+        self.search_seconds = 0.0
+        self.local_searches = 0
+        self.missing_index = 0
+        self.neo4j_errors = 0
+        self.lock = threading.Lock()
+
+    def local_index(self):
+        with self.lock:
+            if self.local is None:
+                self.local = self.load_local()
+            return self.local
+
+    def use_neo4j(self):
+        return self.backend == "neo4j" and time.monotonic() >= self.retry_at
+
+    def fall_back(self, error):
+        '''Serve searches from the local index: for good when the Neo4j index is missing, else until the retry time'''
+        missing = bool(MISSING_INDEX.search(str(error)))
+        with self.lock:
+            if missing:
+                self.backend = "local"
+                self.missing_index += 1
+            else:
+                self.retry_at = time.monotonic() + self.retry_interval
+                self.neo4j_errors += 1
+        if missing:
+            logger.warning("Neo4j fulltext index %s does not exist, using the local index from now on: %s", FULLTEXT_INDEX_NAME, error)
+        else:
+            logger.warning("Neo4j fulltext search failed, using the local index for %g seconds: %s", self.retry_interval, error)
+
+    def record(self, start_time, local):
+        with self.lock:
+            self.searches += 1
+            self.search_seconds += time.perf_counter() - start_time
+            self.local_searches += local
+
+    def neo4j_params(self, terms, k):
+        return {"index": FULLTEXT_INDEX_NAME, "search": lucene_query(terms), "k": k}
+
+    def search(self, query, k=4):
+        '''(document, score) of the k publications whose title or venue best match the keywords of the query'''
+        terms = keywords(query)
+        if not terms:
+            return []
+        start_time = time.perf_counter()
+        local = False
+        try:
+            if self.use_neo4j():
+                try:
+                    return [(publication_document(row), row["score"]) for row in self.query(FULLTEXT_QUERY, self.neo4j_params(terms, k))]
+                except Exception as e:
+                    self.fall_back(e)
+            local = True
+            return self.local_index().search(terms, k)
+        finally:
+            self.record(start_time, local)
+
+    async def asearch(self, query, k=4):
+        '''search for the async workflow; the local index is searched (and built) in a worker thread'''
+        terms = keywords(query)
+        if not terms:
+            return []
+        start_time = time.perf_counter()
+        local = False
+        try:
+            if self.use_neo4j() and self.aquery is not None:
+                try:
+                    return [(publication_document(row), row["score"]) for row in await self.aquery(FULLTEXT_QUERY, self.neo4j_params(terms, k))]
+                except Exception as e:
+                    self.fall_back(e)
+            local = True
+            return await asyncio.get_running_loop().run_in_executor(None, lambda: self.local_index().search(terms, k))
+        finally:
+            self.record(start_time, local)
+
+    def as_retriever(self, k=4):
+        return FulltextRetriever(index=self, k=k)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "backend": self.backend,
+                "local_publications": len(self.local) if self.local is not None else 0,
+                "searches": self.searches,
+                "mean_search_ms": self.search_seconds / self.searches * 1000 if self.searches else 0.0,
+                "local_searches": self.local_searches,
+                # Searches that found no Neo4j index (the backend is then "local"), and other failed Neo4j searches
+                "missing_index": self.missing_index,
+                "neo4j_errors": self.neo4j_errors,
+                "retrying_neo4j": self.backend == "neo4j" and time.monotonic() < self.retry_at,
+            }
+
+
+class FulltextRetriever(BaseRetriever):
+    """LangChain retriever of the k best keyword matches, like the vector index's as_retriever()."""
+
+    index: Any
+    k: int = 4
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        return [document for document, _ in self.index.search(query, self.k)]
+
+    async def _aget_relevant_documents(self, query, *, run_manager):
+        return [document for document, _ in await self.index.asearch(query, self.k)]
+
+
+def get_publication_fulltext_index(query=None, aquery=None):
+    '''
+    Keyword search of publications. query(cypher, params) and aquery run a Cypher query and return
+    the rows as dicts; without them, only the local index is searched.
+    '''
+    return PublicationFulltextIndex(query, aquery)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search the local fulltext index of publication titles and venues.")
+    parser.add_argument("query")
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    index = LocalFulltextIndex.from_snapshot()
+    print(f"Keywords: {keywords(args.query)}")
+    start_time = time.perf_counter()
+    hits = index.search(keywords(args.query), args.k)
+    print(f"{len(hits)} hits in {(time.perf_counter() - start_time) * 1000:.2f} ms")
+    for document, score in hits:
+        print(f"{score:7.3f}  {document.metadata.get('omid')}  {document.page_content.strip()}")
+
+
+if __name__ == "__main__":
+    main()
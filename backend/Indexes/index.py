@@ -1,15 +1,22 @@
 import os
 import openai
 from langchain_community.vectorstores import Neo4jVector
-from langchain_openai import OpenAIEmbeddings
+
+from Indexes.embedding_cache import get_cached_embeddings
+from Tools.tracing import get_logger
+
+logger = get_logger("index")
 
 openai.api_key  = os.environ.get("OPENAI_API_KEY")
 
-if (openai.api_key != ""):
-    EMBEDDING_MODEL = OpenAIEmbeddings(model=os.environ.get("OPENAI_EMBEDDING_MODEL"))
-    EMBEDDING_NODE_PROPERTY = 'openai_embedding_vectors'
-else:
-    print("Please set your preferrable Generative AI provider in .env file")
+if (openai.api_key == ""):
+    logger.warning("Please set your preferrable Generative AI provider in .env file")
+
+EMBEDDING_NODE_PROPERTY = 'openai_embedding_vectors'
+
+def embedding_model():
+    '''OpenAIEmbeddings behind the persistent embedding cache, shared with the prompt example selector; created on first use'''
+    return get_cached_embeddings(os.environ.get("OPENAI_EMBEDDING_MODEL"))
 
 NEO4J_CONNECTION_URI = os.environ.get('NEO4J_URI')
 NEO4J_USERNAME = os.environ.get('NEO4J_USERNAME')
@@ -21,7 +28,7 @@ def get_combined_vector_index():
     
     # Create separate indices for Publication and Author nodes
     neo4j_publication_vector_index = Neo4jVector.from_existing_graph(
-        embedding=EMBEDDING_MODEL,
+        embedding=embedding_model(),
         url=NEO4J_CONNECTION_URI,
         username=NEO4J_USERNAME,
         password=NEO4J_PASSWORD,
@@ -32,7 +39,7 @@ def get_combined_vector_index():
     )
     
     neo4j_author_vector_index = Neo4jVector.from_existing_graph(
-        embedding=EMBEDDING_MODEL,
+        embedding=embedding_model(),
         url=NEO4J_CONNECTION_URI,
         username=NEO4J_USERNAME,
         password=NEO4J_PASSWORD,
@@ -50,10 +57,10 @@ def get_combined_vector_index():
 # BROKEN - LC doesn't support index across multiple node labels
 def get_publication_author_vector_index():
     '''Create a vector index for Publication and Author nodes.'''
-    print("Get Publication Author Vector Index")
+    logger.info("Get Publication Author Vector Index")
 
     neo4j_publication_author_vector_index = Neo4jVector.from_existing_graph(
-        embedding=EMBEDDING_MODEL,  # Replace with your embedding model
+        embedding=embedding_model(),  # Replace with your embedding model
         url=NEO4J_CONNECTION_URI,  # Replace with your Neo4j connection URI
         username=NEO4J_USERNAME,   # Replace with your username
         password=NEO4J_PASSWORD,   # Replace with your password
@@ -69,10 +76,10 @@ def get_publication_author_vector_index():
 
 def get_publication_vector_index():
     '''Create vector for publication title and instantiate Neo4j vector from graph.'''
-    print("Get Publication Vector Index")
+    logger.info("Get Publication Vector Index")
     
     neo4j_publication_vector_index = Neo4jVector.from_existing_graph(
-        embedding=EMBEDDING_MODEL,  # Replace with your embedding model
+        embedding=embedding_model(),  # Replace with your embedding model
         url=NEO4J_CONNECTION_URI,  # Replace with your connection URI
         username=NEO4J_USERNAME,   # Replace with your username
         password=NEO4J_PASSWORD,   # Replace with your password
@@ -85,10 +92,10 @@ def get_publication_vector_index():
 
 def get_author_vector_index():
     '''Create vector for author names and instantiate Neo4j vector from graph.'''
-    print("Get Author Vector Index")
+    logger.info("Get Author Vector Index")
     
     neo4j_author_vector_index = Neo4jVector.from_existing_graph(
-        embedding = EMBEDDING_MODEL,
+        embedding = embedding_model(),
         url = NEO4J_CONNECTION_URI,
         username = NEO4J_USERNAME,
         password = NEO4J_PASSWORD,
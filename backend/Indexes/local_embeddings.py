@@ -0,0 +1,40 @@
+import hashlib
+import os
+import re
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Setting OPENAI_EMBEDDING_MODEL to this name embeds locally, without the OpenAI API (offline testing)
+LOCAL_EMBEDDING_MODEL = "local-hashing"
+# Same size as text-embedding-ada-002, so the vector indexes accept either model
+LOCAL_EMBEDDING_DIMENSION = int(os.environ.get("LOCAL_EMBEDDING_DIMENSION", "1536"))
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic embeddings computed locally with the hashing trick: every lowercased word and
+    word bigram is hashed to a signed position in the vector, and the vector is L2-normalized.
+
+    Texts that share words get similar vectors, which is enough to exercise the vector indexes
+    and the backfill job without network access. The vectors do not carry semantic meaning.
+    """
+
+    def __init__(self, dimension=LOCAL_EMBEDDING_DIMENSION):
+        self.dimension = dimension
+
+    def _embed(self, text):
+        words = re.findall(r"\w+", text.lower())
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            vector[value % self.dimension] += 1.0 if value >> 63 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
@@ -0,0 +1,26 @@
+import os
+import sys
+
+from neo4j import GraphDatabase
+
+from Tools.tracing import get_logger
+
+# The schema definition is shared with the loader in graph_database_setup/ (next to backend/)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from graph_database_setup.schema import ensure_schema
+from graph_database_setup.graph_version import READ_GRAPH_VERSION_QUERY, BUMP_GRAPH_VERSION_QUERY, GRAPH_VERSION_LABEL, bump_graph_version
+
+NEO4J_CONNECTION_URI = os.environ.get('NEO4J_URI')
+NEO4J_USERNAME = os.environ.get('NEO4J_USERNAME')
+NEO4J_PASSWORD = os.environ.get('NEO4J_PASSWORD')
+
+logger = get_logger("schema")
+
+def setup_graph_schema():
+    '''Create the citation graph constraints and indexes if missing and wait until they are ONLINE.'''
+    logger.info("Setup Graph Schema")
+    driver = GraphDatabase.driver(NEO4J_CONNECTION_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD))
+    try:
+        return ensure_schema(driver)
+    finally:
+        driver.close()
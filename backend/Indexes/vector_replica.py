@@ -0,0 +1,571 @@
+"""
+Local replica of the Publication vector index (Indexes/index.py), searched in process.
+
+The publication embeddings are copied from the graph into a float32 matrix on disk
+(vectors.f32, one normalized row per publication, read through a memory map) and a SQLite table
+with the omid, row and metadata of each publication. A vector search is then a NumPy matrix
+product instead of a round trip to the Neo4j vector index:
+- exact top-k over blocks of rows, for a batch of query vectors at a time
+- above VECTOR_REPLICA_IVF_MIN_ROWS rows, an inverted file index (spherical k-means lists, of
+  which the VECTOR_REPLICA_NPROBE closest to the query are scanned) for approximate search
+
+The first sync copies every publication with an embedding, as does --rebuild: into a new
+generation (vectors.<n>.f32 and its table), swapped in once complete, so a live server sharing the
+directory keeps searching the previous one meanwhile. Later syncs only fetch the nodes whose
+embedding was written since the last one (the backfill job stamps them with embedded_at), and run
+in the background when the graph version changes (the backfill bumps it). Embeddings created by
+Neo4jVector.from_existing_graph carry no stamp; rebuild the replica after relying on it.
+
+Usage (in the backend folder):
+    python -m Indexes.vector_replica            # incremental sync
+    python -m Indexes.vector_replica --rebuild  # copy everything again
+"""
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+from neo4j import GraphDatabase
+
+from Indexes.embedding_cache import get_cached_embeddings
+from Tools.tracing import get_logger
+
+logger = get_logger("vector_replica")
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".cache")
+VECTOR_REPLICA_DIR = os.environ.get("VECTOR_REPLICA_DIR", os.path.join(CACHE_DIR, "vector_replica"))
+# Seconds between two checks of the graph version, which start a background sync when it changed
+VECTOR_REPLICA_SYNC_INTERVAL = float(os.environ.get("VECTOR_REPLICA_SYNC_INTERVAL", "60"))
+# Approximate search (inverted file index) from this many publications on; exact search below
+VECTOR_REPLICA_IVF_MIN_ROWS = int(os.environ.get("VECTOR_REPLICA_IVF_MIN_ROWS", "200000"))
+# Lists of the inverted file index scanned per query
+VECTOR_REPLICA_NPROBE = int(os.environ.get("VECTOR_REPLICA_NPROBE", "8"))
+
+EMBEDDING_NODE_PROPERTY = 'openai_embedding_vectors'
+EMBEDDED_AT_PROPERTY = 'embedded_at'
+METADATA_FIELDS = ["title", "venue", "year", "month", "day", "publisher"]
+SYNC_PAGE_SIZE = 2048
+# Rows multiplied at a time by the exact search
+BLOCK_ROWS = 16384
+# Vectors the inverted file index is trained on, and k-means iterations
+IVF_TRAINING_ROWS = 65536
+IVF_ITERATIONS = 10
+
+RETURN_PUBLICATION = (
+    "RETURN p.omid AS omid, "
+    + ", ".join(f"p.{field} AS {field}" for field in METADATA_FIELDS)
+    + f", p.{EMBEDDING_NODE_PROPERTY} AS embedding, coalesce(p.{EMBEDDED_AT_PROPERTY}, 0) AS embedded_at "
+)
+# Every publication with an embedding, in omid order
+FULL_SYNC_QUERY = (
+    f"MATCH (p:Publication) WHERE p.omid > $after AND p.{EMBEDDING_NODE_PROPERTY} IS NOT NULL "
+    + RETURN_PUBLICATION
+    + "ORDER BY p.omid LIMIT $limit"
+)
+# Publications embedded after the (embedded_at, omid) position of the last sync
+INCREMENTAL_SYNC_QUERY = (
+    f"MATCH (p:Publication) WHERE p.{EMBEDDED_AT_PROPERTY} >= $since AND p.{EMBEDDING_NODE_PROPERTY} IS NOT NULL "
+    f"AND (p.{EMBEDDED_AT_PROPERTY} > $since OR p.omid > $after) "
+    + RETURN_PUBLICATION
+    + f"ORDER BY p.{EMBEDDED_AT_PROPERTY}, p.omid LIMIT $limit"
+)
+
+
+def normalize_rows(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1.0)
+
+
+def top_k(scores, ids, k):
+    '''(scores, ids) of the k best columns of each row of scores, best first'''
+    if scores.shape[1] > k:
+        best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        scores, ids = np.take_along_axis(scores, best, 1), np.take_along_axis(ids, best, 1)
+    order = np.argsort(-scores, axis=1, kind="stable")
+    return np.take_along_axis(scores, order, 1), np.take_along_axis(ids, order, 1)
+
+
+def train_centroids(vectors, lists, iterations=IVF_ITERATIONS, training_rows=IVF_TRAINING_ROWS, seed=0):
+    '''Spherical k-means centroids of a sample of the rows'''
+    rng = np.random.default_rng(seed)
+    sample = np.sort(rng.choice(len(vectors), min(len(vectors), training_rows), replace=False))
+    data = np.asarray(vectors[sample])
+    centroids = data[rng.choice(len(data), lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(data @ centroids.T, axis=1)
+        for centroid in range(lists):
+            members = data[assignments == centroid]
+            if len(members):
+                centroids[centroid] = members.sum(axis=0)
+        centroids = normalize_rows(centroids)
+    return centroids
+
+
+def assign_rows(vectors, centroids, start=0):
+    '''Closest centroid of each row from start on'''
+    assignments = [np.argmax(np.asarray(vectors[block:block + BLOCK_ROWS]) @ centroids.T, axis=1)
+                   for block in range(start, len(vectors), BLOCK_ROWS)]
+    return np.concatenate(assignments).astype(np.int32) if assignments else np.zeros(0, dtype=np.int32)
+
+
+class InvertedFileIndex:
+    """Rows grouped by their closest centroid; a query scans the rows of its nprobe closest centroids."""
+
+    def __init__(self, centroids, assignments, trained_rows):
+        self.centroids = centroids
+        self.assignments = assignments
+        self.trained_rows = trained_rows
+        self.order = np.argsort(assignments, kind="stable").astype(np.int64)
+        self.offsets = np.searchsorted(assignments[self.order], np.arange(len(centroids) + 1))
+
+    def candidates(self, query, nprobe):
+        closest = np.argpartition(-(self.centroids @ query), min(nprobe, len(self.centroids)) - 1)[:nprobe]
+        return np.sort(np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in closest]))
+
+
+class VectorReplica:
+    """
+    Publication embeddings copied from the graph: a memory-mapped float32 matrix of normalized
+    rows and a SQLite table of omid -> row and metadata, kept in one directory. Updated embeddings
+    are written over their row, new ones appended.
+
+    A file that may be mapped (by a search of this process or of another one sharing the
+    directory) is never shrunk or rewritten: a full sync writes a new generation (vectors file and
+    table) next to the current one and swaps it in when it is complete, and load() maps the
+    generation recorded in the database. The previous generation's file is kept until the next
+    swap, so processes that have not reloaded yet can still read it.
+    """
+
+    def __init__(self, directory=VECTOR_REPLICA_DIR, model=None, ivf_min_rows=VECTOR_REPLICA_IVF_MIN_ROWS):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.ivf_min_rows = ivf_min_rows
+        self.db = sqlite3.connect(os.path.join(directory, "replica.sqlite"), check_same_thread=False, isolation_level=None)
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value)")
+        self.create_table("publications")
+        self.lock = threading.Lock()
+        # The connection is shared by the searching threads and the background sync
+        self.db_lock = threading.RLock()
+        open(self.vectors_file(self.meta("generation", 0)), "ab").close()
+        if model is not None and self.meta("model") not in (None, model):
+            logger.info("Vector replica was built for %s, rebuilding for %s", self.meta("model"), model)
+            self.clear()
+        if model is not None:
+            self.set_meta("model", model)
+        self.generation = None
+        self.omids = np.zeros(0, dtype=object)
+        self.vectors = None
+        self.ivf = None
+        self.load()
+
+    def create_table(self, table):
+        self.db.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (omid TEXT PRIMARY KEY, row INTEGER UNIQUE, "
+            + ", ".join(METADATA_FIELDS) + ")"
+        )
+
+    def vectors_file(self, generation):
+        # Generation 0 keeps the name of replicas written before generations existed
+        return os.path.join(self.directory, f"vectors.{generation}.f32" if generation else "vectors.f32")
+
+    def ivf_file(self, generation):
+        return os.path.join(self.directory, f"ivf.{generation}.npz" if generation else "ivf.npz")
+
+    def meta(self, name, default=None):
+        with self.db_lock:
+            row = self.db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, name, value):
+        with self.db_lock:
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (name, value))
+
+    def __len__(self):
+        return len(self.omids)
+
+    @property
+    def dimension(self):
+        return self.meta("dimension")
+
+    def load(self):
+        '''Map the current generation's rows written so far (also by other processes) and load its inverted file index'''
+        with self.db_lock:
+            # One read transaction, so that the generation and its rows are consistent
+            self.db.execute("BEGIN")
+            try:
+                generation = self.meta("generation", 0)
+                dimension = self.dimension
+                omids = np.array([omid for omid, in self.db.execute("SELECT omid FROM publications ORDER BY row")], dtype=object)
+            finally:
+                self.db.execute("COMMIT")
+        vectors = np.memmap(self.vectors_file(generation), dtype=np.float32, mode="r", shape=(len(omids), dimension)) if len(omids) else None
+        ivf = None
+        ivf_file = self.ivf_file(generation)
+        if os.path.exists(ivf_file) and len(omids) >= self.ivf_min_rows:
+            with np.load(ivf_file) as saved:
+                if len(saved["assignments"]) == len(omids):
+                    ivf = InvertedFileIndex(saved["centroids"], saved["assignments"], int(saved["trained_rows"]))
+        with self.lock:
+            self.generation, self.omids, self.vectors, self.ivf = generation, omids, vectors, ivf
+
+    def start_generation(self):
+        '''Create the empty table and vectors file of the next generation, replacing an unfinished one'''
+        generation = self.meta("generation", 0) + 1
+        with self.db_lock:
+            self.db.execute("DROP TABLE IF EXISTS publications_next")
+            self.create_table("publications_next")
+            self.db.execute("DELETE FROM meta WHERE name = 'next_dimension'")
+        # Never mapped: load() only maps generations that were swapped in
+        open(self.vectors_file(generation), "wb").close()
+        return generation
+
+    def swap_generation(self, generation, meta):
+        '''Make a generation written by start_generation and upsert the current one, with the given meta values'''
+        with self.db_lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                dimension = self.meta("next_dimension")
+                self.db.execute("DROP TABLE publications")
+                self.db.execute("ALTER TABLE publications_next RENAME TO publications")
+                self.db.execute("DELETE FROM meta WHERE name NOT IN ('model', 'generation')")
+                for name, value in {**meta, "generation": generation, "dimension": dimension}.items():
+                    if value is not None:
+                        self.set_meta(name, value)
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+        # Unlinking keeps the data of files that are still mapped; the previous generation stays for processes that did not reload yet
+        for name in os.listdir(self.directory):
+            match = re.fullmatch(r"(?:vectors|ivf)(?:\.(\d+))?\.(?:f32|npz)", name)
+            if match and int(match.group(1) or 0) < generation - 1:
+                os.remove(os.path.join(self.directory, name))
+
+    def clear(self):
+        '''Empty the replica: an empty generation is swapped in, the mapped files are left as they are'''
+        self.swap_generation(self.start_generation(), {})
+        self.load()
+
+    def upsert(self, rows, generation=None):
+        '''
+        Write the embeddings and metadata of publications (dicts as returned by the sync queries)
+        to the current generation, or to the given generation started by start_generation.
+        '''
+        if not rows:
+            return
+        matrix = normalize_rows([row["embedding"] for row in rows])
+        with self.db_lock:
+            if generation is None:
+                self._upsert(rows, matrix, "publications", self.vectors_file(self.meta("generation", 0)), "dimension")
+            else:
+                self._upsert(rows, matrix, "publications_next", self.vectors_file(generation), "next_dimension")
+
+    def _upsert(self, rows, matrix, table, vectors_file, dimension_name):
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            dimension = self.meta(dimension_name)
+            if dimension is None:
+                dimension = matrix.shape[1]
+                self.set_meta(dimension_name, dimension)
+            if matrix.shape[1] != dimension:
+                raise ValueError(f"Embedding dimension {matrix.shape[1]} does not match the replica ({dimension})")
+            next_row = self.db.execute(f"SELECT COALESCE(MAX(row) + 1, 0) FROM {table}").fetchone()[0]
+            stored = dict(self.db.execute(
+                f"SELECT omid, row FROM {table} WHERE omid IN ({','.join('?' * len(rows))})", [row["omid"] for row in rows]
+            ).fetchall())
+            positions = []
+            for row in rows:
+                if row["omid"] not in stored:
+                    stored[row["omid"]] = next_row
+                    next_row += 1
+                positions.append(stored[row["omid"]])
+            # Rows are only appended or overwritten, so maps of the file stay valid
+            fd = os.open(vectors_file, os.O_WRONLY)
+            try:
+                # Consecutive rows (the common case: a page of new publications) are written at once
+                start = 0
+                for end in range(1, len(positions) + 1):
+                    if end == len(positions) or positions[end] != positions[end - 1] + 1:
+                        os.pwrite(fd, matrix[start:end].tobytes(), positions[start] * dimension * 4)
+                        start = end
+            finally:
+                os.close(fd)
+            self.db.executemany(
+                f"INSERT OR REPLACE INTO {table} VALUES (?, ?, {', '.join('?' * len(METADATA_FIELDS))})",
+                [(row["omid"], position, *(row.get(field) for field in METADATA_FIELDS)) for row, position in zip(rows, positions)],
+            )
+            self.db.execute("COMMIT")
+        except Exception:
+            self.db.execute("ROLLBACK")
+            raise
+
+    def sync(self, query, full=False, page_size=SYNC_PAGE_SIZE):
+        '''
+        Copy new and updated embeddings from the graph. query(cypher, params) returns the rows as dicts.
+        A full sync writes a new generation, searched once it is complete; until then the current one is.
+
+        Returns:
+            int: Number of publications written.
+        '''
+        # A replica whose first full sync did not finish is synced in full again
+        full = full or not self.meta("complete")
+        if full:
+            generation = self.start_generation()
+            cypher, position = FULL_SYNC_QUERY, {"after": ""}
+        else:
+            generation = None
+            cypher, position = INCREMENTAL_SYNC_QUERY, {"since": self.meta("synced_at", 0), "after": self.meta("synced_omid", "")}
+        written = 0
+        # (embedded_at, omid) of the newest stamped publication seen by a full sync
+        newest = (0, "")
+        while True:
+            rows = query(cypher, {**position, "limit": page_size})
+            if not rows:
+                break
+            self.upsert(rows, generation)
+            written += len(rows)
+            newest = max(newest, max((row["embedded_at"], row["omid"]) for row in rows))
+            if full:
+                position = {"after": rows[-1]["omid"]}
+            else:
+                position = {"since": rows[-1]["embedded_at"], "after": rows[-1]["omid"]}
+                self.set_meta("synced_at", position["since"])
+                self.set_meta("synced_omid", position["after"])
+            if len(rows) < page_size:
+                break
+        if full:
+            self._update_ivf(generation)
+            # Incremental syncs continue after the newest stamp seen, not after the last omid
+            self.swap_generation(generation, {
+                "synced_at": newest[0], "synced_omid": newest[1], "complete": 1, "synced_time": time.time(),
+            })
+        else:
+            self.set_meta("synced_time", time.time())
+            self._update_ivf(self.meta("generation", 0))
+        self.load()
+        return written
+
+    def _update_ivf(self, generation):
+        '''Train the inverted file index once the replica is large enough (again when it doubled), else assign the new rows'''
+        table, dimension_name = ("publications", "dimension") if generation == self.meta("generation", 0) else ("publications_next", "next_dimension")
+        with self.db_lock:
+            rows = self.db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        if rows < self.ivf_min_rows:
+            return
+        vectors = np.memmap(self.vectors_file(generation), dtype=np.float32, mode="r", shape=(rows, self.meta(dimension_name)))
+        ivf = self.ivf if generation == self.generation else None
+        if ivf is None or rows > 2 * ivf.trained_rows:
+            centroids = train_centroids(vectors, lists=int(4 * np.sqrt(rows)))
+            assignments, trained_rows = assign_rows(vectors, centroids), rows
+        else:
+            # Updated rows keep the list they had; new rows go to their closest centroid
+            centroids, trained_rows = ivf.centroids, ivf.trained_rows
+            assignments = np.concatenate([ivf.assignments, assign_rows(vectors, centroids, start=len(ivf.assignments))])
+        # Written aside and renamed, so that a concurrent load() reads either index whole
+        ivf_file = self.ivf_file(generation)
+        with open(f"{ivf_file}.tmp", "wb") as file:
+            np.savez(file, centroids=centroids, assignments=assignments, trained_rows=trained_rows)
+        os.replace(f"{ivf_file}.tmp", ivf_file)
+
+    def search(self, queries, k, nprobe=VECTOR_REPLICA_NPROBE):
+        '''(scores, omids) of the k most similar publications of each query vector (cosine similarity), best first'''
+        with self.lock:
+            omids, vectors, ivf = self.omids, self.vectors, self.ivf
+        scores, rows = self._search(vectors, ivf, queries, k, nprobe)
+        # Rows are only meaningful in the generation they were searched in; omids in all of them
+        return scores, omids[rows]
+
+    @staticmethod
+    def _search(vectors, ivf, queries, k, nprobe):
+        queries = normalize_rows(np.atleast_2d(queries))
+        if vectors is None:
+            return np.zeros((len(queries), 0), dtype=np.float32), np.zeros((len(queries), 0), dtype=np.int64)
+        if queries.shape[1] != vectors.shape[1]:
+            raise ValueError(f"Query dimension {queries.shape[1]} does not match the replica ({vectors.shape[1]})")
+        k = min(k, len(vectors))
+        if ivf is not None:
+            results = []
+            for query in queries:
+                rows = ivf.candidates(query, nprobe)
+                scores = (np.asarray(vectors[rows]) @ query)[None, :]
+                results.append(top_k(scores, rows[None, :], k))
+            width = min(scores.shape[1] for scores, _ in results)
+            return np.vstack([scores[:, :width] for scores, _ in results]), np.vstack([rows[:, :width] for _, rows in results])
+        best_scores = np.zeros((len(queries), 0), dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(vectors), BLOCK_ROWS):
+            scores = queries @ np.asarray(vectors[start:start + BLOCK_ROWS]).T
+            rows = np.broadcast_to(np.arange(start, start + scores.shape[1]), scores.shape)
+            best_scores, best_rows = top_k(np.hstack([best_scores, scores]), np.hstack([best_rows, rows]), k)
+        return best_scores, best_rows
+
+    def publications(self, omids):
+        '''{omid: metadata} of publications, with the omid'''
+        omids = [str(omid) for omid in omids]
+        if not omids:
+            return {}
+        with self.db_lock:
+            found = self.db.execute(
+                f"SELECT omid, {', '.join(METADATA_FIELDS)} FROM publications WHERE omid IN ({','.join('?' * len(omids))})", omids
+            ).fetchall()
+        return {omid: dict(zip(["omid"] + METADATA_FIELDS, [omid, *values])) for omid, *values in found}
+
+
+class PublicationVectorReplica(VectorStore):
+    """
+    LangChain vector store over a VectorReplica, returning the same documents as the Neo4jVector of
+    Indexes/index.py (title and venue as text, the other properties as metadata). When the graph
+    version changed since the last check, a background thread syncs the new embeddings.
+    """
+
+    def __init__(self, embedding, replica, query=None, read_version=None, sync_interval=VECTOR_REPLICA_SYNC_INTERVAL):
+        self.embedding = embedding
+        self.replica = replica
+        self.query = query
+        self.read_version = read_version
+        self.sync_interval = sync_interval
+        self.checked_at = time.monotonic()
+        self.syncing = False
+        self.syncs = 0
+        self.searches = 0
+        self.search_seconds = 0.0
+        self.lock = threading.Lock()
+
+    @property
+    def embeddings(self):
+        return self.embedding
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise NotImplementedError("The vector replica is filled from the graph, see sync()")
+
+    def add_texts(self, texts, metadatas=None, **kwargs):
+        raise NotImplementedError("The vector replica is filled from the graph, see sync()")
+
+    def sync(self, full=False):
+        '''Copy new embeddings from the graph and record the graph version they correspond to'''
+        version = self.read_version() if self.read_version else None
+        written = self.replica.sync(self.query, full=full)
+        if version is not None:
+            self.replica.set_meta("graph_version", version)
+        with self.lock:
+            self.syncs += 1
+        logger.info("Vector replica: %d publications synced, %d in total", written, len(self.replica))
+        return written
+
+    def _background_sync(self):
+        try:
+            if self.read_version() != self.replica.meta("graph_version"):
+                self.sync()
+            else:
+                # Another process may have synced the shared directory
+                self.replica.load()
+        except Exception as e:
+            logger.warning("Vector replica sync failed: %s", e)
+        finally:
+            with self.lock:
+                self.syncing = False
+
+    def maybe_sync(self):
+        '''Start a background sync if the sync interval elapsed (searches are never blocked by it)'''
+        if self.read_version is None or self.query is None:
+            return
+        with self.lock:
+            if self.syncing or time.monotonic() - self.checked_at < self.sync_interval:
+                return
+            self.syncing = True
+            self.checked_at = time.monotonic()
+        threading.Thread(target=self._background_sync, name="vector-replica-sync", daemon=True).start()
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, **kwargs):
+        self.maybe_sync()
+        start_time = time.perf_counter()
+        scores, omids = self.replica.search(embedding, k)
+        publications = self.replica.publications(omids[0])
+        with self.lock:
+            self.searches += 1
+            self.search_seconds += time.perf_counter() - start_time
+        documents = []
+        for score, omid in zip(scores[0], omids[0]):
+            publication = publications.get(omid)
+            if publication is None:
+                continue
+            metadata = {key: value for key, value in publication.items() if key not in ("title", "venue") and value is not None}
+            documents.append((Document(
+                page_content=f"\ntitle: {publication['title'] or ''}\nvenue: {publication['venue'] or ''}", metadata=metadata,
+            ), float(score)))
+        return documents
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return [document for document, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        return self.similarity_search_with_score_by_vector(self.embedding.embed_query(query), k)
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [document for document, _ in self.similarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self):
+        # Scores are cosine similarities of normalized vectors
+        return lambda score: (score + 1) / 2
+
+    def stats(self):
+        with self.lock:
+            return {
+                "publications": len(self.replica),
+                "approximate": self.replica.ivf is not None,
+                "searches": self.searches,
+                "mean_search_ms": self.search_seconds / self.searches * 1000 if self.searches else 0.0,
+                "syncs": self.syncs,
+            }
+
+
+def get_publication_vector_replica(query, read_version=None, directory=VECTOR_REPLICA_DIR):
+    '''
+    Open the replica of the publication vector index, copying every embedding on first use.
+    An existing replica is returned right away; it catches up with the graph in the background.
+    '''
+    model = os.environ.get("OPENAI_EMBEDDING_MODEL")
+    store = PublicationVectorReplica(get_cached_embeddings(model), VectorReplica(directory, model), query, read_version)
+    if not len(store.replica):
+        store.sync()
+    else:
+        # Check the graph version on the first search
+        store.checked_at = float("-inf")
+    return store
+
+
+def driver_query(driver):
+    '''query(cypher, params) for VectorReplica.sync with a neo4j driver'''
+    return lambda cypher, params: [record.data() for record in driver.execute_query(cypher, params).records]
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Sync the local replica of the publication vector index from the graph.")
+    parser.add_argument("--directory", default=VECTOR_REPLICA_DIR)
+    parser.add_argument("--rebuild", action="store_true", help="Copy every embedding again instead of the new ones")
+    args = parser.parse_args()
+
+    driver = GraphDatabase.driver(
+        os.environ.get('NEO4J_URI'), auth=(os.environ.get('NEO4J_USERNAME'), os.environ.get('NEO4J_PASSWORD'))
+    )
+    try:
+        replica = VectorReplica(args.directory, os.environ.get("OPENAI_EMBEDDING_MODEL"))
+        start_time = time.perf_counter()
+        written = replica.sync(driver_query(driver), full=args.rebuild)
+        print(f"{written} publications synced in {time.perf_counter() - start_time:.1f} s, {len(replica)} in the replica"
+              f" ({'approximate' if replica.ivf is not None else 'exact'} search)")
+    finally:
+        driver.close()
+
+
+if __name__ == "__main__":
+    main()
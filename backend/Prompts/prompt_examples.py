@@ -52,5 +52,13 @@ examples = [
     {
         "question": "How many publications did a specific author publish in a specific year?",
         "query": "MATCH (a:Author)-[:AUTHORED]->(p:Publication) WHERE a.name = 'Author Name' AND p.year = 2020 RETURN count(p)"
+    },
+    {
+        "question": "Which publications are gaining citations the fastest?",
+        "query": "MATCH (p:Publication) WHERE p.citation_velocity > 0 RETURN p.title, p.citation_velocity, p.citation_acceleration ORDER BY p.citation_velocity DESC LIMIT 10"
+    },
+    {
+        "question": "Who are the most impactful authors?",
+        "query": "MATCH (a:Author) WHERE a.impact_score IS NOT NULL RETURN a.name, a.impact_score, a.citation_count ORDER BY a.impact_score DESC LIMIT 10"
     }
 ]
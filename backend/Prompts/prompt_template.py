@@ -1,30 +1,73 @@
+import contextvars
 import os
+from contextlib import contextmanager
+
 import openai
 
-from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import Chroma
 from langchain_core.prompts import FewShotPromptTemplate, PromptTemplate
-from langchain_core.example_selectors import MaxMarginalRelevanceExampleSelector
+from langchain_core.example_selectors import BaseExampleSelector, MaxMarginalRelevanceExampleSelector
 from Prompts.prompt_examples import examples
+from Chains.registry import registry, EXAMPLE_SELECTOR, FEW_SHOT_PROMPT, FEW_SHOT_PROMPT_WITH_CONTEXT
+from Indexes.embedding_cache import get_cached_embeddings
+from Tools.tracing import get_logger
 
-# Import Custom Libraries
-from Graph.state import GraphState
+logger = get_logger("prompt_template")
 
 openai.api_key  = os.environ.get("OPENAI_API_KEY")
 
-if (openai.api_key != ""):
-    EMBEDDING_MODEL = OpenAIEmbeddings(model=os.environ.get("OPENAI_EMBEDDING_MODEL"))
-    EMBEDDING_NODE_PROPERTY = 'openai_embedding_vectors'
-else:
-    print("Please set your preferrable Generative AI provider in .env file")
-
-# Instantiate a example selector
-example_selector = MaxMarginalRelevanceExampleSelector.from_examples(
-    examples = examples,
-    embeddings = EMBEDDING_MODEL,
-    vectorstore_cls = Chroma,
-    k=5,   
-)
+if (openai.api_key == ""):
+    logger.warning("Please set your preferrable Generative AI provider in .env file")
+
+def build_example_selector():
+    '''Instantiate a example selector. This embeds every prompt example, so it is done on first use'''
+    # Examples are selected by the question only, not by the schema or vector search context passed to the prompt
+    return MaxMarginalRelevanceExampleSelector.from_examples(
+        examples = examples,
+        # Cached, so the examples are only embedded once across restarts
+        embeddings = get_cached_embeddings(os.environ.get("OPENAI_EMBEDDING_MODEL")),
+        vectorstore_cls = Chroma,
+        k=5,
+        input_keys=["question"],
+    )
+
+# (question, examples) already selected for the question being answered, see use_examples
+_preselected_examples = contextvars.ContextVar("preselected_examples", default=None)
+
+@contextmanager
+def use_examples(question, examples):
+    '''Within the block, the few-shot prompts use the given examples for the question instead of selecting them again'''
+    token = _preselected_examples.set((question, examples) if examples is not None else None)
+    try:
+        yield
+    finally:
+        _preselected_examples.reset(token)
+
+class PreselectedExampleSelector(BaseExampleSelector):
+    """
+    Example selector of the few-shot prompts: returns the examples passed with use_examples when
+    they were selected for the same question (by the speculate node), else asks the shared selector.
+    """
+
+    def __init__(self, selector):
+        self.selector = selector
+
+    def add_example(self, example):
+        return self.selector.add_example(example)
+
+    def preselected(self, input_variables):
+        selected = _preselected_examples.get()
+        if selected is not None and selected[0] == input_variables.get("question"):
+            return selected[1]
+        return None
+
+    def select_examples(self, input_variables):
+        examples = self.preselected(input_variables)
+        return examples if examples is not None else self.selector.select_examples(input_variables)
+
+    async def aselect_examples(self, input_variables):
+        examples = self.preselected(input_variables)
+        return examples if examples is not None else await self.selector.aselect_examples(input_variables)
 
 # Configure a formatter
 example_prompt = PromptTemplate(
@@ -32,10 +75,7 @@ example_prompt = PromptTemplate(
     template="Question: {question}\nCypher query: {query}"
 )
 
-def create_few_shot_prompt():
-    '''Create a prompt template without context variable. The suffix provides dynamically selected prompt examples using similarity search'''
-    
-    prefix = """
+PREFIX = """
     Task:Generate Cypher statement to query a graph database.
     Instructions:
     Use only the provided relationship types and properties in the schema.
@@ -48,24 +88,7 @@ def create_few_shot_prompt():
     Examples: Here are a few examples of generated Cypher statements for particular questions:
     """
 
-    FEW_SHOT_PROMPT = FewShotPromptTemplate(
-        example_selector = example_selector,
-        example_prompt = example_prompt,
-        prefix=prefix,
-        suffix="Question: {question}, \nCypher Query: ",
-        input_variables =["question","query"],
-    ) 
-    return FEW_SHOT_PROMPT
-
-def create_few_shot_prompt_with_context(state: GraphState):
-    '''Create a prompt template with context variable. The context variable will be based on the output from vector qa chain'''
-    '''The output of vector qa is list of node ids against which to perform graph query'''
-    print("Create Few Shot Prompt With Context Function:")
-    context = state["article_ids"]
-
-    # print(f"Context: {context}")
-    
-    prefix = f"""
+PREFIX_WITH_CONTEXT = """
     Task:Generate Cypher statement to query a graph database.
     Instructions:
     Use only the provided relationship types and properties in the schema.
@@ -76,27 +99,45 @@ def create_few_shot_prompt_with_context(state: GraphState):
     Do not include any text except the generated Cypher statement.
     
     A context is provided from a vector search with the following publication IDs (omid), ordered by relevance:
-    {[f"omid: {article['omid']}, title: {article['title']}" for article in context]}
+    {context}
 
     Using these publication IDs, create Cypher statements to query the graph. Note that Articles are referred to as Publications in the database.
     Examples: Here are a few examples of generated Cypher statements for some question examples:
     """
 
-    # print(f"Example Selector: {example_selector}")
-    # print(f"Example Prompt: {example_prompt}")
-    # print(f"Prefix: {prefix}")
+SUFFIX = "Question: {question}, \nCypher Query: "
 
-    FEW_SHOT_PROMPT = FewShotPromptTemplate(
-        example_selector = example_selector,
+# The templates hold no per-request data, so each is built once (on first use) and shared by all requests
+def build_few_shot_prompt():
+    return FewShotPromptTemplate(
+        example_selector = PreselectedExampleSelector(registry.get(EXAMPLE_SELECTOR)),
         example_prompt = example_prompt,
-        prefix=prefix,
-        suffix="Question: {question}, \nCypher Query: ",
-        input_variables =["question", "query"]
+        prefix=PREFIX,
+        suffix=SUFFIX,
+        input_variables =["question","query"],
     )
 
-    # Debugging: Check what the template contains
-    # print(f"DEBUG: Generated FewShotPromptTemplate input_variables: {FEW_SHOT_PROMPT.input_variables}")
-    # print(f"DEBUG: Generated FewShotPromptTemplate prefix: {FEW_SHOT_PROMPT.prefix}")
-    # print(f"DEBUG: Generated FewShotPromptTemplate suffix: {FEW_SHOT_PROMPT.suffix}")
+def build_few_shot_prompt_with_context():
+    return FewShotPromptTemplate(
+        example_selector = PreselectedExampleSelector(registry.get(EXAMPLE_SELECTOR)),
+        example_prompt = example_prompt,
+        prefix=PREFIX_WITH_CONTEXT,
+        suffix=SUFFIX,
+        input_variables =["question", "query", "context"]
+    )
+
+registry.register(EXAMPLE_SELECTOR, build_example_selector)
+registry.register(FEW_SHOT_PROMPT, build_few_shot_prompt)
+registry.register(FEW_SHOT_PROMPT_WITH_CONTEXT, build_few_shot_prompt_with_context)
+
+def create_few_shot_prompt():
+    '''Return the prompt template without context variable. The suffix provides dynamically selected prompt examples using similarity search'''
+    return registry.get(FEW_SHOT_PROMPT)
+
+def create_few_shot_prompt_with_context():
+    '''Return the prompt template with context variable. The context is passed as the "context" input, see format_context'''
+    return registry.get(FEW_SHOT_PROMPT_WITH_CONTEXT)
 
-    return FEW_SHOT_PROMPT
\ No newline at end of file
+def format_context(article_ids):
+    '''Format the output of the vector qa chain (list of node ids against which to perform graph query) for the "context" input'''
+    return str([f"omid: {article['omid']}, title: {article['title']}" for article in article_ids])
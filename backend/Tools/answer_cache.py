@@ -0,0 +1,170 @@
+# Import Python Libraries
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from Tools.tracing import get_logger
+
+logger = get_logger("answer_cache")
+
+# Cosine similarity above which a previously answered question is considered the same question
+ANSWER_CACHE_THRESHOLD = float(os.environ.get("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL = float(os.environ.get("ANSWER_CACHE_TTL", "3600"))
+# Number of answers kept; 0 disables the cache
+ANSWER_CACHE_SIZE = int(os.environ.get("ANSWER_CACHE_SIZE", "1024"))
+# The graph version is checked at most this often (seconds)
+ANSWER_CACHE_VERSION_INTERVAL = float(os.environ.get("ANSWER_CACHE_VERSION_INTERVAL", "5"))
+
+# Clauses that make a Cypher query change the graph
+WRITE_CLAUSE = re.compile(r"\b(CREATE|MERGE|SET|DELETE|DETACH|REMOVE|DROP|LOAD\s+CSV)\b", re.IGNORECASE)
+STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+
+
+def is_write_query(cypher):
+    '''True if the Cypher query has a clause that writes to the graph (string literals are ignored)'''
+    return bool(cypher) and bool(WRITE_CLAUSE.search(STRING_LITERAL.sub("''", cypher)))
+
+
+def key_terms(question):
+    '''
+    Numbers, quoted strings and capitalized words (names) of a question, except its first word.
+    Paraphrases share them; questions that only differ in a year or a name embed very close
+    together but must not share an answer.
+    '''
+    terms = {match.strip("'\"").lower() for match in re.findall(r"'[^']+'|\"[^\"]+\"", question)}
+    words = re.findall(r"[\w.-]+", STRING_LITERAL.sub(" ", question))
+    terms.update(word.lower() for word in words if any(char.isdigit() for char in word))
+    terms.update(word.lower() for word in words[1:] if word[:1].isupper())
+    return frozenset(terms)
+
+
+class SemanticAnswerCache:
+    """
+    Answers of previous questions, found by embedding similarity so that paraphrases are served
+    without running the workflow.
+
+    The normalized question embeddings are rows of one matrix, searched with a single
+    matrix-vector product. An answer is returned when the most similar live question is above
+    the threshold and has the same key terms. Entries expire after the TTL, the least recently
+    used entry is evicted when the cache is full, and everything is dropped when the graph
+    version changes (see graph_database_setup/graph_version.py) or invalidate() is called.
+    """
+
+    def __init__(self, embeddings, graph_version=None, threshold=ANSWER_CACHE_THRESHOLD, ttl=ANSWER_CACHE_TTL,
+                 capacity=ANSWER_CACHE_SIZE, version_interval=ANSWER_CACHE_VERSION_INTERVAL):
+        self.embeddings = embeddings
+        self.graph_version = graph_version
+        self.threshold = threshold
+        self.ttl = ttl
+        self.capacity = capacity
+        self.version_interval = version_interval
+        self.vectors = None
+        self.expires = np.full(capacity, -np.inf)
+        self.entries = [None] * capacity
+        self.recent = OrderedDict()
+        self.version = None
+        self.version_checked = -np.inf
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.lock = threading.Lock()
+
+    def _embed(self, question):
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _check_version(self):
+        '''Drop all entries if the graph version changed since they were stored'''
+        now = time.monotonic()
+        if self.graph_version is None or now - self.version_checked < self.version_interval:
+            return
+        self.version_checked = now
+        try:
+            version = self.graph_version()
+        except Exception as e:
+            logger.warning("Answer cache: graph version not available (%s)", e)
+            return
+        if version != self.version:
+            with self.lock:
+                if self.version is not None:
+                    self._clear()
+                self.version = version
+
+    def _clear(self):
+        self.expires[:] = -np.inf
+        self.entries = [None] * self.capacity
+        self.recent.clear()
+        self.invalidations += 1
+
+    def lookup(self, question):
+        '''Return the cached answer of the same or a paraphrased question, or None'''
+        if not self.capacity:
+            return None
+        self._check_version()
+        vector = self._embed(question)
+        terms = key_terms(question)
+        with self.lock:
+            if self.vectors is not None and self.recent:
+                similarities = self.vectors @ vector
+                similarities[self.expires <= time.monotonic()] = -np.inf
+                for slot in np.argsort(similarities)[::-1][:5]:
+                    if similarities[slot] < self.threshold:
+                        break
+                    cached_question, answer, cached_terms = self.entries[slot]
+                    if cached_terms == terms:
+                        self.recent.move_to_end(slot)
+                        self.hits += 1
+                        logger.debug("Answer cache hit (%.3f): %r", similarities[slot], cached_question)
+                        return answer
+            self.misses += 1
+        return None
+
+    def generation(self):
+        '''Token taken before answering a question; store() drops the answer if the cache was cleared meanwhile'''
+        return self.invalidations
+
+    def store(self, question, answer, generation=None):
+        '''Cache the answer of a question, unless the graph changed while it was being answered'''
+        if not self.capacity:
+            return
+        vector = self._embed(question)
+        with self.lock:
+            if generation is not None and generation != self.invalidations:
+                return
+            if self.vectors is None:
+                self.vectors = np.zeros((self.capacity, len(vector)), dtype=np.float32)
+            now = time.monotonic()
+            free = np.flatnonzero(self.expires <= now)
+            for slot in free:
+                self.recent.pop(int(slot), None)
+            if len(free):
+                slot = int(free[0])
+            else:
+                slot, _ = self.recent.popitem(last=False)
+            self.vectors[slot] = vector
+            self.expires[slot] = now + self.ttl
+            self.entries[slot] = (question, answer, key_terms(question))
+            self.recent[slot] = None
+
+    def invalidate(self):
+        '''Drop all entries, e.g. after a write query'''
+        with self.lock:
+            self._clear()
+            self.version_checked = -np.inf
+        logger.info("Answer cache invalidated")
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.recent),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "graph_version": self.version,
+            }
@@ -0,0 +1,133 @@
+# Import Python Libraries
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".cache")
+CYPHER_CACHE_PATH = os.environ.get("CYPHER_CACHE_PATH", os.path.join(CACHE_DIR, "cypher_cache.sqlite"))
+CYPHER_CACHE_SIZE = int(os.environ.get("CYPHER_CACHE_SIZE", "1024"))
+
+
+def normalize_question(question):
+    '''Lowercase, collapse whitespace and drop trailing punctuation so trivially different phrasings share a key'''
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip(" ?.!")
+
+
+def fingerprint(*parts):
+    '''Stable short hash of JSON-serializable parts'''
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def schema_fingerprint(graph):
+    '''Schema version of a Neo4jGraph: a hash of its structured schema (labels, properties, relationships)'''
+    return fingerprint(graph.get_structured_schema)
+
+
+def prompt_fingerprint(prompt, examples=()):
+    '''Fingerprint of a FewShotPromptTemplate: prefix (including any context), suffix, example format and examples'''
+    return fingerprint(prompt.prefix, prompt.suffix, prompt.example_prompt.template, list(examples))
+
+
+class CypherCache:
+    """
+    Generated Cypher keyed by normalized question + schema version + prompt fingerprint.
+
+    Entries live in a SQLite file so they survive restarts; the most recently used ones are
+    also kept in an in-memory LRU so repeated questions do not touch the disk.
+    """
+
+    def __init__(self, path=CYPHER_CACHE_PATH, capacity=CYPHER_CACHE_SIZE, schema_version=""):
+        self.path = path
+        self.capacity = capacity
+        self.schema_version = schema_version
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        self.invalidations = 0
+        self.lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS cypher_cache ("
+            "key TEXT PRIMARY KEY, question TEXT, cypher TEXT, schema_version TEXT, created_at REAL)"
+        )
+        self.db.commit()
+
+    def key(self, question, prompt_version=""):
+        return fingerprint(normalize_question(question), self.schema_version, prompt_version)
+
+    def get(self, key):
+        '''Return the cached Cypher for a key, or None'''
+        with self.lock:
+            cypher = self.memory.get(key)
+            if cypher is not None:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                self.memory_hits += 1
+                return cypher
+            row = self.db.execute("SELECT cypher FROM cypher_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, row[0])
+            return row[0]
+
+    def put(self, key, question, cypher):
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO cypher_cache VALUES (?, ?, ?, ?, ?)",
+                (key, question, cypher, self.schema_version, time.time()),
+            )
+            self.db.commit()
+            self._remember(key, cypher)
+
+    def discard(self, key):
+        '''Drop one entry, e.g. when its Cypher no longer runs'''
+        with self.lock:
+            self.memory.pop(key, None)
+            self.db.execute("DELETE FROM cypher_cache WHERE key = ?", (key,))
+            self.db.commit()
+
+    def set_schema_version(self, schema_version):
+        '''Switch to a new schema version, dropping every entry generated against another one. Returns True if it changed.'''
+        with self.lock:
+            if schema_version == self.schema_version:
+                return False
+            if self.schema_version:
+                self.invalidations += 1
+            self.schema_version = schema_version
+            self.memory.clear()
+            self.db.execute("DELETE FROM cypher_cache WHERE schema_version != ?", (schema_version,))
+            self.db.commit()
+            return True
+
+    def stats(self):
+        with self.lock:
+            size = self.db.execute("SELECT COUNT(*) FROM cypher_cache").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_hits": self.memory_hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": size,
+                "memory_entries": len(self.memory),
+                "invalidations": self.invalidations,
+                "schema_version": self.schema_version,
+            }
+
+    def _remember(self, key, cypher):
+        self.memory[key] = cypher
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.capacity:
+            self.memory.popitem(last=False)
@@ -0,0 +1,287 @@
+# Import Python Libraries
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from neo4j import Query
+from neo4j.exceptions import ClientError
+
+from Tools.answer_cache import STRING_LITERAL
+from Tools.tracing import get_logger, span
+
+logger = get_logger("cypher_guard")
+
+# Generated Cypher is rejected when its EXPLAIN plan estimates more rows for any operator than this
+CYPHER_GUARD_MAX_ROWS = float(os.environ.get("CYPHER_GUARD_MAX_ROWS", "1000000"))
+# ...or more estimated db hits in total (EXPLAIN has no db hits: the sum of the operators' row estimates is used)
+CYPHER_GUARD_MAX_DB_HITS = float(os.environ.get("CYPHER_GUARD_MAX_DB_HITS", "10000000"))
+# Transaction timeout of generated Cypher (seconds); 0 disables it
+CYPHER_TIMEOUT = float(os.environ.get("CYPHER_TIMEOUT", "10"))
+CYPHER_GUARD_PLAN_CACHE_SIZE = 1024
+# The graph version is checked at most this often (seconds); the kept verdicts are dropped when it changed
+CYPHER_GUARD_VERSION_INTERVAL = float(os.environ.get("CYPHER_GUARD_VERSION_INTERVAL", "5"))
+
+COMMENT = re.compile(r"//[^\n]*|/\*.*?\*/", re.DOTALL)
+# A keyword after AS, ".", "$", a backtick or a comma is an alias, property, parameter, quoted name or
+# returned variable, not a clause
+CLAUSE_TOKEN = re.compile(r"[{}]|(\bAS\s+|[.$`]|,\s*)?\b(RETURN|LIMIT|UNION)\b", re.IGNORECASE)
+TIMEOUT_CODES = ("Neo.ClientError.Transaction.TransactionTimedOut", "Neo.ClientError.Transaction.TransactionTimedOutClientConfiguration")
+
+
+class CypherGuardError(Exception):
+    '''Generated Cypher rejected before execution; guard is the name of the guard that fired'''
+
+    def __init__(self, guard, message):
+        super().__init__(message)
+        self.guard = guard
+
+
+def needs_limit(cypher):
+    '''True if the query ends with a RETURN clause without LIMIT (outside subqueries, UNION queries excluded)'''
+    text = COMMENT.sub(" ", STRING_LITERAL.sub("''", cypher))
+    depth = 0
+    returns = limited = False
+    return_end = None
+    for match in CLAUSE_TOKEN.finditer(text):
+        # ...as is a keyword right after RETURN ("RETURN limit" returns a variable)
+        after_return = return_end is not None and not text[return_end:match.start()].strip()
+        return_end = None
+        if match.group(1) or (match.group(2) and after_return):
+            continue
+        token = match.group(0).upper()
+        if token == "{":
+            depth += 1
+        elif token == "}":
+            depth -= 1
+        elif depth == 0:
+            if token == "UNION":
+                return False
+            if token == "RETURN":
+                returns, limited = True, False
+                return_end = match.end()
+            elif token == "LIMIT":
+                limited = True
+    return returns and not limited
+
+
+def inject_limit(cypher, limit):
+    return f"{cypher.strip().rstrip(';').rstrip()}\nLIMIT {int(limit)}"
+
+
+def plan_estimates(plan):
+    '''(largest row estimate of an operator, sum of the row estimates) of an EXPLAIN plan as returned by the driver'''
+    if not plan:
+        return 0.0, 0.0
+    rows = float(plan.get("args", plan.get("arguments", {})).get("EstimatedRows", 0.0))
+    largest, total = rows, rows
+    for child in plan.get("children", []):
+        child_largest, child_total = plan_estimates(child)
+        largest, total = max(largest, child_largest), total + child_total
+    return largest, total
+
+
+def is_timeout(error):
+    return isinstance(error, ClientError) and error.code in TIMEOUT_CODES
+
+
+class CypherGuard:
+    """
+    Pre-execution checks for LLM-generated Cypher:
+    - a LIMIT is appended when the query returns rows without one (only the first rows are used)
+    - the query is EXPLAINed and rejected when the plan estimates too many rows or db hits
+    - the query runs with a transaction timeout
+    Which guard fired is counted per guard (stats()) and logged with the query. The verdict of a
+    query is kept, so replayed Cypher (Tools/cypher_cache.py) is not EXPLAINed again, until the
+    graph version changes (see graph_database_setup/graph_version.py): plans estimated on a small
+    graph are judged again after a bulk load.
+    """
+
+    def __init__(self, limit, max_rows=CYPHER_GUARD_MAX_ROWS, max_db_hits=CYPHER_GUARD_MAX_DB_HITS,
+                 timeout=CYPHER_TIMEOUT, plan_cache_size=CYPHER_GUARD_PLAN_CACHE_SIZE, graph_version=None,
+                 version_interval=CYPHER_GUARD_VERSION_INTERVAL):
+        self.limit = limit
+        self.max_rows = max_rows
+        self.max_db_hits = max_db_hits
+        self.timeout = timeout or None
+        self.plan_cache_size = plan_cache_size
+        self.graph_version = graph_version
+        self.version_interval = version_interval
+        self.version = None
+        self.version_checked = -float("inf")
+        self.verdicts = OrderedDict()
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+    def _version_due(self):
+        return self.graph_version is not None and time.monotonic() - self.version_checked >= self.version_interval
+
+    def _check_version(self):
+        '''Drop the kept verdicts if the graph version changed since they were judged'''
+        self.version_checked = time.monotonic()
+        try:
+            version = self.graph_version()
+        except Exception as e:
+            logger.warning("Cypher guard: graph version not available (%s)", e)
+            return
+        with self.lock:
+            if version != self.version:
+                if self.version is not None:
+                    self.verdicts.clear()
+                    self.counts["plan_invalidations"] += 1
+                self.version = version
+
+    def invalidate(self):
+        '''Drop the kept verdicts, e.g. after a write query'''
+        with self.lock:
+            self.verdicts.clear()
+            self.version_checked = -float("inf")
+
+    def record(self, guards, cypher):
+        with self.lock:
+            self.counts["queries"] += 1
+            self.counts.update(guards)
+        if guards:
+            # A LIMIT is routine; rejections and timeouts are worth a look
+            level = logging.INFO if guards == ["limit"] else logging.WARNING
+            logger.log(level, "Cypher guard (%s): %s", ", ".join(guards), cypher)
+
+    def _cached(self, cypher):
+        with self.lock:
+            verdict = self.verdicts.get(cypher)
+            if verdict is not None:
+                self.verdicts.move_to_end(cypher)
+            return verdict
+
+    def _remember(self, cypher, verdict):
+        with self.lock:
+            self.verdicts[cypher] = verdict
+            while len(self.verdicts) > self.plan_cache_size:
+                self.verdicts.popitem(last=False)
+
+    def rewrite(self, cypher):
+        '''Query to EXPLAIN and run, with the guards fired by the rewrite'''
+        if needs_limit(cypher):
+            return inject_limit(cypher, self.limit), ["limit"]
+        return cypher, []
+
+    def check_plan(self, plan):
+        '''(guard, message) rejecting an EXPLAIN plan, or () if the estimates are within the limits'''
+        rows, db_hits = plan_estimates(plan)
+        if rows > self.max_rows:
+            return "rows", f"Generated Cypher rejected: estimated {rows:,.0f} rows (limit {self.max_rows:,.0f})"
+        if db_hits > self.max_db_hits:
+            return "db_hits", f"Generated Cypher rejected: estimated {db_hits:,.0f} db hits (limit {self.max_db_hits:,.0f})"
+        return ()
+
+    def explain_query(self, cypher):
+        return Query(f"EXPLAIN {cypher}", timeout=self.timeout)
+
+    def timed_query(self, cypher):
+        return Query(cypher, timeout=self.timeout)
+
+    def _judge(self, cypher, summary):
+        verdict = self.check_plan(summary.plan if summary is not None else None)
+        self._remember(cypher, verdict)
+        return verdict
+
+    def _finish(self, cypher, guards, verdict):
+        if verdict:
+            guard, message = verdict
+            self.record(guards + [guard], cypher)
+            raise CypherGuardError(guard, message)
+
+    def _failed(self, cypher, guards, error):
+        if is_timeout(error):
+            self.record(guards + ["timeout"], cypher)
+
+    def run(self, driver, cypher, params=None, database=None):
+        '''Guard and run a query with a neo4j Driver; returns the rows as dicts, like Neo4jGraph.query'''
+        if self._version_due():
+            self._check_version()
+        guarded, guards = self.rewrite(cypher)
+        verdict = self._cached(guarded)
+        if verdict is None:
+            with span("neo4j", "explain"):
+                _, summary, _ = driver.execute_query(self.explain_query(guarded), params or {}, database_=database)
+            verdict = self._judge(guarded, summary)
+        self._finish(guarded, guards, verdict)
+        try:
+            with span("neo4j", "generated") as record:
+                records, _, _ = driver.execute_query(self.timed_query(guarded), params or {}, database_=database)
+                record["rows"] = len(records)
+        except ClientError as e:
+            self._failed(guarded, guards, e)
+            raise
+        self.record(guards, guarded)
+        return [record.data() for record in records]
+
+    async def arun(self, driver, cypher, params=None):
+        '''run() with a neo4j AsyncDriver'''
+        if self._version_due():
+            # The graph version is read with the blocking driver
+            await asyncio.to_thread(self._check_version)
+        guarded, guards = self.rewrite(cypher)
+        verdict = self._cached(guarded)
+        if verdict is None:
+            with span("neo4j", "explain"):
+                _, summary, _ = await driver.execute_query(self.explain_query(guarded), params or {})
+            verdict = self._judge(guarded, summary)
+        self._finish(guarded, guards, verdict)
+        try:
+            with span("neo4j", "generated") as record:
+                records, _, _ = await driver.execute_query(self.timed_query(guarded), params or {})
+                record["rows"] = len(records)
+        except ClientError as e:
+            self._failed(guarded, guards, e)
+            raise
+        self.record(guards, guarded)
+        return [record.data() for record in records]
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counts)
+
+
+class GuardedGraph:
+    """
+    GraphStore for GraphCypherQAChain: the schema comes from the wrapped Neo4jGraph, and queries
+    (the generated Cypher) have their literals lifted into parameters by the parameterizer
+    (Tools/cypher_parameters.py), if any, then go through a CypherGuard.
+    """
+
+    def __init__(self, graph, guard, parameterizer=None):
+        self.graph = graph
+        self.guard = guard
+        self.parameterizer = parameterizer
+
+    @property
+    def get_schema(self):
+        return self.graph.get_schema
+
+    @property
+    def get_structured_schema(self):
+        return self.graph.get_structured_schema
+
+    def query(self, query, params={}):
+        if self.parameterizer is not None:
+            query, params = self.parameterizer.parameterize(query, params)
+        driver = getattr(self.graph, "_driver", None)
+        if driver is None:
+            # Graph stand-ins without a driver (Benchmarks/) only get the LIMIT
+            guarded, guards = self.guard.rewrite(query)
+            self.guard.record(guards, guarded)
+            with span("neo4j", "generated") as record:
+                rows = self.graph.query(guarded, params)
+                record["rows"] = len(rows)
+            return rows
+        return self.guard.run(driver, query, params, database=getattr(self.graph, "_database", None))
+
+    def refresh_schema(self):
+        self.graph.refresh_schema()
+
+    def add_graph_documents(self, graph_documents, include_source=False):
+        self.graph.add_graph_documents(graph_documents, include_source)
@@ -0,0 +1,148 @@
+# Import Python Libraries
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+
+# "off" runs the generated Cypher with its literals inline
+CYPHER_PARAMETERIZE = os.environ.get("CYPHER_PARAMETERIZE", "on") == "on"
+# Number of distinct query templates remembered for stats()
+CYPHER_TEMPLATES_TRACKED = 4096
+
+TOKEN = re.compile(
+    r"(?P<string>'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\")"
+    r"|(?P<comment>//[^\n]*|/\*.*?\*/)"
+    r"|(?P<quoted>`[^`]*`)"
+    r"|(?P<parameter>\$\w+)"
+    r"|(?P<identifier>[A-Za-z_][A-Za-z0-9_]*)"
+    r"|(?P<number>0[xX][0-9a-fA-F]+|0o[0-7]+|\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)"
+    r"|(?P<range>\.\.)",
+    re.DOTALL,
+)
+ESCAPES = {"\\": "\\", "'": "'", '"': '"', "n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f"}
+# Numbers after these keywords stay inline (LIMIT 10 is part of the query's shape, not a value)
+KEEP_AFTER = {"LIMIT", "SKIP"}
+# Quantifiers of quantified path patterns (->{1,3}, {2}, {1,}), in which Neo4j does not allow parameters
+QUANTIFIER = re.compile(r"\{\s*\d*\s*(?:,\s*\d*\s*)?\}")
+MAX_INTEGER = 2 ** 63 - 1
+
+
+def unescape(literal):
+    '''Value of a Cypher string literal, or None for an escape sequence this does not handle'''
+    body, value, index = literal[1:-1], [], 0
+    while index < len(body):
+        char = body[index]
+        if char != "\\":
+            value.append(char)
+            index += 1
+        elif body[index + 1:index + 2] in ESCAPES:
+            value.append(ESCAPES[body[index + 1]])
+            index += 2
+        elif body[index + 1:index + 2] == "u" and re.fullmatch(r"[0-9a-fA-F]{4}", body[index + 2:index + 6]):
+            value.append(chr(int(body[index + 2:index + 6], 16)))
+            index += 6
+        else:
+            return None
+    return "".join(value)
+
+
+def number_value(text):
+    '''Value of a Cypher number literal, or None for one that stays inline (out of range, legacy octal 017)'''
+    if re.fullmatch(r"0\d+", text):
+        return None
+    if re.fullmatch(r"\d+|0[xXo]\w+", text):
+        value = int(text, 0)
+        return value if value <= MAX_INTEGER else None
+    return float(text)
+
+
+def parameterize(cypher, params=None):
+    '''
+    Lift the string and number literals of a Cypher query into parameters:
+    "WHERE a.name = 'Zhao' AND p.year = 2020" -> "WHERE a.name = $lit0 AND p.year = $lit1".
+
+    Repeated literals share one parameter. Numbers in variable-length patterns (*1..3), in path
+    pattern quantifiers ({1,3}) and after LIMIT/SKIP stay inline, as do string literals with
+    unusual escapes and legacy octal numbers (017); hex (0x1F) and octal (0o17) numbers are lifted
+    with their value.
+
+    Returns:
+        (str, dict): The query template and its parameters (params merged in).
+    '''
+    params = dict(params or {})
+    names = {}
+    pieces = []
+    position = 0
+    previous = ""
+    quantifiers = [quantifier.span() for quantifier in QUANTIFIER.finditer(cypher)]
+    for match in TOKEN.finditer(cypher):
+        kind, text = match.lastgroup, match.group(0)
+        value = None
+        if kind == "string":
+            value = unescape(text)
+        elif kind == "number":
+            before = cypher[:match.start()].rstrip()
+            after = cypher[match.end():].lstrip()
+            in_quantifier = any(start < match.start() < end for start, end in quantifiers)
+            if not (previous.upper() in KEEP_AFTER or before.endswith(("*", "..")) or after.startswith("..") or in_quantifier):
+                value = number_value(text)
+        if value is not None:
+            key = (type(value), value)
+            if key not in names:
+                name = f"lit{len(names)}"
+                while name in params:
+                    name = f"_{name}"
+                names[key] = name
+                params[name] = value
+            pieces.append(cypher[position:match.start()])
+            pieces.append(f"${names[key]}")
+            position = match.end()
+        if kind != "comment":
+            previous = text
+    pieces.append(cypher[position:])
+    return "".join(pieces), params
+
+
+class CypherParameterizer:
+    """
+    Rewrite stage between Cypher generation and execution: literals become parameters, so
+    structurally identical queries (same pattern, other author/year/venue) are the same query
+    string and reuse one plan from Neo4j's query cache instead of being planned again.
+    """
+
+    def __init__(self, enabled=CYPHER_PARAMETERIZE, templates_tracked=CYPHER_TEMPLATES_TRACKED):
+        self.enabled = enabled
+        self.templates_tracked = templates_tracked
+        self.templates = OrderedDict()
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+    def parameterize(self, cypher, params=None):
+        '''(query, params) to execute for a generated query'''
+        if not self.enabled:
+            return cypher, params or {}
+        template, params_out = parameterize(cypher, params)
+        with self.lock:
+            self.counts["queries"] += 1
+            self.counts["literals"] += len(params_out) - len(params or {})
+            if template in self.templates:
+                self.templates.move_to_end(template)
+                self.counts["template_reuse"] += 1
+            else:
+                self.templates[template] = None
+                if len(self.templates) > self.templates_tracked:
+                    self.templates.popitem(last=False)
+        return template, params_out
+
+    def stats(self):
+        with self.lock:
+            queries = self.counts["queries"]
+            return {
+                "queries": queries,
+                "literals": self.counts["literals"],
+                "templates": len(self.templates),
+                "template_reuse": self.counts["template_reuse"] / queries if queries else 0.0,
+            }
+
+
+cypher_parameterizer = CypherParameterizer()
@@ -5,6 +5,9 @@ import re
 
 # Import Custom Libraries
 from Graph.state import GraphState
+from Tools.tracing import get_logger
+
+logger = get_logger("parse_vector_search")
 
 class Metadata(BaseModel):    
     omid: Optional[str] = "Unknown"
@@ -32,7 +35,7 @@ class DocumentModel(BaseModel):
         match = re.search(r'^title:\s*(.+)$', cleaned_content, re.MULTILINE)
         if match:
             return match.group(1).strip()  # Ensure no extra spaces
-        print("Warning: Title not found in page_content.")
+        logger.warning("Title not found in page_content.")
         return None  # Return None if the title is not found
     
     def extract_venue(self) -> str:
@@ -40,7 +43,7 @@ class DocumentModel(BaseModel):
         match = re.search(r'venue:\s*(.+)', cleaned_content, re.MULTILINE)
         if match:
             return match.group(1).strip()
-        print("Warning: Venue not found in page_content.")
+        logger.warning("Venue not found in page_content.")
         return None
 
 class ResultModel(BaseModel):
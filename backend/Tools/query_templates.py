@@ -0,0 +1,200 @@
+# Import Python Libraries
+import os
+import re
+import threading
+from collections import Counter
+
+from Tools.tracing import get_logger
+
+logger = get_logger("query_templates")
+
+# "off" sends every graph question through few-shot selection and LLM Cypher generation
+QUERY_TEMPLATES = os.environ.get("QUERY_TEMPLATES", "on") == "on"
+# Rows returned by the list templates (as TOP_K in Chains/graph_qa_chain.py)
+QUERY_TEMPLATE_LIMIT = 10
+
+# Distinct values the entity extractor resolves names against, read from the indexed properties
+ENTITY_QUERIES = {
+    "author": "MATCH (a:Author) WHERE a.name IS NOT NULL RETURN a.name AS value",
+    "venue": "MATCH (p:Publication) WHERE p.venue IS NOT NULL RETURN DISTINCT p.venue AS value",
+    "publisher": "MATCH (p:Publication) WHERE p.publisher IS NOT NULL RETURN DISTINCT p.publisher AS value",
+}
+
+# The query types listed in the README: "List publications from [Venue Name]", "Find publications by
+# [Publisher Name]", "What are the titles of publications authored by [Author Name]?", "Find all
+# publications published in 2020", and "How many publications ..." counts of the same
+QUESTION = re.compile(
+    r"^(?:(?P<count>how many|what is the number of|number of|count(?: the)?)|list|find|show(?: me)?|get|give me|what are|which are)?\s*"
+    r"(?:all\s+)?(?:the\s+)?(?:titles?\s+of\s+(?:all\s+)?(?:the\s+)?)?(?:publications|papers|articles)\s+"
+    r"(?:(?:that|which)\s+)?(?:(?:were|are|was|have been)\s+)?"
+    r"(?P<relation>authored by|written by|published by|published in|appearing in|by|from|in|at)\s+"
+    r"(?P<value>.+?)(?:\s+(?:are there|were published|have been published|exist))?$",
+    re.IGNORECASE,
+)
+YEAR = re.compile(r"(?:the year\s+)?((?:19|20)\d{2})")
+# Entity types a relation word can refer to, in the order they are tried
+RELATION_TYPES = {
+    "authored by": ["author"],
+    "written by": ["author"],
+    "published by": ["publisher"],
+    "by": ["author", "publisher"],
+    "published in": ["year", "venue"],
+    "appearing in": ["venue"],
+    "in": ["year", "venue"],
+    "at": ["venue"],
+    "from": ["year", "venue", "publisher"],
+}
+
+# Precompiled parameterized Cypher per entity type and question intent
+MATCH_CLAUSES = {
+    "author": "MATCH (a:Author {name: $value})-[:AUTHORED]->(p:Publication)",
+    "venue": "MATCH (p:Publication) WHERE p.venue = $value",
+    "publisher": "MATCH (p:Publication) WHERE p.publisher = $value",
+    "year": "MATCH (p:Publication) WHERE p.year = $value",
+}
+RETURN_CLAUSES = {
+    "list": "RETURN DISTINCT p.title AS title LIMIT $limit",
+    "count": "RETURN count(DISTINCT p) AS publications",
+}
+TEMPLATES = {
+    (entity, intent): f"{match_clause} {return_clause}"
+    for entity, match_clause in MATCH_CLAUSES.items()
+    for intent, return_clause in RETURN_CLAUSES.items()
+}
+
+
+def normalize_name(text):
+    '''Lookup key of a name: lowercase, no quotes, trailing punctuation or extra whitespace'''
+    text = re.sub(r"\s+", " ", text.strip().strip("'\"").rstrip(" ?.!").lower())
+    return text.strip("'\"")
+
+
+class EntityIndex:
+    """
+    Author names, venues and publishers of the graph by normalized name, so that a name in a
+    question resolves to the exact stored value (and its type) without a database query.
+    Authors stored as "Last, First" are also found as "First Last"; a leading "the" is optional.
+    """
+
+    def __init__(self, values=()):
+        self.names = {}
+        for entity, value in values:
+            self.add(entity, value)
+
+    def add(self, entity, value):
+        if not isinstance(value, str) or not value.strip():
+            return
+        keys = {normalize_name(value)}
+        if entity == "author" and value.count(",") == 1:
+            last, first = value.split(",")
+            keys.add(normalize_name(f"{first} {last}"))
+        for key in keys:
+            self.names.setdefault(key, {}).setdefault(entity, value)
+
+    def resolve(self, text, entities):
+        '''(entity type, stored value) of a name, trying the types in order, or None'''
+        key = normalize_name(text)
+        for candidate in (key, re.sub(r"^the ", "", key)):
+            found = self.names.get(candidate, {})
+            for entity in entities:
+                if entity in found:
+                    return entity, found[entity]
+        return None
+
+    def __len__(self):
+        return len(self.names)
+
+
+class QueryTemplates:
+    """
+    Matches the common question shapes to precompiled parameterized Cypher, so that they run
+    directly instead of going through few-shot selection and LLM Cypher generation. The name in
+    the question is resolved with an EntityIndex (built on first use by the entity_index
+    callable); questions that do not match a shape or whose name is unknown return None.
+    """
+
+    def __init__(self, entity_index, aentity_index=None, enabled=QUERY_TEMPLATES, limit=QUERY_TEMPLATE_LIMIT):
+        self.entity_index = entity_index
+        self.aentity_index = aentity_index
+        self.enabled = enabled
+        self.limit = limit
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+    def parse(self, question):
+        '''(intent, relation, name) of a question with a template shape, or None'''
+        if not self.enabled:
+            return None
+        found = QUESTION.match(re.sub(r"\s+", " ", question.strip()).rstrip(" ?.!"))
+        if found is None:
+            return None
+        return ("count" if found.group("count") else "list"), found.group("relation").lower(), found.group("value")
+
+    def needs_index(self, parsed):
+        '''False when the name is a year, which needs no lookup'''
+        _, relation, name = parsed
+        return not (YEAR.fullmatch(normalize_name(name)) and "year" in RELATION_TYPES[relation])
+
+    def resolve(self, parsed, entity_index):
+        intent, relation, name = parsed
+        entities = RELATION_TYPES[relation]
+        year = YEAR.fullmatch(normalize_name(name))
+        if year and "year" in entities:
+            entity, value = "year", int(year.group(1))
+        else:
+            resolved = entity_index.resolve(name, [entity for entity in entities if entity != "year"]) if entity_index else None
+            if resolved is None:
+                return None
+            entity, value = resolved
+        params = {"value": value}
+        if intent == "list":
+            params["limit"] = self.limit
+        return {"template": f"{entity}.{intent}", "cypher": TEMPLATES[(entity, intent)], "params": params}
+
+    def _load(self, getter):
+        try:
+            return getter()
+        except Exception as e:
+            logger.warning("Query templates: entity index not available (%s)", e)
+            return None
+
+    def _count(self, match, count):
+        if count:
+            with self.lock:
+                self.counts["questions"] += 1
+                if match is not None:
+                    self.counts[match["template"]] += 1
+        return match
+
+    def match(self, question, count=True):
+        '''{"template", "cypher", "params"} for a question with a template, or None'''
+        parsed = self.parse(question)
+        if parsed is None:
+            return self._count(None, count)
+        entity_index = self._load(self.entity_index) if self.needs_index(parsed) else None
+        return self._count(self.resolve(parsed, entity_index), count)
+
+    async def amatch(self, question, count=True):
+        '''match() for the async workflow: the entity index is built without blocking the event loop'''
+        parsed = self.parse(question)
+        if parsed is None:
+            return self._count(None, count)
+        entity_index = None
+        if self.needs_index(parsed):
+            try:
+                entity_index = await self.aentity_index()
+            except Exception as e:
+                logger.warning("Query templates: entity index not available (%s)", e)
+        return self._count(self.resolve(parsed, entity_index), count)
+
+    def stats(self):
+        with self.lock:
+            questions = self.counts["questions"]
+            templates = {name: count for name, count in self.counts.items() if name != "questions"}
+            matched = sum(templates.values())
+            return {
+                "questions": questions,
+                "matched": matched,
+                "match_rate": matched / questions if questions else 0.0,
+                "templates": templates,
+            }
@@ -0,0 +1,122 @@
+# Import Python Libraries
+import hashlib
+import os
+import re
+import threading
+from collections import Counter
+
+from Tools.tracing import metrics
+
+# Share of eligible answers formatted by the templates (the others go to the formatter LLM), e.g. for a gradual rollout
+FORMATTER_FAST_PATH_SHARE = float(os.environ.get("FORMATTER_FAST_PATH_SHARE", "1.0"))
+# Largest results the templates render
+FORMATTER_MAX_ROWS = int(os.environ.get("FORMATTER_MAX_ROWS", "10"))
+FORMATTER_MAX_COLUMNS = int(os.environ.get("FORMATTER_MAX_COLUMNS", "4"))
+FORMATTER_MAX_VALUE_LENGTH = 200
+
+NO_RESULTS = "No results were found for your question."
+RELEVANCE_NOTE = "These results are based on their relevance to your question."
+
+
+def column_label(key):
+    '''Readable label for a result column: "p.title" -> "Title", "count(p)" -> "Count", "numAuthors" -> "Num authors"'''
+    key = re.sub(r"^\w+\.", "", key)
+    key = re.sub(r"^(\w+)\(.*\)$", r"\1", key)
+    key = re.sub(r"(?<=[a-z])(?=[A-Z])", " ", key).replace("_", " ").strip()
+    return key[:1].upper() + key[1:].lower()
+
+
+def format_value(value):
+    '''Scalar or short list of scalars as text, or None if the value is too complex for a template'''
+    if value is None:
+        return "-"
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    if isinstance(value, float):
+        return f"{value:.4f}".rstrip("0").rstrip(".")
+    if isinstance(value, (int, str)):
+        text = str(value)
+    elif isinstance(value, list) and len(value) <= FORMATTER_MAX_ROWS and all(
+        isinstance(item, (int, float, str)) and not isinstance(item, bool) for item in value
+    ):
+        text = ", ".join(str(item) for item in value)
+    else:
+        return None
+    text = " ".join(text.split())
+    return text if len(text) <= FORMATTER_MAX_VALUE_LENGTH else None
+
+
+class ResultFormatter:
+    """
+    Renders the common shapes of direct Cypher results with templates instead of the formatter LLM:
+    no rows, a single value, a list of single-column rows and small tables. Anything else
+    (nested values, long texts, large results) returns None and is left to the LLM.
+    """
+
+    def __init__(self, share=FORMATTER_FAST_PATH_SHARE, max_rows=FORMATTER_MAX_ROWS, max_columns=FORMATTER_MAX_COLUMNS):
+        self.share = share
+        self.max_rows = max_rows
+        self.max_columns = max_columns
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+    def render(self, result):
+        '''Return (shape, text), with text None when the result needs the LLM'''
+        if isinstance(result, dict):
+            result = [result]
+        if not isinstance(result, list) or not all(isinstance(row, dict) for row in result):
+            return "other", None
+        if not result or all(not row or all(value is None for value in row.values()) for row in result):
+            return "empty", NO_RESULTS
+        columns = list(result[0])
+        if len(result) > self.max_rows or len(columns) > self.max_columns or any(list(row) != columns for row in result):
+            return "large", None
+        rows = [[format_value(row[column]) for column in columns] for row in result]
+        if any(value is None for row in rows for value in row):
+            return "complex", None
+
+        labels = [column_label(column) for column in columns]
+        if len(rows) == 1 and len(columns) == 1:
+            return "scalar", f"**{labels[0]}**: {rows[0][0]}"
+        if len(columns) == 1:
+            return "list", f"{labels[0]} ({len(rows)} results):\n" + "\n".join(f"- {row[0]}" for row in rows)
+        if len(rows) == 1:
+            return "record", "\n".join(f"- **{label}**: {value}" for label, value in zip(labels, rows[0]))
+        escape = lambda text: text.replace("|", "\\|")
+        return "table", "\n".join(
+            [f"| {' | '.join(labels)} |", f"|{'---|' * len(labels)}"]
+            + [f"| {' | '.join(escape(value) for value in row)} |" for row in rows]
+        )
+
+    def in_share(self, question):
+        '''Deterministic per question, so the same question is always formatted the same way'''
+        if self.share >= 1:
+            return True
+        digest = hashlib.sha256(question.encode("utf-8")).digest()
+        return int.from_bytes(digest[:8], "big") / 2 ** 64 < self.share
+
+    def format(self, question, result, vector_search=False):
+        '''Templated answer for a raw Cypher result, or None when the formatter LLM should be called'''
+        shape, text = self.render(result)
+        if text is not None and not self.in_share(question):
+            shape, text = "not_in_share", None
+        with self.lock:
+            self.counts["template" if text is not None else "llm"] += 1
+            self.counts[f"shape.{shape}"] += 1
+        if text is not None and vector_search and shape != "empty":
+            text += f"\n\n{RELEVANCE_NOTE}"
+        return text
+
+    def stats(self):
+        with self.lock:
+            total = self.counts["template"] + self.counts["llm"]
+            return {
+                "answers": total,
+                "template": self.counts["template"],
+                "template_share": self.counts["template"] / total if total else 0.0,
+                "shapes": {key[6:]: count for key, count in self.counts.items() if key.startswith("shape.")},
+            }
+
+
+result_formatter = ResultFormatter()
+metrics.collector("result_formatter", result_formatter.stats)
@@ -0,0 +1,279 @@
+# Import Python Libraries
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Level of the backend logs (DEBUG, INFO, WARNING, ...)
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+# Share of requests whose DEBUG records (node inputs, spans, cache details) are logged at LOG_LEVEL=DEBUG
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", "0.05"))
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+ROW_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 10000)
+TOKEN_BUCKETS = (10, 50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+
+# name -> (help, buckets) of the histograms exposed on /metrics
+HISTOGRAMS = {
+    "graphrag_request_seconds": ("Duration of a question, by entry point", SECONDS_BUCKETS),
+    "graphrag_node_seconds": ("Duration of a workflow node", SECONDS_BUCKETS),
+    "graphrag_llm_seconds": ("Duration of an LLM call, by workflow node", SECONDS_BUCKETS),
+    "graphrag_llm_tokens": ("Tokens of an LLM call, by workflow node and prompt/completion", TOKEN_BUCKETS),
+    "graphrag_neo4j_seconds": ("Duration of a Neo4j query, by kind", SECONDS_BUCKETS),
+    "graphrag_neo4j_rows": ("Rows returned by a Neo4j query, by kind", ROW_BUCKETS),
+    "graphrag_retrieval_seconds": ("Duration of a retrieval lane of vector search, by lane", SECONDS_BUCKETS),
+}
+COUNTERS = {
+    "graphrag_requests_total": "Questions answered, by entry point and outcome",
+    "graphrag_llm_errors_total": "Failed LLM calls, by workflow node",
+}
+
+_current_trace = contextvars.ContextVar("graphrag_trace", default=None)
+
+
+def label_value(value):
+    '''Label value escaped as the Prometheus text format requires: backslash, double quote and line feed'''
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{label_value(value)}"' for key, value in labels) + "}"
+
+
+class Metrics:
+    """
+    Histograms and counters of the workflow, with the stats() of the caches and routers as
+    gauges, rendered in the Prometheus text format by the /metrics endpoint.
+    """
+
+    def __init__(self, histograms=HISTOGRAMS, counters=COUNTERS):
+        self.histogram_types = histograms
+        self.counter_types = counters
+        self.histograms = {name: {} for name in histograms}
+        self.counters = {name: {} for name in counters}
+        self.collectors = {}
+        self.lock = threading.Lock()
+
+    def observe(self, name, value, **labels):
+        buckets = self.histogram_types[name][1]
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.histograms[name].setdefault(key, [[0] * (len(buckets) + 1), 0.0, 0])
+            series[0][bisect_left(buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def inc(self, name, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.counters[name][key] = self.counters[name].get(key, 0) + value
+
+    def collector(self, component, stats):
+        '''Export the numbers of a component's stats() as graphrag_<component>_<key> gauges'''
+        self.collectors[component] = stats
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name, (help_text, buckets) in self.histogram_types.items():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for key, (counts, total, count) in sorted(self.histograms[name].items()):
+                    cumulative = 0
+                    for bound, bucket_count in zip(list(buckets) + ["+Inf"], counts):
+                        cumulative += bucket_count
+                        lines.append(f"{name}_bucket{label_text(key + (('le', bound),))} {cumulative}")
+                    lines.append(f"{name}_sum{label_text(key)} {total}")
+                    lines.append(f"{name}_count{label_text(key)} {count}")
+            for name, help_text in self.counter_types.items():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                lines += [f"{name}{label_text(key)} {value}" for key, value in sorted(self.counters[name].items())]
+        for component, stats in self.collectors.items():
+            try:
+                values = stats()
+            except Exception as e:
+                logger.warning("Metrics of %s not available: %s", component, e)
+                continue
+            for key, value in values.items():
+                name = f"graphrag_{component}_{key}"
+                if isinstance(value, dict):
+                    numbers = [(label, number) for label, number in value.items() if isinstance(number, (int, float))]
+                    if numbers:
+                        lines.append(f"# TYPE {name} gauge")
+                        lines += [f"{name}{label_text(((key, label),))} {number}" for label, number in numbers]
+                elif isinstance(value, (int, float)):
+                    lines += [f"# TYPE {name} gauge", f"{name} {float(value)}"]
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+class Trace:
+    '''One question: an id for its log records, and whether its DEBUG records are logged'''
+
+    def __init__(self, entry_point, sample_rate=LOG_SAMPLE_RATE):
+        self.id = uuid.uuid4().hex[:12]
+        self.entry_point = entry_point
+        self.sampled = random.random() < sample_rate
+        self.start_time = time.perf_counter()
+        self.token = None
+
+
+class TraceFilter(logging.Filter):
+    '''Adds the trace id to log records; DEBUG records of a request are only kept if the request is sampled'''
+
+    def filter(self, record):
+        trace = _current_trace.get()
+        record.trace = trace.id if trace else "-"
+        return record.levelno > logging.DEBUG or trace is None or trace.sampled
+
+
+def configure_logging(level=LOG_LEVEL):
+    '''Log the backend ("graphrag" loggers) to stderr with the trace id of the current request'''
+    root = logging.getLogger("graphrag")
+    if not root.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.addFilter(TraceFilter())
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(trace)s] %(name)s: %(message)s"))
+        root.addHandler(handler)
+        root.propagate = False
+    root.setLevel(level)
+
+
+def get_logger(name):
+    return logging.getLogger(f"graphrag.{name}")
+
+
+configure_logging()
+logger = get_logger("tracing")
+
+
+def debug_enabled():
+    '''True when a DEBUG record of the current question would be logged'''
+    trace = _current_trace.get()
+    return logger.isEnabledFor(logging.DEBUG) and (trace is None or trace.sampled)
+
+
+def start_trace(entry_point):
+    '''Start the trace of a question in the current context (also usable inside a generator)'''
+    trace = Trace(entry_point)
+    trace.token = _current_trace.set(trace)
+    return trace
+
+
+def finish_trace(trace, outcome="ok"):
+    seconds = time.perf_counter() - trace.start_time
+    metrics.observe("graphrag_request_seconds", seconds, entry_point=trace.entry_point)
+    metrics.inc("graphrag_requests_total", entry_point=trace.entry_point, outcome=outcome)
+    logger.info("%s question %s in %.3f s", trace.entry_point, "answered" if outcome == "ok" else outcome, seconds)
+    try:
+        _current_trace.reset(trace.token)
+    except ValueError:
+        # Finished in another context than it was started in (a stream closed by the server)
+        _current_trace.set(None)
+
+
+@contextmanager
+def trace_request(entry_point):
+    '''Trace a question answered within the block'''
+    trace = start_trace(entry_point)
+    try:
+        yield trace
+    except (GeneratorExit, asyncio.CancelledError):
+        # A streaming client that went away
+        finish_trace(trace, "cancelled")
+        raise
+    except BaseException:
+        finish_trace(trace, "error")
+        raise
+    finish_trace(trace)
+
+
+@contextmanager
+def span(kind, name, **attributes):
+    '''
+    Time the block as a "node", "llm", "neo4j" or "retrieval" span: its duration goes to graphrag_<kind>_seconds and
+    to a sampled DEBUG record. Set "rows" on the yielded dict to record the rows of a Neo4j query.
+    '''
+    record = dict(attributes)
+    start_time = time.perf_counter()
+    try:
+        yield record
+    finally:
+        seconds = time.perf_counter() - start_time
+        label = {"node": "node", "llm": "node", "neo4j": "kind", "retrieval": "lane"}[kind]
+        metrics.observe(f"graphrag_{kind}_seconds", seconds, **{label: name})
+        if "rows" in record:
+            metrics.observe("graphrag_neo4j_rows", record["rows"], **{label: name})
+        if debug_enabled():
+            logger.debug("span %s", json.dumps({"kind": kind, "name": name, "seconds": round(seconds, 4), **record}, default=str))
+
+
+class LLMMetrics(BaseCallbackHandler):
+    """
+    Callback handler of the shared LLM client: duration and prompt/completion tokens of every
+    call, labelled with the workflow node that made it.
+    """
+
+    # Called in the caller's context (not a thread pool), so async calls keep their trace
+    run_inline = True
+
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def _start(self, run_id, metadata):
+        with self.lock:
+            self.calls[run_id] = (time.perf_counter(), (metadata or {}).get("langgraph_node", "none"))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._start(run_id, metadata)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        self._start(run_id, metadata)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self.lock:
+            start_time, node = self.calls.pop(run_id, (None, "none"))
+        if start_time is None:
+            return
+        seconds = time.perf_counter() - start_time
+        metrics.observe("graphrag_llm_seconds", seconds, node=node)
+        tokens = self.tokens(response)
+        for token_type, count in tokens.items():
+            metrics.observe("graphrag_llm_tokens", count, node=node, type=token_type)
+        if debug_enabled():
+            logger.debug("span %s", json.dumps({"kind": "llm", "name": node, "seconds": round(seconds, 4), **tokens}))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self.lock:
+            _, node = self.calls.pop(run_id, (None, "none"))
+        metrics.inc("graphrag_llm_errors_total", node=node)
+
+    @staticmethod
+    def tokens(response):
+        '''Prompt and completion tokens of an LLMResult, from the message usage or the OpenAI token_usage'''
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    return {"prompt": usage.get("input_tokens", 0), "completion": usage.get("output_tokens", 0)}
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if usage:
+            return {"prompt": usage.get("prompt_tokens", 0), "completion": usage.get("completion_tokens", 0)}
+        return {}
+
+
+llm_metrics = LLMMetrics()
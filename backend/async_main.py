@@ -0,0 +1,73 @@
+'''
+Async server: same routes and JSON contract as main.py, but each question runs the workflow with
+ainvoke (Graph/graph.py async_app) on one event loop, with the async OpenAI and Neo4j clients, so
+a slow LLM call does not hold a worker and many questions can be in flight in one process.
+
+Run (in the backend folder):
+    python async_main.py
+    hypercorn async_main:app --bind 0.0.0.0:5001
+'''
+import os
+import time
+import uuid
+
+START_TIME = time.perf_counter()
+
+from quart import Quart, Response, request, jsonify
+from quart_cors import cors
+
+from graphRAG import agraphRAG, agraphRAG_stream
+from serving import ERROR_MESSAGE, response_message, astream_response, start_warm_up, startup_report
+from Tools.tracing import get_logger, metrics
+
+IMPORT_SECONDS = time.perf_counter() - START_TIME
+
+app = cors(Quart(__name__))
+
+logger = get_logger("async_main")
+
+@app.route('/ready', methods=['GET'])
+async def ready():
+    '''Readiness probe: 200 once the warm-up components are built, 503 before, with the per-component startup report'''
+    report = startup_report(IMPORT_SECONDS)
+    return jsonify(report), 200 if report["ready"] else 503
+
+@app.route('/metrics', methods=['GET'])
+async def metrics_endpoint():
+    '''Prometheus metrics, as GET /metrics of main.py'''
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/', methods=['POST'])
+async def receive_message():
+
+    # Parse JSON data from the request
+    data = await request.get_json()
+    logger.debug("Received data: %s", data)
+
+    try:
+        res = await agraphRAG(data['role'], data['content'])
+        result = str(res)
+    except Exception:
+        logger.exception("Answering failed")
+        result = ERROR_MESSAGE
+
+    return jsonify(response_message(result)), 200
+
+@app.route('/stream', methods=['POST'])
+async def stream_message():
+    '''Same request as POST /, answered with NDJSON events: node progress, then the answer token by token'''
+    data = await request.get_json()
+    logger.debug("Received data (stream): %s", data)
+    events = agraphRAG_stream(data['role'], data['content'])
+    response = Response(astream_response(str(uuid.uuid4()), events), mimetype='application/x-ndjson',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.timeout = None
+    return response
+
+@app.before_serving
+async def warm_up():
+    # The components are built in a thread; "blocking" delays serving until they are ready
+    start_warm_up()
+
+if __name__ == "__main__":
+    app.run(host='0.0.0.0', port=int(os.environ.get("PORT", "5001")))
@@ -1,10 +1,105 @@
 from dotenv import load_dotenv
+import asyncio
 import os
-from Graph.graph import app
+import time
+from Graph.graph import app, async_app, speculative_app
+from Graph.labels import FORMAT_RESPONSE, ANSWER_CACHE
+from Chains.graph_qa_chain import get_answer_cache, aget_answer_cache
+from Tools.tracing import get_logger, trace_request
 
 load_dotenv()
 
+# "on": the async server starts routing, decomposition and few-shot selection concurrently (Graph/nodes.py aspeculate)
+SPECULATIVE_EXECUTION = os.environ.get("SPECULATIVE_EXECUTION", "off") == "on"
+
+# Node updates for progress events, LLM messages for the formatter's tokens
+STREAM_MODES = ["updates", "messages"]
+
+logger = get_logger("graphRAG")
+
 def graphRAG(role, message):
-    result = app.invoke({"question": message})
+    with trace_request("sync"):
+        answer_cache = get_answer_cache()
+        # Paraphrases of an answered question are served from the answer cache (Tools/answer_cache.py)
+        answer = answer_cache.lookup(message)
+        if answer is not None:
+            return answer
+        generation = answer_cache.generation()
+        result = app.invoke({"question": message})
+        logger.debug("Timings: %s", result.get('timings'))
+        answer_cache.store(message, result['documents'], generation)
+        logger.debug("Answer cache: %s", answer_cache.stats())
+
+        return result['documents']
+
+async def agraphRAG(role, message):
+    with trace_request("async"):
+        answer_cache = await aget_answer_cache()
+        # The cache embeds the question with a blocking client
+        answer = await asyncio.to_thread(answer_cache.lookup, message)
+        if answer is not None:
+            return answer
+        generation = answer_cache.generation()
+        workflow = speculative_app if SPECULATIVE_EXECUTION else async_app
+        result = await workflow.ainvoke({"question": message})
+        logger.debug("Timings: %s", result.get('timings'))
+        await asyncio.to_thread(answer_cache.store, message, result['documents'], generation)
+        logger.debug("Answer cache: %s", answer_cache.stats())
+
+        return result['documents']
+
+def stream_events(mode, chunk, start_time):
+    '''
+    Streaming events for a LangGraph stream chunk:
+    {"type": "progress", "node", "seconds"} when a node finishes, {"type": "token", "content"} for each
+    formatter token and {"type": "answer", "content"} with the formatted answer.
+    '''
+    if mode == "updates":
+        for node, update in chunk.items():
+            yield {"type": "progress", "node": node, "seconds": round(time.perf_counter() - start_time, 3)}
+            if node == FORMAT_RESPONSE:
+                yield {"type": "answer", "content": update["documents"]}
+    elif mode == "messages":
+        message, metadata = chunk
+        # Only the formatter's output is shown to the user; the router, decomposer and Cypher tokens are not
+        if metadata.get("langgraph_node") == FORMAT_RESPONSE and message.content:
+            yield {"type": "token", "content": message.content}
+
+def cached_events(answer, start_time):
+    '''Streaming events of an answer served from the answer cache'''
+    yield {"type": "progress", "node": ANSWER_CACHE, "seconds": round(time.perf_counter() - start_time, 3)}
+    yield {"type": "answer", "content": answer}
+
+def graphRAG_stream(role, message):
+    '''Yield the streaming events of the workflow for a question'''
+    with trace_request("sync_stream"):
+        start_time = time.perf_counter()
+        answer_cache = get_answer_cache()
+        answer = answer_cache.lookup(message)
+        if answer is not None:
+            yield from cached_events(answer, start_time)
+            return
+        generation = answer_cache.generation()
+        for mode, chunk in app.stream({"question": message}, stream_mode=STREAM_MODES):
+            for event in stream_events(mode, chunk, start_time):
+                if event["type"] == "answer":
+                    answer_cache.store(message, event["content"], generation)
+                yield event
 
-    return result['documents']
\ No newline at end of file
+async def agraphRAG_stream(role, message):
+    '''graphRAG_stream for the async workflow'''
+    with trace_request("async_stream"):
+        start_time = time.perf_counter()
+        answer_cache = await aget_answer_cache()
+        answer = await asyncio.to_thread(answer_cache.lookup, message)
+        if answer is not None:
+            for event in cached_events(answer, start_time):
+                yield event
+            return
+        generation = answer_cache.generation()
+        workflow = speculative_app if SPECULATIVE_EXECUTION else async_app
+        async for mode, chunk in workflow.astream({"question": message}, stream_mode=STREAM_MODES):
+            for event in stream_events(mode, chunk, start_time):
+                if event["type"] == "answer":
+                    await asyncio.to_thread(answer_cache.store, message, event["content"], generation)
+                yield event
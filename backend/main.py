@@ -1,14 +1,37 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+import os
+import time
+
+START_TIME = time.perf_counter()
 
-from graphRAG import graphRAG
+from flask import Flask, Response, request, jsonify, stream_with_context
+from flask_cors import CORS
 
 import uuid
-import datetime
+
+from graphRAG import graphRAG, graphRAG_stream
+from serving import ERROR_MESSAGE, response_message, stream_response, start_warm_up, startup_report
+from Tools.tracing import get_logger, metrics
+
+IMPORT_SECONDS = time.perf_counter() - START_TIME
+
+DEBUG = True
+
+logger = get_logger("main")
 
 app = Flask(__name__)
 CORS(app)
 
+@app.route('/ready', methods=['GET'])
+def ready():
+    '''Readiness probe: 200 once the warm-up components are built, 503 before, with the per-component startup report'''
+    report = startup_report(IMPORT_SECONDS)
+    return jsonify(report), 200 if report["ready"] else 503
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    '''Prometheus metrics: request, node, LLM and Neo4j latency histograms, token and row counts, cache and router stats'''
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/', methods=['POST'])
 def receive_message():
 
@@ -16,25 +39,30 @@ def receive_message():
     data = request.json
     
     # Log the incoming data
-    print("Received data:", data)
+    logger.debug("Received data: %s", data)
     
     try:
         res = graphRAG(data['role'], data['content'])
         result = str(res)
-    except Exception as e:
-        print(e)
-        result = "I'm sorry, I do not understand the question. Please provide a valid query related to the graph database schema."
-    
-    # Process the incoming message (example: send back a response)
-    response_message = {
-        'role': 'assistant',
-        'content': result,
-        'id': str(uuid.uuid4()),
-        'created_at': datetime.datetime.now().strftime("%Y-%m-%d-%H:%M:%S")
-    }
+    except Exception:
+        logger.exception("Answering failed")
+        result = ERROR_MESSAGE
     
-    # Return the response as JSON
-    return jsonify(response_message), 200
+    # Return the response as JSON; the message format is shared with async_main.py
+    return jsonify(response_message(result)), 200
+
+@app.route('/stream', methods=['POST'])
+def stream_message():
+    '''Same request as POST /, answered with NDJSON events: node progress, then the answer token by token'''
+    data = request.json
+    logger.debug("Received data (stream): %s", data)
+    events = graphRAG_stream(data['role'], data['content'])
+    return Response(stream_with_context(stream_response(str(uuid.uuid4()), events)),
+                    mimetype='application/x-ndjson', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# With the debug reloader, only the child process that serves requests warms up
+if __name__ != "__main__" or not DEBUG or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+    start_warm_up()
 
 if __name__ == "__main__":
-    app.run(debug=True, host='0.0.0.0', port=5001)
\ No newline at end of file
+    app.run(debug=DEBUG, host='0.0.0.0', port=5001)
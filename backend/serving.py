@@ -0,0 +1,97 @@
+'''Request/response contract (POST / and the NDJSON events of POST /stream) and startup warm-up shared by the Flask server (main.py) and the async server (async_main.py)'''
+import json
+import os
+import threading
+import time
+import uuid
+import datetime
+
+from Chains.registry import registry
+from Tools.tracing import get_logger
+
+# Warm-up of the LLM clients, Neo4j connection, vector index and chains: "background" (serve
+# requests while warming up), "blocking" (warm up before serving) or "off" (build on first use)
+WARM_UP = os.environ.get("WARM_UP", "background")
+# Comma-separated components to warm up (see Chains/registry.py); all registered ones by default
+WARM_UP_COMPONENTS = [name.strip() for name in os.environ.get("WARM_UP_COMPONENTS", "").split(",") if name.strip()]
+WARM_UP_MAX_DELAY = 30
+
+ERROR_MESSAGE = "I'm sorry, I do not understand the question. Please provide a valid query related to the graph database schema."
+
+logger = get_logger("serving")
+
+warm_up_done = threading.Event()
+warm_up_seconds = None
+
+def response_message(result, message_id=None):
+    '''Assistant message returned for a question'''
+    return {
+        'role': 'assistant',
+        'content': result,
+        'id': message_id or str(uuid.uuid4()),
+        'created_at': datetime.datetime.now().strftime("%Y-%m-%d-%H:%M:%S")
+    }
+
+def ndjson(event):
+    return json.dumps(event, default=str) + "\n"
+
+def stream_response(message_id, events):
+    '''
+    NDJSON lines for POST /stream: a "start" event right away, the workflow's progress and token
+    events (see graphRAG.stream_events), then the final "message" with the same fields as POST /
+    '''
+    yield ndjson({"type": "start", "id": message_id})
+    result = ERROR_MESSAGE
+    try:
+        for event in events:
+            if event["type"] == "answer":
+                result = str(event["content"])
+            else:
+                yield ndjson(event)
+    except Exception:
+        logger.exception("Streaming failed")
+    yield ndjson({"type": "message", **response_message(result, message_id)})
+
+async def astream_response(message_id, events):
+    '''stream_response for an async generator of events'''
+    yield ndjson({"type": "start", "id": message_id})
+    result = ERROR_MESSAGE
+    try:
+        async for event in events:
+            if event["type"] == "answer":
+                result = str(event["content"])
+            else:
+                yield ndjson(event)
+    except Exception:
+        logger.exception("Streaming failed")
+    yield ndjson({"type": "message", **response_message(result, message_id)})
+
+def warm_up():
+    '''Build the warm-up components, retrying the ones that fail (e.g. Neo4j not reachable yet) with backoff'''
+    global warm_up_seconds
+    start_time = time.perf_counter()
+    delay = 1
+    failed = registry.warm_up(WARM_UP_COMPONENTS or None)
+    while failed:
+        logger.warning("Retrying warm-up of %s in %s s", ", ".join(failed), delay)
+        time.sleep(delay)
+        delay = min(delay * 2, WARM_UP_MAX_DELAY)
+        failed = registry.warm_up(failed)
+    warm_up_seconds = time.perf_counter() - start_time
+    warm_up_done.set()
+    logger.info("Startup report: %s", startup_report())
+
+def start_warm_up():
+    if WARM_UP == "blocking":
+        warm_up()
+    elif WARM_UP == "background":
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+def startup_report(import_seconds=None):
+    return {
+        "ready": WARM_UP == "off" or warm_up_done.is_set(),
+        "warm_up": WARM_UP,
+        "import_seconds": round(import_seconds, 4) if import_seconds is not None else None,
+        "warm_up_seconds": round(warm_up_seconds, 4) if warm_up_seconds is not None else None,
+        "components": registry.report(),
+    }
@@ -23,6 +23,18 @@ const suggestedActions = [
   },
 ];
 
+// Status shown while the backend works, keyed by the workflow step that just finished
+const progressLabels: Record<string, string> = {
+  decomposer: "Breaking down the question",
+  vector_search: "Found related articles",
+  prompt_template: "Preparing the graph query",
+  prompt_template_with_context: "Preparing the graph query",
+  graph_qa: "Queried the graph database, writing the answer",
+  graph_qa_with_context: "Queried the graph database, writing the answer",
+  answer_cache: "Answered from a previous question",
+  template_query: "Queried the graph database, writing the answer",
+};
+
 export function Chat({
   id,
   initialMessages,
@@ -50,9 +62,19 @@ export function Chat({
     // that you can find when you run flask at the backend,
     const url = "http://192.168.10.20:5001/";
 
+    // Adds the assistant message, or replaces it as more of the answer streams in
+    const upsertMessage = (message: Message) =>
+      setMessages((prevMessages) =>
+        prevMessages.some((m) => m.id === message.id)
+          ? prevMessages.map((m) => (m.id === message.id ? message : m))
+          : [...prevMessages, message]
+      );
+
     try {
       setInput("");
-      const response = await fetch(url, {
+      // The stream endpoint answers with one JSON event per line: progress
+      // as each backend step finishes, then the answer token by token
+      const response = await fetch(url + "stream", {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
@@ -64,25 +86,52 @@ export function Chat({
         }),
       });
 
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         const errorData = await response.text();
         console.error("API request failed:", response.status, errorData);
+        return;
       }
 
-      const json = await response.json();
-      console.log("Response from server:", json);
-
-      const res: Message = {
-        id: json.id,
-        role: json.role,
-        content: json.content,
-        createdAt: json.created_at,
-      };
-
-      setMessages((prevMessages) => [...prevMessages, res]);
-      setIsLoading(false);
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let messageId = uuidv4();
+      let answer = "";
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split("\n");
+        buffer = lines.pop() ?? "";
+
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const event = JSON.parse(line);
+
+          if (event.type === "start") {
+            messageId = event.id;
+          } else if (event.type === "progress" && !answer) {
+            const step = progressLabels[event.node] ?? event.node;
+            upsertMessage({ id: messageId, role: "assistant", content: `_${step}..._` });
+          } else if (event.type === "token") {
+            answer += event.content;
+            upsertMessage({ id: messageId, role: "assistant", content: answer });
+          } else if (event.type === "message") {
+            console.log("Response from server:", event);
+            upsertMessage({
+              id: event.id,
+              role: event.role,
+              content: event.content,
+              createdAt: event.created_at,
+            });
+          }
+        }
+      }
     } catch (error) {
       console.error("Error:", error);
+    } finally {
+      setIsLoading(false);
     }
   };
 
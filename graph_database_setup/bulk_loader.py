@@ -0,0 +1,207 @@
+"""
+Batched bulk loader for the sampled OpenCitations data.
+
+This replaces the row-at-a-time upload in 4_RUN_THIS_upload_sampled_data_to_Neo4j.ipynb.
+Instead of one transaction per publication, author and citation, the CSV files are
+streamed in batches and every batch is written with a single `UNWIND $rows` statement
+in one transaction.
+
+Usage (from the repository root):
+    python -m graph_database_setup.bulk_loader --batch-size 10000
+"""
+import argparse
+import os
+import time
+
+import pandas as pd
+from neo4j import GraphDatabase
+
+from graph_database_setup.graph_version import bump_graph_version
+from graph_database_setup.schema import ensure_schema
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+CITATIONS_FILE = os.path.join(DATA_DIR, "sampled_citations.csv")
+METADATA_FILE = os.path.join(DATA_DIR, "sampled_citations_metadata_clean.csv")
+
+# Neo4j connection details (same variables as backend/.env)
+NEO4J_URI = os.environ.get("NEO4J_URI", "bolt://localhost:7687")
+NEO4J_USER = os.environ.get("NEO4J_USERNAME", "neo4j")
+NEO4J_PASSWORD = os.environ.get("NEO4J_PASSWORD", "password")
+
+BATCH_SIZE = 10000
+
+# The upload notebook splits authors on ';'
+AUTHOR_SEPARATOR = ";"
+
+# One statement per batch: publication nodes, their authors and the AUTHORED relationships
+PUBLICATION_QUERY = """
+UNWIND $rows AS row
+MERGE (p:Publication {omid: row.omid})
+SET p.title = row.title, p.year = row.year, p.month = row.month, p.day = row.day, p.venue = row.venue, p.publisher = row.publisher
+WITH p, row
+UNWIND row.authors AS author_name
+MERGE (a:Author {name: author_name})
+MERGE (a)-[:AUTHORED]->(p)
+"""
+
+CITATION_QUERY = """
+UNWIND $rows AS row
+MATCH (citing:Publication {omid: row.citing})
+MATCH (cited:Publication {omid: row.cited})
+MERGE (citing)-[:CITED]->(cited)
+"""
+
+
+def split_authors(authors_str, separator=AUTHOR_SEPARATOR):
+    """Split an author string into a list of cleaned author names."""
+    if isinstance(authors_str, str):
+        return [author.strip() for author in authors_str.split(separator) if author.strip()]
+    return []
+
+
+def publication_rows(chunk, author_separator=AUTHOR_SEPARATOR):
+    """
+    Convert a chunk of the metadata CSV into parameter rows for PUBLICATION_QUERY.
+
+    Parameters:
+        chunk (pd.DataFrame): Rows of sampled_citations_metadata_clean.csv.
+        author_separator (str): Separator used in the 'author' column.
+
+    Returns:
+        list of dict: One row per publication, with missing values as None.
+    """
+    rows = pd.DataFrame({
+        "omid": chunk["omid"],
+        "title": chunk["title"],
+        "venue": chunk["venue"],
+        "publisher": chunk["publisher"],
+    })
+    # pub_year/pub_month/pub_day are floats in the CSV (e.g. 2016.0); store them as integers
+    for column, source in (("year", "pub_year"), ("month", "pub_month"), ("day", "pub_day")):
+        rows[column] = pd.to_numeric(chunk[source], errors="coerce").astype("Int64")
+    rows = rows.astype(object).where(rows.notna(), None)
+    rows["authors"] = chunk["author"].map(lambda authors: split_authors(authors, author_separator))
+    return rows[rows["omid"].notna()].to_dict("records")
+
+
+def citation_rows(chunk):
+    """Convert a chunk of the citations CSV into parameter rows for CITATION_QUERY."""
+    rows = chunk[["citing", "cited"]].dropna()
+    return rows.to_dict("records")
+
+
+def iter_batches(file_path, batch_size, to_rows, **read_csv_kwargs):
+    """Stream a CSV file and yield lists of parameter rows of at most batch_size rows."""
+    for chunk in pd.read_csv(file_path, chunksize=batch_size, **read_csv_kwargs):
+        rows = to_rows(chunk)
+        if rows:
+            yield rows
+
+
+def _write_batch(tx, query, rows):
+    return tx.run(query, rows=rows).consume()
+
+
+def load_batches(session, query, batches, label):
+    """
+    Write each batch in its own transaction and report throughput.
+
+    Parameters:
+        session (neo4j.Session): Open Neo4j session.
+        query (str): UNWIND statement taking a $rows parameter.
+        batches (iterable of list): Batches produced by iter_batches.
+        label (str): Name used in progress messages.
+
+    Returns:
+        dict: Number of rows, elapsed seconds and rows/sec.
+    """
+    start_time = time.time()
+    total_rows = 0
+    for batch in batches:
+        batch_start = time.time()
+        session.execute_write(_write_batch, query, batch)
+        batch_time = time.time() - batch_start
+        total_rows += len(batch)
+        elapsed_time = time.time() - start_time
+        print(f"Loaded {total_rows} {label}. "
+              f"Batch: {len(batch) / max(batch_time, 1e-9):.0f} rows/sec, "
+              f"overall: {total_rows / max(elapsed_time, 1e-9):.0f} rows/sec", end="\r")
+    print()
+    elapsed_time = time.time() - start_time
+    return {"rows": total_rows, "seconds": elapsed_time, "rows_per_sec": total_rows / max(elapsed_time, 1e-9)}
+
+
+def load_graph(driver, citations_file=CITATIONS_FILE, metadata_file=METADATA_FILE,
+               batch_size=BATCH_SIZE, author_separator=AUTHOR_SEPARATOR):
+    """
+    Upload publications, authors and citations to Neo4j in batches.
+
+    The schema (constraints and indexes) is provisioned first, then publications are loaded
+    so that the citation MATCHes find both endpoints.
+
+    Returns:
+        dict: Throughput statistics for the 'publications' and 'citations' steps.
+    """
+    # MERGE on omid/name only stays fast while the graph grows if these lookups are indexed
+    ensure_schema(driver)
+
+    stats = {}
+    with driver.session() as session:
+        publication_batches = iter_batches(
+            metadata_file, batch_size,
+            lambda chunk: publication_rows(chunk, author_separator),
+            dtype={"omid": "object", "title": "object", "author": "object",
+                   "venue": "object", "publisher": "object"},
+        )
+        stats["publications"] = load_batches(session, PUBLICATION_QUERY, publication_batches, "publications")
+
+        citation_batches = iter_batches(
+            citations_file, batch_size, citation_rows,
+            usecols=["citing", "cited"], dtype={"citing": "object", "cited": "object"},
+        )
+        stats["citations"] = load_batches(session, CITATION_QUERY, citation_batches, "citations")
+
+    # Answers cached by the backend were computed on the previous data
+    print(f"Graph version: {bump_graph_version(driver)}")
+
+    for step, step_stats in stats.items():
+        print(f"{step}: {step_stats['rows']} rows in {format_time(step_stats['seconds'])} "
+              f"({step_stats['rows_per_sec']:.0f} rows/sec)")
+    return stats
+
+
+# Function to format the time in a human-readable format
+def format_time(seconds):
+    if seconds < 60:
+        return f"{seconds:.2f} seconds"
+    elif seconds < 3600:
+        minutes = seconds / 60
+        return f"{minutes:.2f} minutes"
+    elif seconds < 86400:
+        hours = seconds / 3600
+        return f"{hours:.2f} hours"
+    else:
+        days = seconds / 86400
+        return f"{days:.2f} days"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk load the sampled OpenCitations CSV files into Neo4j.")
+    parser.add_argument("--citations", default=CITATIONS_FILE, help="Path to sampled_citations.csv")
+    parser.add_argument("--metadata", default=METADATA_FILE, help="Path to sampled_citations_metadata_clean.csv")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Rows per UNWIND transaction")
+    parser.add_argument("--author-separator", default=AUTHOR_SEPARATOR, help="Separator of the 'author' column")
+    parser.add_argument("--uri", default=NEO4J_URI)
+    parser.add_argument("--user", default=NEO4J_USER)
+    parser.add_argument("--password", default=NEO4J_PASSWORD)
+    args = parser.parse_args()
+
+    driver = GraphDatabase.driver(args.uri, auth=(args.user, args.password))
+    try:
+        load_graph(driver, args.citations, args.metadata, args.batch_size, args.author_separator)
+    finally:
+        driver.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Compact in-memory citation graph.
+
+Omids are interned into dense int32 ids: the id of an omid is its position in the sorted array of
+omid keys (see stream_filter.omid_keys), so lookups are a binary search and need no hash table.
+Edges are stored twice in CSR form, once grouped by citing publication (cites) and once grouped
+by cited publication (cited_by), with int64 row pointers and int32 neighbour ids. A graph can be
+saved as a directory of .npy files and loaded back memory-mapped.
+
+Usage (from the repository root):
+    python -m graph_database_setup.citation_graph graph_database_setup/sampled_citations.csv graph_database_setup/snapshots/citation_graph
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from graph_database_setup.stream_filter import CHUNK_SIZE, NULL_KEY, OmidIndex, omid_keys
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+CITATIONS_FILE = os.path.join(DATA_DIR, "sampled_citations.csv")
+SNAPSHOT_DIR = os.path.join(DATA_DIR, "snapshots", "citation_graph")
+# Written next to the arrays: the CSV the snapshot was built from
+MANIFEST_FILE = "source.json"
+
+_ARRAYS = ["keys", "omids", "cites_indptr", "cites_indices", "cited_by_indptr", "cited_by_indices"]
+
+
+def build_csr(rows, columns, num_nodes):
+    """Build (indptr, indices) for edges rows -> columns."""
+    order = np.argsort(rows, kind="stable")
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=num_nodes), out=indptr[1:])
+    return indptr, columns[order].astype(np.int32)
+
+
+def gather_rows(indptr, indices, nodes):
+    """Concatenate the neighbour lists of the given nodes without a Python loop."""
+    nodes = np.asarray(nodes, dtype=np.int64)
+    starts = indptr[nodes]
+    counts = indptr[nodes + 1] - starts
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int32)
+    # Position of every neighbour in `indices`: its list start plus its offset within the list
+    offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(total)
+    return np.asarray(indices[offsets])
+
+
+class CitationGraph:
+    """Citation graph over interned omids with forward (cites) and reverse (cited_by) CSR indexes."""
+
+    def __init__(self, keys, omids, cites_indptr, cites_indices, cited_by_indptr, cited_by_indices):
+        self.keys = keys
+        self.omids = omids
+        self.cites_indptr = cites_indptr
+        self.cites_indices = cites_indices
+        self.cited_by_indptr = cited_by_indptr
+        self.cited_by_indices = cited_by_indices
+
+    @property
+    def num_nodes(self):
+        return len(self.keys)
+
+    @property
+    def num_edges(self):
+        return len(self.cites_indices)
+
+    @classmethod
+    def from_csv(cls, file_path=CITATIONS_FILE, chunksize=CHUNK_SIZE):
+        """
+        Build the graph from a citations CSV with 'citing' and 'cited' omid columns.
+
+        The file is read twice: once to collect the omids, once to map the edges to ids.
+        Duplicate citations are kept only once, as MERGE does in Neo4j.
+        """
+        def read():
+            for chunk in pd.read_csv(file_path, usecols=["citing", "cited"], dtype=str, chunksize=chunksize):
+                yield chunk["citing"].str.strip(), chunk["cited"].str.strip()
+
+        max_length = 1
+
+        def key_chunks():
+            nonlocal max_length
+            for citing, cited in read():
+                for column in (citing, cited):
+                    max_length = max(max_length, int(np.nan_to_num(column.str.len().max())))
+                    yield omid_keys(column)
+
+        keys = OmidIndex.from_key_chunks(key_chunks()).keys
+        omids = np.zeros(len(keys), dtype=f"S{max_length}")
+        edges = []
+        for citing, cited in read():
+            citing_keys = omid_keys(citing)
+            cited_keys = omid_keys(cited)
+            valid = (citing_keys != NULL_KEY) & (cited_keys != NULL_KEY)
+            citing_ids = np.searchsorted(keys, citing_keys[valid])
+            cited_ids = np.searchsorted(keys, cited_keys[valid])
+            omids[citing_ids] = citing[valid].to_numpy(dtype=object).astype(bytes)
+            omids[cited_ids] = cited[valid].to_numpy(dtype=object).astype(bytes)
+            # Pack each edge into one int64 so duplicates can be dropped with np.unique
+            edges.append(np.unique((citing_ids.astype(np.int64) << 32) | cited_ids))
+        edges = np.unique(np.concatenate(edges)) if edges else np.empty(0, dtype=np.int64)
+        return cls.from_edges(keys, omids, (edges >> 32).astype(np.int32), (edges & 0xFFFFFFFF).astype(np.int32))
+
+    @classmethod
+    def from_edges(cls, keys, omids, citing_ids, cited_ids):
+        """Build both CSR indexes from parallel arrays of citing and cited ids."""
+        num_nodes = len(keys)
+        cites_indptr, cites_indices = build_csr(citing_ids, cited_ids, num_nodes)
+        cited_by_indptr, cited_by_indices = build_csr(cited_ids, citing_ids, num_nodes)
+        return cls(keys, omids, cites_indptr, cites_indices, cited_by_indptr, cited_by_indices)
+
+    def save(self, directory=SNAPSHOT_DIR):
+        """Save the graph as one .npy file per array."""
+        os.makedirs(directory, exist_ok=True)
+        for name in _ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+
+    @classmethod
+    def load(cls, directory=SNAPSHOT_DIR, mmap_mode="r"):
+        """Load a saved graph; by default the arrays are memory-mapped, not read into memory."""
+        return cls(*[np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode) for name in _ARRAYS])
+
+    def ids_of(self, omids):
+        """Return the ids of the given omids, -1 for omids that are not in the graph."""
+        keys = omid_keys(omids)
+        if not self.num_nodes:
+            return np.full(len(keys), -1, dtype=np.int64)
+        positions = np.searchsorted(self.keys, keys)
+        positions[positions == self.num_nodes] = 0
+        found = (np.asarray(self.keys)[positions] == keys) & (keys != NULL_KEY)
+        return np.where(found, positions, -1)
+
+    def id_of(self, omid):
+        return int(self.ids_of([omid])[0])
+
+    def omids_of(self, ids):
+        """Return the omid strings of the given ids."""
+        return np.char.decode(np.asarray(self.omids)[np.asarray(ids, dtype=np.int64)], "ascii")
+
+    def out_degree(self):
+        """Number of publications each publication cites."""
+        return np.diff(self.cites_indptr)
+
+    def in_degree(self):
+        """Number of citations each publication received."""
+        return np.diff(self.cited_by_indptr)
+
+    def cites(self, node):
+        """Ids of the publications cited by `node`."""
+        return np.asarray(self.cites_indices[self.cites_indptr[node]:self.cites_indptr[node + 1]])
+
+    def cited_by(self, node):
+        """Ids of the publications citing `node`."""
+        return np.asarray(self.cited_by_indices[self.cited_by_indptr[node]:self.cited_by_indptr[node + 1]])
+
+    def neighbors(self, nodes, direction="both"):
+        """
+        Concatenated neighbours of several nodes (may contain repeats).
+
+        Parameters:
+            nodes (array-like of int): Node ids.
+            direction (str): 'cites', 'cited_by' or 'both'.
+        """
+        parts = []
+        if direction in ("cites", "both"):
+            parts.append(gather_rows(self.cites_indptr, self.cites_indices, nodes))
+        if direction in ("cited_by", "both"):
+            parts.append(gather_rows(self.cited_by_indptr, self.cited_by_indices, nodes))
+        return np.concatenate(parts)
+
+    def k_hop(self, seeds, k, direction="both"):
+        """
+        Breadth-first k-hop neighbourhood of the seed nodes.
+
+        Returns:
+            tuple: (node ids, hop distance of each node); the seeds themselves are not included.
+        """
+        visited = np.zeros(self.num_nodes, dtype=bool)
+        frontier = np.unique(np.asarray(seeds, dtype=np.int64))
+        visited[frontier] = True
+        nodes = []
+        hops = []
+        for hop in range(1, k + 1):
+            if not len(frontier):
+                break
+            candidates = np.unique(self.neighbors(frontier, direction))
+            frontier = candidates[~visited[candidates]]
+            visited[frontier] = True
+            nodes.append(frontier)
+            hops.append(np.full(len(frontier), hop, dtype=np.int32))
+        if not nodes:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32)
+        return np.concatenate(nodes).astype(np.int64), np.concatenate(hops)
+
+
+def source_manifest(file_path):
+    """Identify a CSV by its absolute path, size and modification time."""
+    stat = os.stat(file_path)
+    return {"path": os.path.abspath(file_path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def save_snapshot(graph, file_path, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Save a graph together with the manifest of the CSV it was built from. The manifest is removed
+    first and written last, so a partly overwritten snapshot never matches any CSV.
+    """
+    manifest_file = os.path.join(snapshot_dir, MANIFEST_FILE)
+    if os.path.exists(manifest_file):
+        os.remove(manifest_file)
+    graph.save(snapshot_dir)
+    with open(manifest_file, "w") as f:
+        json.dump(source_manifest(file_path), f)
+
+
+def load_citation_graph(file_path=CITATIONS_FILE, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Load the snapshot of a citations CSV, building and saving it first if it is missing or was
+    built from another file or an older version of this one (its manifest does not match).
+    """
+    try:
+        with open(os.path.join(snapshot_dir, MANIFEST_FILE)) as f:
+            fresh = json.load(f) == source_manifest(file_path)
+    except (OSError, ValueError):
+        fresh = False
+    if fresh:
+        return CitationGraph.load(snapshot_dir)
+    graph = CitationGraph.from_csv(file_path)
+    save_snapshot(graph, file_path, snapshot_dir)
+    return graph
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a binary CSR snapshot of a citations CSV.")
+    parser.add_argument("citations_file", nargs="?", default=CITATIONS_FILE)
+    parser.add_argument("snapshot_dir", nargs="?", default=SNAPSHOT_DIR)
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    start_time = time.time()
+    graph = CitationGraph.from_csv(args.citations_file, args.chunksize)
+    save_snapshot(graph, args.citations_file, args.snapshot_dir)
+    print(f"Saved {graph.num_nodes} publications and {graph.num_edges} citations to {args.snapshot_dir} "
+          f"in {time.time() - start_time:.2f} seconds.")
+
+
+if __name__ == "__main__":
+    main()
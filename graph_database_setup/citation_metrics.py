@@ -0,0 +1,296 @@
+"""
+Citation velocity and impact score engine.
+
+Every citation edge is dated with the publication year of the citing paper, then counted per cited
+publication and year. The per-publication counts are expanded to authors and venues through
+their incidence arrays, and the same metrics are computed at each level. Everything is done with
+NumPy array operations (sorting, np.unique, np.bincount); there are no loops over rows.
+
+Metrics, for a reference year R (default: the latest citing year) and a window of W years:
+    citation_count          all citations received
+    citation_rate           citations per year since publication (authors: since first publication)
+    citation_velocity       mean citations per year over the last W years, R-W+1 .. R
+    citation_acceleration   velocity minus the velocity of the W years before that
+    impact_score            weighted sum of log1p(citation_count), log1p(citation_rate),
+                            log1p(citation_velocity) and the signed log1p of the acceleration,
+                            with weights from IMPACT_WEIGHTS
+    citation_years / citation_year_counts   the yearly series (publications and authors)
+
+Publication and Author metrics are written back as node properties; venue metrics are written as
+venue_* properties on every Publication of that venue, since venues are not nodes.
+
+Usage (from the repository root):
+    python -m graph_database_setup.citation_metrics --write
+    python -m graph_database_setup.citation_metrics --output-dir metrics/ --window 5 --weight velocity=2
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from neo4j import GraphDatabase
+
+from graph_database_setup.bulk_loader import (AUTHOR_SEPARATOR, BATCH_SIZE, CITATIONS_FILE, METADATA_FILE,
+                                              NEO4J_PASSWORD, NEO4J_URI, NEO4J_USER, load_batches)
+from graph_database_setup.citation_graph import build_csr, gather_rows, load_citation_graph
+from graph_database_setup.graph_version import bump_graph_version
+from graph_database_setup.stream_filter import omid_keys
+
+VELOCITY_WINDOW = 3
+
+IMPACT_WEIGHTS = {
+    "citation_count": 1.0,
+    "citation_rate": 1.0,
+    "citation_velocity": 1.0,
+    "citation_acceleration": 0.5,
+}
+
+PUBLICATION_METRICS_QUERY = """
+UNWIND $rows AS row
+MATCH (p:Publication {omid: row.key})
+SET p.citation_count = row.citation_count, p.citation_rate = row.citation_rate,
+    p.citation_velocity = row.citation_velocity, p.citation_acceleration = row.citation_acceleration,
+    p.impact_score = row.impact_score,
+    p.citation_years = row.citation_years, p.citation_year_counts = row.citation_year_counts
+"""
+
+AUTHOR_METRICS_QUERY = """
+UNWIND $rows AS row
+MATCH (a:Author {name: row.key})
+SET a.citation_count = row.citation_count, a.citation_rate = row.citation_rate,
+    a.citation_velocity = row.citation_velocity, a.citation_acceleration = row.citation_acceleration,
+    a.impact_score = row.impact_score,
+    a.citation_years = row.citation_years, a.citation_year_counts = row.citation_year_counts
+"""
+
+VENUE_METRICS_QUERY = """
+UNWIND $rows AS row
+MATCH (p:Publication {venue: row.key})
+SET p.venue_citation_count = row.citation_count, p.venue_citation_rate = row.citation_rate,
+    p.venue_citation_velocity = row.citation_velocity, p.venue_citation_acceleration = row.citation_acceleration,
+    p.venue_impact_score = row.impact_score
+"""
+
+
+def yearly_counts(entities, years, weights=None):
+    """
+    Sum weights (default 1) per (entity, year).
+
+    Returns:
+        tuple: (entity, year, count) arrays sorted by entity then year.
+    """
+    entities = np.asarray(entities, dtype=np.int64)
+    years = np.asarray(years, dtype=np.int64)
+    if not len(entities):
+        return entities, years, np.empty(0, dtype=np.float64)
+    first_year = years.min()
+    span = years.max() - first_year + 1
+    pairs, inverse = np.unique(entities * span + (years - first_year), return_inverse=True)
+    counts = np.bincount(inverse, weights=weights, minlength=len(pairs))
+    return pairs // span, pairs % span + first_year, counts
+
+
+def expand(entity_indptr, entity_indices, rows):
+    """For each row id, repeat it once per entity linked to it; returns (positions, entity ids)."""
+    rows = np.asarray(rows, dtype=np.int64)
+    degrees = entity_indptr[rows + 1] - entity_indptr[rows]
+    return np.repeat(np.arange(len(rows)), degrees), gather_rows(entity_indptr, entity_indices, rows)
+
+
+def entity_metrics(num_entities, counts, totals, first_time, reference_year,
+                   window=VELOCITY_WINDOW, weights=IMPACT_WEIGHTS):
+    """
+    Compute the metrics of one level (publications, authors or venues).
+
+    Parameters:
+        num_entities (int): Number of entities.
+        counts (tuple): (entity, year, count) arrays from yearly_counts.
+        totals (np.ndarray): All citations of each entity, dated or not.
+        first_time (np.ndarray): Fractional publication time (year + (month - 1) / 12) of each
+            entity, NaN when unknown.
+        reference_year (int): Last year of the velocity window.
+        window (int): Velocity window in years.
+        weights (dict): Impact score weights.
+
+    Returns:
+        pd.DataFrame: One row per entity.
+    """
+    entity, year, count = counts
+    recent = (year > reference_year - window) & (year <= reference_year)
+    previous = (year > reference_year - 2 * window) & (year <= reference_year - window)
+    velocity = np.bincount(entity[recent], weights=count[recent], minlength=num_entities) / window
+    previous_velocity = np.bincount(entity[previous], weights=count[previous], minlength=num_entities) / window
+    acceleration = velocity - previous_velocity
+
+    age = np.clip(reference_year + 1 - first_time, 1, None)
+    rate = totals / age  # NaN when the publication time is unknown
+
+    impact = (
+        weights.get("citation_count", 0) * np.log1p(totals)
+        + weights.get("citation_rate", 0) * np.nan_to_num(np.log1p(rate))
+        + weights.get("citation_velocity", 0) * np.log1p(velocity)
+        + weights.get("citation_acceleration", 0) * np.sign(acceleration) * np.log1p(np.abs(acceleration))
+    )
+    return pd.DataFrame({
+        "citation_count": totals.astype(np.int64),
+        "citation_rate": rate,
+        "citation_velocity": velocity,
+        "citation_acceleration": acceleration,
+        "impact_score": impact,
+    })
+
+
+def yearly_series(num_entities, counts):
+    """Split the (entity, year, count) arrays into per-entity year and count lists."""
+    entity, year, count = counts
+    boundaries = np.searchsorted(entity, np.arange(1, num_entities))
+    return ([years.tolist() for years in np.split(year, boundaries)],
+            [values.astype(np.int64).tolist() for values in np.split(count, boundaries)])
+
+
+def compute_metrics(citations_file=CITATIONS_FILE, metadata_file=METADATA_FILE, reference_year=None,
+                    window=VELOCITY_WINDOW, weights=IMPACT_WEIGHTS, author_separator=AUTHOR_SEPARATOR):
+    """
+    Compute publication, author and venue metrics.
+
+    Only citations between publications that have metadata are counted, as only those become
+    CITED relationships in Neo4j.
+
+    Returns:
+        dict: 'publications', 'authors' and 'venues' DataFrames, each with a 'key' column
+        (omid, author name, venue name) and the metric columns.
+    """
+    start_time = time.time()
+    metadata = pd.read_csv(metadata_file, usecols=["omid", "author", "venue", "pub_year", "pub_month"],
+                           dtype={"omid": "object", "author": "object", "venue": "object"})
+    metadata = metadata.dropna(subset=["omid"]).drop_duplicates("omid")
+    pub_keys = omid_keys(metadata["omid"])
+    order = np.argsort(pub_keys)
+    pub_keys = pub_keys[order]
+    metadata = metadata.iloc[order].reset_index(drop=True)
+    num_pubs = len(metadata)
+
+    pub_year = pd.to_numeric(metadata["pub_year"], errors="coerce").to_numpy(dtype=np.float64)
+    pub_month = pd.to_numeric(metadata["pub_month"], errors="coerce").to_numpy(dtype=np.float64)
+    pub_time = pub_year + np.nan_to_num(pub_month - 1) / 12
+
+    # Map the graph's interned ids onto metadata rows and keep edges between known publications
+    graph = load_citation_graph(citations_file)
+    node_to_pub = np.searchsorted(pub_keys, np.asarray(graph.keys))
+    node_to_pub[node_to_pub == num_pubs] = 0
+    node_to_pub = np.where(pub_keys[node_to_pub] == np.asarray(graph.keys), node_to_pub, -1)
+    citing = node_to_pub[np.repeat(np.arange(graph.num_nodes), graph.out_degree())]
+    cited = node_to_pub[np.asarray(graph.cites_indices)]
+    known = (citing >= 0) & (cited >= 0)
+    citing, cited = citing[known], cited[known]
+
+    # Date each citation with the publication year of the citing paper
+    citation_year = pub_year[citing]
+    dated = ~np.isnan(citation_year)
+    if reference_year is None:
+        reference_year = int(citation_year[dated].max()) if dated.any() else int(time.strftime("%Y"))
+
+    pub_counts = yearly_counts(cited[dated], citation_year[dated].astype(np.int64))
+    pub_totals = np.bincount(cited, minlength=num_pubs).astype(np.float64)
+    publications = entity_metrics(num_pubs, pub_counts, pub_totals, pub_time, reference_year, window, weights)
+    publications.insert(0, "key", metadata["omid"].to_numpy())
+    publications["citation_years"], publications["citation_year_counts"] = yearly_series(num_pubs, pub_counts)
+
+    # Authors: publication -> author incidence, split as in the loader
+    authors = metadata["author"].str.split(author_separator).explode().str.strip()
+    authors = authors[authors.notna() & (authors != "")]
+    author_ids, author_names = pd.factorize(authors)
+    author_pubs = authors.index.to_numpy()
+    author_indptr, author_indices = build_csr(author_pubs, author_ids, num_pubs)
+    positions, author_of_count = expand(author_indptr, author_indices, pub_counts[0])
+    author_counts = yearly_counts(author_of_count, pub_counts[1][positions], pub_counts[2][positions])
+    author_totals = np.bincount(author_ids, weights=pub_totals[author_pubs], minlength=len(author_names))
+    author_first = np.full(len(author_names), np.inf)
+    np.fmin.at(author_first, author_ids, pub_time[author_pubs])
+    author_first[np.isinf(author_first)] = np.nan
+    author_metrics = entity_metrics(len(author_names), author_counts, author_totals, author_first,
+                                    reference_year, window, weights)
+    author_metrics.insert(0, "key", np.asarray(author_names))
+    author_metrics["citation_years"], author_metrics["citation_year_counts"] = yearly_series(
+        len(author_names), author_counts)
+
+    # Venues: one venue per publication
+    venue_ids, venue_names = pd.factorize(metadata["venue"])
+    with_venue = venue_ids[pub_counts[0]] >= 0
+    venue_counts = yearly_counts(venue_ids[pub_counts[0]][with_venue], pub_counts[1][with_venue],
+                                 pub_counts[2][with_venue])
+    has_venue = venue_ids >= 0
+    venue_totals = np.bincount(venue_ids[has_venue], weights=pub_totals[has_venue], minlength=len(venue_names))
+    venue_first = np.full(len(venue_names), np.inf)
+    np.fmin.at(venue_first, venue_ids[has_venue], pub_time[has_venue])
+    venue_first[np.isinf(venue_first)] = np.nan
+    venue_metrics = entity_metrics(len(venue_names), venue_counts, venue_totals, venue_first,
+                                   reference_year, window, weights)
+    venue_metrics.insert(0, "key", np.asarray(venue_names))
+
+    print(f"Computed metrics for {num_pubs} publications, {len(author_names)} authors and "
+          f"{len(venue_names)} venues from {len(cited)} citations (reference year {reference_year}) "
+          f"in {time.time() - start_time:.2f} seconds.")
+    return {"publications": publications, "authors": author_metrics, "venues": venue_metrics}
+
+
+def _metric_batches(df, batch_size):
+    rows = df.astype(object).where(df.notna(), None)
+    for start in range(0, len(rows), batch_size):
+        yield rows.iloc[start:start + batch_size].to_dict("records")
+
+
+def write_metrics(driver, metrics, batch_size=BATCH_SIZE):
+    """Write the metrics back to Neo4j as node properties, one UNWIND transaction per batch."""
+    with driver.session() as session:
+        load_batches(session, PUBLICATION_METRICS_QUERY, _metric_batches(metrics["publications"], batch_size),
+                     "publication metrics")
+        load_batches(session, AUTHOR_METRICS_QUERY, _metric_batches(metrics["authors"], batch_size),
+                     "author metrics")
+        load_batches(session, VENUE_METRICS_QUERY, _metric_batches(metrics["venues"], batch_size),
+                     "venue metrics")
+    print(f"Graph version: {bump_graph_version(driver)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute citation velocity and impact scores.")
+    parser.add_argument("--citations", default=CITATIONS_FILE)
+    parser.add_argument("--metadata", default=METADATA_FILE)
+    parser.add_argument("--reference-year", type=int, default=None, help="Default: latest citing year")
+    parser.add_argument("--window", type=int, default=VELOCITY_WINDOW, help="Velocity window in years")
+    parser.add_argument("--weight", action="append", default=[], metavar="NAME=VALUE",
+                        help=f"Impact score weight, one of {', '.join(IMPACT_WEIGHTS)}")
+    parser.add_argument("--author-separator", default=AUTHOR_SEPARATOR)
+    parser.add_argument("--output-dir", default=None, help="Save publications.csv, authors.csv and venues.csv here")
+    parser.add_argument("--write", action="store_true", help="Write the metrics to Neo4j as node properties")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--uri", default=NEO4J_URI)
+    parser.add_argument("--user", default=NEO4J_USER)
+    parser.add_argument("--password", default=NEO4J_PASSWORD)
+    args = parser.parse_args()
+
+    weights = dict(IMPACT_WEIGHTS)
+    for weight in args.weight:
+        name, value = weight.split("=", 1)
+        if name not in IMPACT_WEIGHTS:
+            parser.error(f"Unknown weight {name}")
+        weights[name] = float(value)
+
+    metrics = compute_metrics(args.citations, args.metadata, args.reference_year, args.window, weights,
+                              args.author_separator)
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+        for level, df in metrics.items():
+            df.to_csv(os.path.join(args.output_dir, f"{level}.csv"), index=False)
+        print(f"Saved metrics to {args.output_dir}")
+    if args.write:
+        driver = GraphDatabase.driver(args.uri, auth=(args.user, args.password))
+        try:
+            write_metrics(driver, metrics, args.batch_size)
+        finally:
+            driver.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Metadata cleaning from 3_Clean_sampled_citations_metadata.ipynb as importable functions.
+
+clean_metadata_frame() applies the notebook's steps to one DataFrame, so the same cleaning can
+run on a whole file or on shards of a file (see sharded.py).
+
+Usage (from the repository root):
+    python -m graph_database_setup.clean_metadata sampled_citations_metadata.csv sampled_citations_metadata_clean.csv
+"""
+import argparse
+import re
+
+import pandas as pd
+
+
+# 1. Clean up special characters (e.g., replace unwanted characters like `‚Äì` with actual dashes)
+def clean_text(text):
+    if isinstance(text, str):
+        # Replace the special characters
+        text = text.replace('‚Äì', '–').replace('Œ±', 'α').replace('…', '...')
+        # Remove any remaining unwanted characters (non-printable characters)
+        text = re.sub(r'[^\x00-\x7F]+', '', text)
+        # Strip leading and trailing whitespaces
+        text = text.strip()
+    return text
+
+
+# 2. Function to remove lists (and their contents) from a column
+def omit_lists(value):
+    if isinstance(value, list):
+        return None  # Replace the list contents with None
+    return value  # Return non-list values unchanged
+
+
+# 3. Remove content inside square brackets (including brackets and leading space)
+def remove_brackets(value):
+    if isinstance(value, str):
+        return re.sub(r'\s?\[.*?\]', '', value)  # Remove brackets and content inside
+    return value
+
+
+# 4. Parse the pub_date into pub_year, pub_month, and pub_day (handling m/d/yyyy, yyyy-mm, yyyy)
+def parse_pub_date(pub_date):
+    if pd.isna(pub_date):
+        return None, None, None
+
+    # Try to parse the date in various formats and extract year, month, and day
+    try:
+        # Check for full date (m/d/yyyy or other common formats)
+        parsed = pd.to_datetime(pub_date, errors='coerce')
+        if pd.notna(parsed):
+            return parsed.year, parsed.month, parsed.day
+    except Exception:
+        pass
+
+    try:
+        # Check for year and month (yyyy-mm format)
+        parsed = pd.to_datetime(pub_date, errors='coerce', format='%Y-%m')
+        if pd.notna(parsed):
+            return parsed.year, parsed.month, None
+    except Exception:
+        pass
+
+    try:
+        # Check for year only (yyyy format)
+        parsed = pd.to_datetime(pub_date, errors='coerce', format='%Y')
+        if pd.notna(parsed):
+            return parsed.year, None, None
+    except Exception:
+        pass
+
+    # If parsing fails, return None for all
+    return None, None, None
+
+
+# 9. If multiple authors are separated by ';', split them into lists
+def clean_authors(authors_str):
+    if isinstance(authors_str, str):
+        authors = [author.strip() for author in authors_str.split(';')]
+        return authors
+    return []
+
+
+# 10. Clean up venue and publisher columns (similar to author)
+def clean_column(column_str):
+    if isinstance(column_str, str):
+        column_values = [value.strip() for value in column_str.split(';')]
+        return column_values
+    return []
+
+
+def clean_metadata_frame(df):
+    """
+    Apply the notebook's cleaning steps to a metadata DataFrame.
+
+    Parameters:
+        df (pd.DataFrame): Raw sampled metadata (read with dtype=str so that shards of the same
+            file are cleaned identically regardless of which values each shard contains).
+
+    Returns:
+        pd.DataFrame: Cleaned metadata with pub_year, pub_month and pub_day columns, without
+        duplicate rows.
+    """
+    df = df.copy()
+
+    # Apply cleaning function to all string columns (standard text cleaning)
+    for column in df.select_dtypes(include=['object', 'string']).columns:
+        df[column] = df[column].map(clean_text).map(omit_lists)
+
+    # Remove content in square brackets from author, venue, and publisher columns
+    for column in ['author', 'venue', 'publisher']:
+        df[column] = df[column].map(remove_brackets)
+
+    # Fill missing values in 'page' column with blank strings instead of NaN
+    df['page'] = df['page'].fillna('')
+
+    # Parse the pub_date into separate columns for year, month, and day
+    dates = pd.DataFrame(
+        df['pub_date'].map(parse_pub_date).tolist(),
+        index=df.index,
+        columns=['pub_year', 'pub_month', 'pub_day'],
+        dtype=float,
+    )
+    df[['pub_year', 'pub_month', 'pub_day']] = dates
+
+    # Split author/editor/venue/publisher lists and join them back into strings so that
+    # drop_duplicates can compare them
+    for column, split in (('author', clean_authors), ('editor', clean_authors),
+                          ('venue', clean_column), ('publisher', clean_column)):
+        df[column] = df[column].map(lambda value: ', '.join(split(value)))
+
+    # Normalize the type column to lowercase
+    df['type'] = df['type'].str.lower()
+
+    # Remove any duplicate rows
+    return df.drop_duplicates()
+
+
+def clean_metadata_file(input_file, output_file):
+    """Clean a sampled metadata CSV file in one process, as the notebook does."""
+    df = pd.read_csv(input_file, dtype=str)
+    cleaned = clean_metadata_frame(df)
+    cleaned.to_csv(output_file, index=False)
+    print(f"Cleaning completed. Cleaned file saved to {output_file}")
+    return cleaned
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clean the sampled citations metadata CSV.")
+    parser.add_argument("input_file", help="e.g. sampled_citations_metadata.csv")
+    parser.add_argument("output_file", help="e.g. sampled_citations_metadata_clean.csv")
+    args = parser.parse_args()
+    clean_metadata_file(args.input_file, args.output_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Version counter of the graph data.
+
+Every process that writes to the graph (the bulk loader, citation_metrics.py, the embedding
+backfill and write queries run by the backend) increments the counter on a single
+GraphVersion node. Caches in the backend compare it with the version they were filled at and
+drop answers computed on older data.
+
+Usage (from the repository root):
+    python -m graph_database_setup.graph_version          # print the current version
+    python -m graph_database_setup.graph_version --bump   # after writing to the graph by hand
+"""
+import argparse
+import os
+
+from neo4j import GraphDatabase
+
+# Neo4j connection details (same variables as backend/.env)
+NEO4J_URI = os.environ.get("NEO4J_URI", "bolt://localhost:7687")
+NEO4J_USER = os.environ.get("NEO4J_USERNAME", "neo4j")
+NEO4J_PASSWORD = os.environ.get("NEO4J_PASSWORD", "password")
+
+GRAPH_VERSION_LABEL = "GraphVersion"
+
+READ_GRAPH_VERSION_QUERY = f"""
+OPTIONAL MATCH (v:{GRAPH_VERSION_LABEL} {{id: 'graph'}})
+RETURN coalesce(v.version, 0) AS version
+"""
+
+BUMP_GRAPH_VERSION_QUERY = f"""
+MERGE (v:{GRAPH_VERSION_LABEL} {{id: 'graph'}})
+SET v.version = coalesce(v.version, 0) + 1, v.updated_at = datetime()
+RETURN v.version AS version
+"""
+
+
+def read_graph_version(driver):
+    """
+    Return the current version of the graph data (0 if it was never bumped).
+
+    Parameters:
+        driver (neo4j.Driver): Neo4j driver.
+
+    Returns:
+        int: Graph version.
+    """
+    records, _, _ = driver.execute_query(READ_GRAPH_VERSION_QUERY)
+    return records[0]["version"]
+
+
+def bump_graph_version(driver):
+    """
+    Increment the graph version after a write, invalidating the answers cached by the backend.
+
+    Parameters:
+        driver (neo4j.Driver): Neo4j driver.
+
+    Returns:
+        int: New graph version.
+    """
+    records, _, _ = driver.execute_query(BUMP_GRAPH_VERSION_QUERY)
+    return records[0]["version"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print or increment the version of the graph data.")
+    parser.add_argument("--uri", default=NEO4J_URI)
+    parser.add_argument("--user", default=NEO4J_USER)
+    parser.add_argument("--password", default=NEO4J_PASSWORD)
+    parser.add_argument("--bump", action="store_true", help="Increment the version")
+    args = parser.parse_args()
+
+    driver = GraphDatabase.driver(args.uri, auth=(args.user, args.password))
+    try:
+        version = bump_graph_version(driver) if args.bump else read_graph_version(driver)
+        print(f"Graph version: {version}")
+    finally:
+        driver.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Columnar snapshot of the cleaned metadata CSV.
+
+The CSV is converted once into an Arrow IPC file: volume and the publication date parts are stored
+as numbers, and author, editor, venue and publisher are stored pre-split on ', ' (as the
+visualization scripts split them) as list columns of dictionary-encoded strings, so each distinct
+name is stored once. The file is memory-mapped when loaded, so opening it does not parse or copy
+the data.
+
+Usage (from the repository root):
+    python -m graph_database_setup.metadata_snapshot graph_database_setup/sampled_citations_metadata_clean.csv graph_database_setup/snapshots/metadata.arrow
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+METADATA_FILE = os.path.join(DATA_DIR, "sampled_citations_metadata_clean.csv")
+SNAPSHOT_FILE = os.path.join(DATA_DIR, "snapshots", "metadata.arrow")
+
+NUMERIC_COLUMNS = {
+    "volume": pa.float64(),
+    "pub_year": pa.int16(),
+    "pub_month": pa.int8(),
+    "pub_day": pa.int8(),
+}
+LIST_COLUMNS = ["author", "editor", "venue", "publisher"]
+LIST_SEPARATOR = ", "
+
+
+def split_column(values, separator=LIST_SEPARATOR):
+    """
+    Split a string column into a list column of dictionary-encoded strings.
+
+    Missing and empty values become empty lists.
+
+    Parameters:
+        values (pd.Series): Column of strings.
+        separator (str): Separator between list items.
+
+    Returns:
+        pa.ListArray: list<dictionary<int32, string>> array, one list per value.
+    """
+    values = values.reset_index(drop=True)
+    present = values.notna() & (values != "")
+    items = values[present].str.split(separator, regex=False).explode()
+    lengths = np.zeros(len(values), dtype=np.int32)
+    lengths[present.to_numpy()] = items.groupby(level=0, sort=False).size().to_numpy()
+    offsets = np.zeros(len(values) + 1, dtype=np.int32)
+    np.cumsum(lengths, out=offsets[1:])
+    codes, dictionary = pd.factorize(items)
+    indices = pa.DictionaryArray.from_arrays(pa.array(codes, type=pa.int32()),
+                                             pa.array(np.asarray(dictionary, dtype=object), type=pa.string()))
+    return pa.ListArray.from_arrays(pa.array(offsets), indices)
+
+
+def metadata_table(df):
+    """Convert a metadata DataFrame read with dtype=str into the snapshot's Arrow table."""
+    columns = {}
+    for column in df.columns:
+        if column in NUMERIC_COLUMNS:
+            numbers = pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=np.float64)
+            columns[column] = pa.array(numbers, mask=np.isnan(numbers), type=pa.float64()).cast(
+                NUMERIC_COLUMNS[column], safe=False)
+        elif column in LIST_COLUMNS:
+            columns[column] = split_column(df[column])
+        else:
+            columns[column] = pa.array(df[column].to_numpy(dtype=object), type=pa.string(), from_pandas=True)
+    return pa.table(columns)
+
+
+def source_manifest(file_path):
+    """Identify a CSV by its absolute path, size and modification time."""
+    stat = os.stat(file_path)
+    return {"path": os.path.abspath(file_path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def manifest_file(snapshot_file):
+    """File next to the snapshot naming the CSV it was built from."""
+    return f"{snapshot_file}.source.json"
+
+
+def build_snapshot(file_path=METADATA_FILE, snapshot_file=SNAPSHOT_FILE):
+    """Convert a metadata CSV into an Arrow IPC snapshot file, with the manifest of the CSV."""
+    table = metadata_table(pd.read_csv(file_path, dtype=str))
+    os.makedirs(os.path.dirname(os.path.abspath(snapshot_file)), exist_ok=True)
+    temporary_file = f"{snapshot_file}.tmp"
+    with pa.OSFile(temporary_file, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    if os.path.exists(manifest_file(snapshot_file)):
+        os.remove(manifest_file(snapshot_file))
+    os.replace(temporary_file, snapshot_file)
+    with open(manifest_file(snapshot_file), "w") as f:
+        json.dump(source_manifest(file_path), f)
+    return table
+
+
+class MetadataSnapshot:
+    """Memory-mapped metadata table with helpers for the pre-split list columns."""
+
+    def __init__(self, table):
+        self.table = table
+
+    def __len__(self):
+        return self.table.num_rows
+
+    @classmethod
+    def load(cls, snapshot_file=SNAPSHOT_FILE):
+        """Memory-map a snapshot file; no data is read until it is used."""
+        return cls(pa.ipc.open_file(pa.memory_map(snapshot_file, "r")).read_all())
+
+    def to_pandas(self, columns=None):
+        """
+        Return the given columns as a DataFrame.
+
+        Numeric columns come back as float64 with NaN for missing values, and list columns as
+        Python lists of strings, as the visualization scripts built them from the CSV.
+        """
+        columns = columns or self.table.column_names
+        df = self.table.select([column for column in columns if column not in LIST_COLUMNS]).to_pandas()
+        for column in columns:
+            if column in NUMERIC_COLUMNS:
+                df[column] = df[column].astype(np.float64)
+            elif column in LIST_COLUMNS:
+                df[column] = pc.cast(self.table.column(column), pa.list_(pa.string())).to_pylist()
+        return df[columns]
+
+    def explode(self, column, columns=()):
+        """
+        One row per item of a list column, like DataFrame.explode but without building lists.
+
+        Parameters:
+            column (str): List column, e.g. 'author' or 'venue'.
+            columns (iterable of str): Other columns to repeat alongside each item.
+
+        Returns:
+            pd.DataFrame: The item column as a pandas Categorical built from the dictionary codes,
+            plus the other columns; the index holds the original row numbers.
+        """
+        lists = self.table.column(column).combine_chunks()
+        rows = pc.list_parent_indices(lists).to_numpy()
+        items = pc.list_flatten(lists)
+        df = self.to_pandas(list(columns)).iloc[rows] if columns else pd.DataFrame(index=rows)
+        df[column] = pd.Categorical.from_codes(
+            items.indices.to_numpy(zero_copy_only=False), categories=items.dictionary.to_pandas())
+        return df
+
+    def contains(self, column, value):
+        """Boolean mask of the rows whose list column contains the given value."""
+        lists = self.table.column(column).combine_chunks()
+        items = pc.list_flatten(lists)
+        mask = np.zeros(len(self), dtype=bool)
+        code = pc.index(items.dictionary, value).as_py()
+        if code >= 0:
+            mask[pc.list_parent_indices(lists).to_numpy()[items.indices.to_numpy(zero_copy_only=False) == code]] = True
+        return mask
+
+
+def load_metadata_snapshot(file_path=METADATA_FILE, snapshot_file=SNAPSHOT_FILE):
+    """
+    Load the snapshot of a metadata CSV, building and saving it first if it is missing or was built
+    from another file or an older version of this one (its manifest does not match).
+    """
+    try:
+        with open(manifest_file(snapshot_file)) as f:
+            fresh = json.load(f) == source_manifest(file_path) and os.path.exists(snapshot_file)
+    except (OSError, ValueError):
+        fresh = False
+    if not fresh:
+        build_snapshot(file_path, snapshot_file)
+    return MetadataSnapshot.load(snapshot_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a columnar Arrow snapshot of a metadata CSV.")
+    parser.add_argument("metadata_file", nargs="?", default=METADATA_FILE)
+    parser.add_argument("snapshot_file", nargs="?", default=SNAPSHOT_FILE)
+    args = parser.parse_args()
+
+    start_time = time.time()
+    table = build_snapshot(args.metadata_file, args.snapshot_file)
+    print(f"Saved {table.num_rows} publications to {args.snapshot_file} in {time.time() - start_time:.2f} seconds.")
+
+
+if __name__ == "__main__":
+    main()
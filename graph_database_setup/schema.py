@@ -0,0 +1,135 @@
+"""
+Schema provisioning for the citation graph.
+
+Creates the uniqueness constraints the loader MERGEs on, the property indexes used by the
+Cypher examples in backend/Prompts/prompt_examples.py and the fulltext index of the keyword search
+lane (backend/Indexes/fulltext.py), then waits until all of them are ONLINE.
+Every statement uses IF NOT EXISTS, so this is safe to run on every startup.
+
+Usage (from the repository root):
+    python -m graph_database_setup.schema
+"""
+import argparse
+import os
+
+from neo4j import GraphDatabase
+
+# Neo4j connection details (same variables as backend/.env)
+NEO4J_URI = os.environ.get("NEO4J_URI", "bolt://localhost:7687")
+NEO4J_USER = os.environ.get("NEO4J_USERNAME", "neo4j")
+NEO4J_PASSWORD = os.environ.get("NEO4J_PASSWORD", "password")
+
+INDEX_TIMEOUT = 300  # seconds to wait for indexes to come ONLINE
+
+# (name, index type, label, property)
+# Uniqueness constraints are backed by a RANGE index of the same name.
+CONSTRAINTS = [
+    ("publication_omid", "RANGE", "Publication", "omid"),
+    ("author_name", "RANGE", "Author", "name"),
+]
+
+INDEXES = [
+    # Equality and range filters: p.year = 2020, p.year > 2010, p.venue = '...', p.title = '...'
+    ("publication_year", "RANGE", "Publication", "year"),
+    ("publication_venue", "RANGE", "Publication", "venue"),
+    ("publication_publisher", "RANGE", "Publication", "publisher"),
+    ("publication_title", "RANGE", "Publication", "title"),
+    # Top-k ordering on the metrics written by citation_metrics.py
+    ("publication_impact_score", "RANGE", "Publication", "impact_score"),
+    ("publication_citation_velocity", "RANGE", "Publication", "citation_velocity"),
+    ("author_impact_score", "RANGE", "Author", "impact_score"),
+    # Publications embedded since the last sync of backend/Indexes/vector_replica.py
+    ("publication_embedded_at", "RANGE", "Publication", "embedded_at"),
+    # CONTAINS / ENDS WITH lookups on names and titles
+    ("publication_venue_text", "TEXT", "Publication", "venue"),
+    ("publication_publisher_text", "TEXT", "Publication", "publisher"),
+    ("publication_title_text", "TEXT", "Publication", "title"),
+    ("author_name_text", "TEXT", "Author", "name"),
+]
+
+# (name, label, properties) of the Lucene fulltext indexes
+FULLTEXT_INDEXES = [
+    # Keyword search on titles and venues: db.index.fulltext.queryNodes('publication_fulltext', 'photosynthesis')
+    ("publication_fulltext", "Publication", ["title", "venue"]),
+]
+
+
+def schema_statements():
+    """Return the idempotent CREATE statements for all constraints and indexes."""
+    statements = [
+        f"CREATE CONSTRAINT {name} IF NOT EXISTS FOR (n:{label}) REQUIRE n.{prop} IS UNIQUE"
+        for name, _, label, prop in CONSTRAINTS
+    ]
+    statements += [
+        f"CREATE {index_type} INDEX {name} IF NOT EXISTS FOR (n:{label}) ON (n.{prop})"
+        for name, index_type, label, prop in INDEXES
+    ]
+    statements += [
+        f"CREATE FULLTEXT INDEX {name} IF NOT EXISTS FOR (n:{label}) ON EACH [{', '.join(f'n.{prop}' for prop in props)}]"
+        for name, label, props in FULLTEXT_INDEXES
+    ]
+    return statements
+
+
+def ensure_schema(driver, timeout=INDEX_TIMEOUT, database=None):
+    """
+    Create the citation graph constraints and indexes and wait until they are ONLINE.
+
+    Indexes are matched by type, label and properties rather than by name, so an equivalent
+    index created under another name (e.g. by hand in Neo4j Browser) is accepted.
+
+    Parameters:
+        driver (neo4j.Driver): Neo4j driver.
+        timeout (int): Seconds to wait for indexes that are still populating.
+        database (str): Database name, or None for the default database.
+
+    Returns:
+        dict: State of each expected index, keyed by name.
+
+    Raises:
+        RuntimeError: If an expected index is missing or not ONLINE after the timeout.
+    """
+    with driver.session(database=database) as session:
+        for statement in schema_statements():
+            session.run(statement).consume()
+        session.run("CALL db.awaitIndexes($timeout)", timeout=timeout).consume()
+        existing = {
+            (record["type"], record["labelsOrTypes"][0], tuple(record["properties"])): record["state"]
+            for record in session.run(
+                "SHOW INDEXES YIELD type, entityType, labelsOrTypes, properties, state "
+                "WHERE entityType = 'NODE' AND labelsOrTypes IS NOT NULL AND properties IS NOT NULL "
+                "RETURN type, labelsOrTypes, properties, state"
+            )
+        }
+
+    expected = [(name, index_type, label, (prop,)) for name, index_type, label, prop in CONSTRAINTS + INDEXES]
+    expected += [(name, "FULLTEXT", label, tuple(props)) for name, label, props in FULLTEXT_INDEXES]
+    states = {
+        name: existing.get((index_type, label, props), "MISSING")
+        for name, index_type, label, props in expected
+    }
+    not_online = {name: state for name, state in states.items() if state != "ONLINE"}
+    if not_online:
+        raise RuntimeError(f"Citation graph indexes are not ONLINE: {not_online}")
+    return states
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create the citation graph constraints and indexes.")
+    parser.add_argument("--uri", default=NEO4J_URI)
+    parser.add_argument("--user", default=NEO4J_USER)
+    parser.add_argument("--password", default=NEO4J_PASSWORD)
+    parser.add_argument("--timeout", type=int, default=INDEX_TIMEOUT, help="Seconds to wait for indexes to come ONLINE")
+    args = parser.parse_args()
+
+    driver = GraphDatabase.driver(args.uri, auth=(args.user, args.password))
+    try:
+        states = ensure_schema(driver, args.timeout)
+    finally:
+        driver.close()
+    for name, state in states.items():
+        print(f"{name}: {state}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""
+Multi-process sharded versions of the dump filters (notebook 2) and metadata cleaning (notebook 3).
+
+Input files are split into shards, either by line-aligned byte range or one shard per file, and
+the shards are processed in a process pool. The omid membership index is built in parallel,
+saved once as a .npy file and memory-mapped by every worker in the pool initializer, so it is
+never pickled per task and its pages are shared through the OS page cache. Each shard writes its
+own part file; the parts are merged in shard order, so the output is identical from run to run
+and to the single-process output of stream_filter.py / clean_metadata.py.
+
+Byte-range splitting assumes no quoted field contains a newline. That holds for the citation
+dumps; metadata files are split per file by default because titles may contain newlines.
+
+Usage (from the repository root):
+    python -m graph_database_setup.sharded citations --citations dump/citations/*.csv --metadata dump/meta/*.csv --output filtered_citations_with_metadata.csv --workers 32
+    python -m graph_database_setup.sharded metadata --citations all_filtered_citations.csv --metadata dump/meta/*.csv --output all_filtered_metadata.csv --workers 32
+    python -m graph_database_setup.sharded clean --input sampled_citations_metadata.csv --output sampled_citations_metadata_clean.csv --workers 32
+"""
+import argparse
+import io
+import os
+import shutil
+import tempfile
+import time
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+from graph_database_setup.clean_metadata import clean_metadata_frame
+from graph_database_setup.stream_filter import CHUNK_SIZE, OmidIndex, omid_keys
+
+SHARD_BYTES = 256 * 1024 * 1024
+
+# Set in each worker by _init_worker
+_INDEX = None
+
+
+class _RangeReader(io.RawIOBase):
+    """Raw file reader limited to the byte range [start, end)."""
+
+    def __init__(self, file_path, start, end):
+        self._file = open(file_path, "rb")
+        self._file.seek(start)
+        self._remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self._remaining)
+        if size <= 0:
+            return 0
+        data = self._file.read(size)
+        buffer[:len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def plan_shards(file_paths, shard_bytes=SHARD_BYTES, split_files=True):
+    """
+    Split CSV files into shards.
+
+    Parameters:
+        file_paths (list of str): CSV files with the same header.
+        shard_bytes (int): Target shard size when splitting by byte range.
+        split_files (bool): Split files into line-aligned byte ranges; otherwise one shard per file.
+
+    Returns:
+        tuple: (header bytes of the first file, list of (file_path, start, end) shards)
+    """
+    header = None
+    shards = []
+    for file_path in file_paths:
+        size = os.path.getsize(file_path)
+        with open(file_path, "rb") as f:
+            file_header = f.readline()
+            if header is None:
+                header = file_header
+            elif file_header != header:
+                raise ValueError(f"{file_path} does not have the same header as {file_paths[0]}")
+            start = f.tell()
+            while start < size:
+                if not split_files:
+                    end = size
+                else:
+                    f.seek(min(start + shard_bytes, size))
+                    f.readline()  # move to the start of the next line
+                    end = f.tell()
+                shards.append((file_path, start, end))
+                start = end
+    return header, shards
+
+
+def read_shard(file_path, start, end, columns, chunksize=CHUNK_SIZE, usecols=None, keep_default_na=False):
+    """Stream the rows of one shard as string DataFrame chunks."""
+    reader = io.BufferedReader(_RangeReader(file_path, start, end))
+    return pd.read_csv(reader, header=None, names=columns, usecols=usecols, dtype=str,
+                       keep_default_na=keep_default_na, chunksize=chunksize)
+
+
+def _columns(header):
+    return pd.read_csv(io.BytesIO(header), nrows=0).columns.tolist()
+
+
+def _init_worker(index_path):
+    global _INDEX
+    if index_path is not None:
+        _INDEX = OmidIndex.load(index_path, mmap_mode="r")
+
+
+def _index_shard(task):
+    """Save the unique omid keys found in one shard."""
+    shard_id, (file_path, start, end), columns, key_columns, work_dir = task
+    keys = []
+    for chunk in read_shard(file_path, start, end, columns, usecols=key_columns):
+        for column in key_columns:
+            keys.append(np.unique(omid_keys(chunk[column])))
+    part_path = os.path.join(work_dir, f"keys-{shard_id:05d}.npy")
+    np.save(part_path, np.unique(np.concatenate(keys)) if keys else np.empty(0, dtype=np.int64))
+    return shard_id, part_path
+
+
+def _filter_shard(task):
+    """Write the rows of one shard whose key columns are all in the shared index."""
+    shard_id, (file_path, start, end), columns, key_columns, work_dir = task
+    part_path = os.path.join(work_dir, f"part-{shard_id:05d}.csv")
+    rows_in = 0
+    rows_out = 0
+    with open(part_path, "w", newline="") as output:
+        for chunk in read_shard(file_path, start, end, columns):
+            mask = np.ones(len(chunk), dtype=bool)
+            for column in key_columns:
+                mask &= _INDEX.contains(chunk[column])
+            chunk[mask].to_csv(output, header=False, index=False)
+            rows_in += len(chunk)
+            rows_out += int(mask.sum())
+    return shard_id, part_path, rows_in, rows_out
+
+
+def _clean_shard(task):
+    """Clean one shard of raw metadata and save the row hashes used for deduplication."""
+    shard_id, (file_path, start, end), columns, _, work_dir = task
+    part_path = os.path.join(work_dir, f"part-{shard_id:05d}.csv")
+    rows_in = 0
+    hashes = []
+    header = None
+    with open(part_path, "w", newline="") as output:
+        # Same missing value handling as pd.read_csv(input_file, dtype=str) in clean_metadata_file
+        for chunk in read_shard(file_path, start, end, columns, keep_default_na=True):
+            cleaned = clean_metadata_frame(chunk)
+            cleaned.to_csv(output, header=False, index=False)
+            # A column that is all missing in one chunk comes back as float; hash a dtype-independent view
+            hashable = cleaned.astype(object).where(cleaned.notna(), None)
+            hashes.append(pd.util.hash_pandas_object(hashable, index=False).to_numpy())
+            header = cleaned.head(0).to_csv(index=False).encode()
+            rows_in += len(chunk)
+    np.save(part_path + ".npy", np.concatenate(hashes) if hashes else np.empty(0, dtype=np.uint64))
+    return shard_id, part_path, rows_in, header
+
+
+def _run(pool, worker, tasks):
+    """Run tasks in the pool and return the results sorted by shard id."""
+    results = []
+    start_time = time.time()
+    for result in pool.imap_unordered(worker, tasks):
+        results.append(result)
+        print(f"Finished {len(results)}/{len(tasks)} shards in {time.time() - start_time:.2f} seconds.")
+    return sorted(results, key=lambda result: result[0])
+
+
+def _merge(header, part_paths, output_file):
+    """Concatenate part files in shard order after a single header."""
+    with open(output_file, "wb") as output:
+        output.write(header)
+        for part_path in part_paths:
+            with open(part_path, "rb") as part:
+                shutil.copyfileobj(part, output)
+
+
+def build_index(pool, file_paths, key_columns, work_dir, shard_bytes=SHARD_BYTES, split_files=True):
+    """Build the omid index from the given files in parallel and save it to work_dir."""
+    header, shards = plan_shards(file_paths, shard_bytes, split_files)
+    columns = _columns(header)
+    tasks = [(i, shard, columns, key_columns, work_dir) for i, shard in enumerate(shards)]
+    results = _run(pool, _index_shard, tasks)
+    index = OmidIndex.from_key_chunks(np.load(part_path) for _, part_path in results)
+    for _, part_path in results:
+        os.remove(part_path)
+    index_path = os.path.join(work_dir, "omid_index.npy")
+    index.save(index_path)
+    print(f"Indexed {len(index)} unique omids.")
+    return index_path
+
+
+def sharded_filter(index_files, index_columns, input_files, key_columns, output_file,
+                   workers=None, shard_bytes=SHARD_BYTES, split_index_files=True, split_input_files=True,
+                   work_dir=None):
+    """
+    Keep the rows of input_files whose key_columns are all present in index_files.
+
+    Parameters:
+        index_files (list of str): Files that provide the omid membership set.
+        index_columns (list of str): Omid columns of index_files.
+        input_files (list of str): Files to filter.
+        key_columns (list of str): Omid columns of input_files that must be in the set.
+        output_file (str): Merged output CSV.
+        workers (int): Worker processes (default: all cores).
+        shard_bytes (int): Target shard size for byte-range splitting.
+        split_index_files, split_input_files (bool): Split by byte range instead of per file.
+        work_dir (str): Directory for the index and part files (default: a temporary directory).
+
+    Returns:
+        tuple: (rows read, rows written)
+    """
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp_dir:
+        with Pool(workers) as pool:
+            index_path = build_index(pool, index_files, index_columns, tmp_dir, shard_bytes, split_index_files)
+
+        header, shards = plan_shards(input_files, shard_bytes, split_input_files)
+        columns = _columns(header)
+        tasks = [(i, shard, columns, key_columns, tmp_dir) for i, shard in enumerate(shards)]
+        # Workers memory-map the saved index once instead of receiving it with every task
+        with Pool(workers, initializer=_init_worker, initargs=(index_path,)) as pool:
+            results = _run(pool, _filter_shard, tasks)
+
+        _merge(header, [part_path for _, part_path, _, _ in results], output_file)
+    rows_in = sum(result[2] for result in results)
+    rows_out = sum(result[3] for result in results)
+    print(f"Kept {rows_out} of {rows_in} records. Saved to {output_file}")
+    return rows_in, rows_out
+
+
+def filter_citations_with_metadata(citations_files, metadata_files, output_file, workers=None, **kwargs):
+    """Sharded version of stream_filter.filter_citations_with_metadata."""
+    return sharded_filter(metadata_files, ["omid"], citations_files, ["citing", "cited"], output_file,
+                          workers, split_index_files=False, **kwargs)
+
+
+def filter_metadata_by_citations(citations_files, metadata_files, output_file, workers=None, **kwargs):
+    """Sharded version of stream_filter.filter_metadata_by_citations."""
+    return sharded_filter(citations_files, ["citing", "cited"], metadata_files, ["omid"], output_file,
+                          workers, split_input_files=False, **kwargs)
+
+
+def clean_metadata(input_files, output_file, workers=None, shard_bytes=SHARD_BYTES, split_files=False,
+                   work_dir=None):
+    """
+    Sharded version of clean_metadata.clean_metadata_file.
+
+    Shards are cleaned in parallel and each worker saves a hash per cleaned row. Duplicates
+    (within and across shards) are then found from the hashes, keeping the first occurrence
+    in shard order, so parts are only re-read when there is something to drop.
+    """
+    header, shards = plan_shards(input_files, shard_bytes, split_files)
+    columns = _columns(header)
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp_dir:
+        tasks = [(i, shard, columns, None, tmp_dir) for i, shard in enumerate(shards)]
+        with Pool(workers) as pool:
+            results = _run(pool, _clean_shard, tasks)
+
+        part_paths = [result[1] for result in results]
+        hashes = [np.load(part_path + ".npy") for part_path in part_paths]
+        all_hashes = np.concatenate(hashes) if hashes else np.empty(0, dtype=np.uint64)
+        _, first = np.unique(all_hashes, return_index=True)
+        keep = np.zeros(len(all_hashes), dtype=bool)
+        keep[first] = True
+        output_header = next((result[3] for result in results if result[3] is not None), b"")
+
+        if keep.all():
+            _merge(output_header, part_paths, output_file)
+        else:
+            # Re-read the parts and drop rows already written by an earlier shard
+            offset = 0
+            cleaned_columns = _columns(output_header)
+            with open(output_file, "w", newline="") as output:
+                output.write(output_header.decode())
+                for part_path, part_hashes in zip(part_paths, hashes):
+                    if len(part_hashes):
+                        part = pd.read_csv(part_path, header=None, names=cleaned_columns, dtype=str,
+                                           keep_default_na=False)
+                        part[keep[offset:offset + len(part_hashes)]].to_csv(output, header=False, index=False)
+                    offset += len(part_hashes)
+    rows_in = sum(result[2] for result in results)
+    print(f"Cleaned {rows_in} records into {int(keep.sum())} unique records. Saved to {output_file}")
+    return rows_in, int(keep.sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded multi-process processing of OpenCitations dumps.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    citations = subparsers.add_parser("citations", help="Keep citations whose citing and cited omids have metadata")
+    metadata = subparsers.add_parser("metadata", help="Keep metadata whose omid appears in the citations")
+    for subparser in (citations, metadata):
+        subparser.add_argument("--citations", nargs="+", required=True)
+        subparser.add_argument("--metadata", nargs="+", required=True)
+
+    clean = subparsers.add_parser("clean", help="Clean sampled metadata (notebook 3)")
+    clean.add_argument("--input", nargs="+", required=True)
+
+    for subparser in (citations, metadata, clean):
+        subparser.add_argument("--output", required=True)
+        subparser.add_argument("--workers", type=int, default=os.cpu_count())
+        subparser.add_argument("--shard-mb", type=int, default=SHARD_BYTES // (1024 * 1024))
+        subparser.add_argument("--work-dir", default=None, help="Where to put temporary shard outputs")
+
+    args = parser.parse_args()
+    shard_bytes = args.shard_mb * 1024 * 1024
+    start_time = time.time()
+    if args.command == "citations":
+        filter_citations_with_metadata(args.citations, args.metadata, args.output, args.workers,
+                                       shard_bytes=shard_bytes, work_dir=args.work_dir)
+    elif args.command == "metadata":
+        filter_metadata_by_citations(args.citations, args.metadata, args.output, args.workers,
+                                     shard_bytes=shard_bytes, work_dir=args.work_dir)
+    else:
+        clean_metadata(args.input, args.output, args.workers, shard_bytes, work_dir=args.work_dir)
+    print(f"Done in {time.time() - start_time:.2f} seconds with {args.workers} workers.")
+
+
+if __name__ == "__main__":
+    main()
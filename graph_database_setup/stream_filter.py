@@ -0,0 +1,291 @@
+"""
+Out-of-core versions of the dump filters in 2_OpenCitations_data_processing_part_2.ipynb.
+
+The notebook loads whole citation and metadata files into pandas and concatenates every batch
+in memory, so peak memory grows with the size of the dump. Here the omid membership set is
+built once as a sorted int64 array (8 bytes per unique omid), then the other file is streamed
+through it chunk by chunk and matching rows are appended to the output as they are found.
+Memory is bounded by the chunk size plus the membership array.
+
+Usage (from the repository root):
+    python -m graph_database_setup.stream_filter citations filtered_citations.csv filtered_metadata_with_split_ids_4parts.csv filtered_citations_with_metadata.csv
+    python -m graph_database_setup.stream_filter metadata all_filtered_citations.csv filtered_metadata_with_split_ids_4parts.csv all_filtered_metadata.csv
+    python -m graph_database_setup.stream_filter concat filtered_metadata_batch all_filtered_metadata.csv 8
+"""
+import argparse
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+CHUNK_SIZE = 1000000
+
+OMID_PREFIX = "omid:br/"
+
+# Key reserved for missing/empty omids; never stored in an OmidIndex
+NULL_KEY = 0
+
+# Digits beyond this would overflow the int64 encoding below
+_MAX_OMID_DIGITS = 17
+_LENGTH_BITS = 5
+
+
+def omid_keys(values):
+    """
+    Encode omid strings as int64 keys.
+
+    'omid:br/<digits>' becomes (int(digits) << 5) | len(digits), which is exact and keeps
+    leading zeros significant. Anything else is hashed to a negative key, and missing or empty
+    values map to NULL_KEY.
+
+    Parameters:
+        values (array-like of str): omid strings, possibly with missing values.
+
+    Returns:
+        np.ndarray: int64 keys, one per input value.
+    """
+    values = pd.Series(values, dtype=object).reset_index(drop=True)
+    keys = np.full(len(values), NULL_KEY, dtype=np.int64)
+    present = values.notna() & (values != "")
+    if not present.any():
+        return keys
+
+    strings = values[present].astype(str)
+    digits = strings.str.slice(len(OMID_PREFIX))
+    is_br = (
+        strings.str.startswith(OMID_PREFIX)
+        & digits.str.isdigit()
+        & (digits.str.len() <= _MAX_OMID_DIGITS)
+    )
+
+    br_index = strings.index[is_br.to_numpy()]
+    if len(br_index):
+        br_digits = digits[is_br]
+        numbers = br_digits.astype(np.int64).to_numpy()
+        lengths = br_digits.str.len().to_numpy(dtype=np.int64)
+        keys[br_index] = (numbers << _LENGTH_BITS) | lengths
+
+    other_index = strings.index[~is_br.to_numpy()]
+    if len(other_index):
+        hashed = pd.util.hash_array(strings[~is_br].to_numpy(dtype=object))
+        keys[other_index] = (hashed | np.uint64(1 << 63)).view(np.int64)
+    return keys
+
+
+class OmidIndex:
+    """Sorted array of omid keys with vectorized membership tests."""
+
+    def __init__(self, keys):
+        self.keys = keys
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def from_key_chunks(cls, key_chunks):
+        """
+        Build an index from an iterable of key arrays.
+
+        Chunks are deduplicated as they arrive and merged into the sorted array once the
+        pending keys outgrow it, so memory stays proportional to the number of unique omids.
+        """
+        merged = np.empty(0, dtype=np.int64)
+        pending = []
+        pending_size = 0
+        for keys in key_chunks:
+            keys = np.unique(keys[keys != NULL_KEY])
+            pending.append(keys)
+            pending_size += len(keys)
+            if pending_size >= max(len(merged), CHUNK_SIZE):
+                merged = np.unique(np.concatenate([merged] + pending))
+                pending = []
+                pending_size = 0
+        if pending:
+            merged = np.unique(np.concatenate([merged] + pending))
+        return cls(merged)
+
+    @classmethod
+    def from_csv(cls, file_path, columns, chunksize=CHUNK_SIZE):
+        """
+        Stream a CSV file and index the omids found in the given columns.
+
+        Parameters:
+            file_path (str): Path to the CSV file.
+            columns (list of str): Columns holding omids (e.g. ['citing', 'cited'] or ['omid']).
+            chunksize (int): Rows read per chunk.
+        """
+        def key_chunks():
+            for chunk in pd.read_csv(file_path, usecols=columns, dtype=str, chunksize=chunksize):
+                for column in columns:
+                    yield omid_keys(chunk[column])
+        return cls.from_key_chunks(key_chunks())
+
+    def contains(self, values):
+        """Return a boolean mask telling which omids are in the index."""
+        keys = omid_keys(values)
+        if not len(self.keys):
+            return np.zeros(len(keys), dtype=bool)
+        positions = np.searchsorted(self.keys, keys)
+        positions[positions == len(self.keys)] = 0
+        return (self.keys[positions] == keys) & (keys != NULL_KEY)
+
+    def save(self, file_path):
+        np.save(file_path, self.keys)
+
+    @classmethod
+    def load(cls, file_path, mmap_mode="r"):
+        """Load a saved index; by default the array is memory-mapped, not read into memory."""
+        return cls(np.load(file_path, mmap_mode=mmap_mode))
+
+
+def stream_filter(chunks, index, key_columns, output):
+    """
+    Append the rows of each chunk whose key columns are all members of the index.
+
+    Parameters:
+        chunks (iterable of pd.DataFrame): Input chunks, read with dtype=str.
+        index (OmidIndex): Membership set.
+        key_columns (list of str): Columns that must all be found in the index.
+        output (file object): Open text file; the header is written before the first chunk.
+
+    Returns:
+        tuple: (rows read, rows written)
+    """
+    rows_in = 0
+    rows_out = 0
+    start_time = time.time()
+    for chunk in chunks:
+        mask = np.ones(len(chunk), dtype=bool)
+        for column in key_columns:
+            mask &= index.contains(chunk[column])
+        chunk[mask].to_csv(output, header=(rows_in == 0), index=False)
+        rows_in += len(chunk)
+        rows_out += int(mask.sum())
+        elapsed_time = time.time() - start_time
+        print(f"Processed {rows_in} records, kept {rows_out}. "
+              f"{rows_in / max(elapsed_time, 1e-9):.0f} records/sec.")
+    return rows_in, rows_out
+
+
+def read_chunks(file_path, chunksize=CHUNK_SIZE):
+    """Stream a CSV file as string chunks so rows are written back unchanged."""
+    return pd.read_csv(file_path, dtype=str, keep_default_na=False, chunksize=chunksize)
+
+
+def filter_citations_with_metadata(citations_file, metadata_file, output_file, chunksize=CHUNK_SIZE):
+    """
+    Filter the citations to only include records that have matching metadata
+    for both citing and cited papers (based on the 'omid' column in metadata).
+
+    Parameters:
+        citations_file (str): Path to the CSV file containing citations.
+        metadata_file (str): Path to the CSV file containing metadata.
+        output_file (str): Path of the filtered citations CSV.
+        chunksize (int): Number of records to hold in memory at a time.
+    """
+    print("Indexing metadata omids...")
+    index = OmidIndex.from_csv(metadata_file, ["omid"], chunksize)
+    print(f"Indexed {len(index)} unique omids from metadata.")
+
+    with open(output_file, "w", newline="") as output:
+        total_records, filtered_records = stream_filter(
+            read_chunks(citations_file, chunksize), index, ["citing", "cited"], output
+        )
+    print(f"Original number of citations: {total_records}")
+    print(f"Filtered number of citations: {filtered_records}")
+    return total_records, filtered_records
+
+
+def filter_metadata_by_citations(citations_file, metadata_file, output_file, chunksize=CHUNK_SIZE):
+    """
+    Filter the metadata based on the omid in citing/cited columns from the citations file.
+
+    Parameters:
+        citations_file (str): Path to the citations file.
+        metadata_file (str): Path to the metadata file.
+        output_file (str): Path of the filtered metadata CSV.
+        chunksize (int): Number of records to hold in memory at a time.
+    """
+    print("Indexing citation omids...")
+    index = OmidIndex.from_csv(citations_file, ["citing", "cited"], chunksize)
+    print(f"Extracted {len(index)} unique omids from citations.")
+
+    with open(output_file, "w", newline="") as output:
+        total_records, filtered_records = stream_filter(
+            read_chunks(metadata_file, chunksize), index, ["omid"], output
+        )
+    print(f"Filtered metadata to {filtered_records} of {total_records} records matching omids from citations.")
+    return total_records, filtered_records
+
+
+def concatenate_batch_files(batch_file_prefix, output_file, batch_count):
+    """
+    Concatenate all batch files into a single CSV file.
+
+    Files are copied byte for byte; only the header of the first file is kept.
+
+    Parameters:
+        batch_file_prefix (str): Prefix of the batch files (e.g., "filtered_metadata_batch").
+        output_file (str): Path to save the concatenated CSV.
+        batch_count (int): Total number of batch files to concatenate.
+    """
+    concatenated = 0
+    with open(output_file, "wb") as output:
+        for i in range(1, batch_count + 1):
+            batch_file = f"{batch_file_prefix}_{i}.csv"
+            if not os.path.exists(batch_file):
+                print(f"Warning: {batch_file} does not exist!")
+                continue
+            print(f"Reading {batch_file}...")
+            with open(batch_file, "rb") as batch:
+                header = batch.readline()
+                if concatenated == 0:
+                    output.write(header)
+                shutil.copyfileobj(batch, output)
+            concatenated += 1
+
+    if concatenated:
+        print(f"Concatenated {concatenated} batch files.")
+        print(f"Saved concatenated file to {output_file}")
+    else:
+        print("No valid batch files found to concatenate.")
+    return concatenated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming filters for the OpenCitations dump.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    citations = subparsers.add_parser("citations", help="Keep citations whose citing and cited omids have metadata")
+    citations.add_argument("citations_file")
+    citations.add_argument("metadata_file")
+    citations.add_argument("output_file")
+
+    metadata = subparsers.add_parser("metadata", help="Keep metadata whose omid appears in the citations")
+    metadata.add_argument("citations_file")
+    metadata.add_argument("metadata_file")
+    metadata.add_argument("output_file")
+
+    for subparser in (citations, metadata):
+        subparser.add_argument("--chunksize", type=int, default=CHUNK_SIZE)
+
+    concat = subparsers.add_parser("concat", help="Concatenate <prefix>_1.csv ... <prefix>_N.csv")
+    concat.add_argument("batch_file_prefix")
+    concat.add_argument("output_file")
+    concat.add_argument("batch_count", type=int)
+
+    args = parser.parse_args()
+    start_time = time.time()
+    if args.command == "citations":
+        filter_citations_with_metadata(args.citations_file, args.metadata_file, args.output_file, args.chunksize)
+    elif args.command == "metadata":
+        filter_metadata_by_citations(args.citations_file, args.metadata_file, args.output_file, args.chunksize)
+    else:
+        concatenate_batch_files(args.batch_file_prefix, args.output_file, args.batch_count)
+    print(f"Done in {time.time() - start_time:.2f} seconds.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,24 @@
-import pandas as pd
+import sys
 import networkx as nx
 import matplotlib.pyplot as plt
 import mplcursors
 
-# Load the CSV file
-df = pd.read_csv('../graph_database_setup/sampled_citations_metadata_clean.csv')
+sys.path.append('..')
+from graph_database_setup.metadata_snapshot import load_metadata_snapshot
+
+# Load the metadata snapshot (memory-mapped, built from the CSV on first use)
+metadata = load_metadata_snapshot('../graph_database_setup/sampled_citations_metadata_clean.csv')
 
 var1 = 'volume'
 var2 = 'venue'
 var3 = 'pub_year'
 
-# Convert var1 column to numeric, handling errors
-df[var1] = pd.to_numeric(df[var1], errors='coerce')
+# Filter publications for a specific venue (e.g., "Lipids") using the pre-split venue lists
+selected_venue = "Lipids"
+filtered_df = metadata.to_pandas(['title', var1, var3])[metadata.contains(var2, selected_venue)]
 
 # Drop rows with NaN values in var1
-df.dropna(subset=[var1], inplace=True)
-
-# Split venues into lists and handle missing values
-df[var2] = df[var2].fillna('').apply(lambda x: x.split(', ') if isinstance(x, str) else [])
-
-# Filter publications for a specific venue (e.g., "Lipids")
-selected_venue = "Lipids"
-filtered_df = df[df[var2].apply(lambda venues: selected_venue in venues)]
+filtered_df = filtered_df.dropna(subset=[var1])
 
 # Aggregate citation volumes for publications by the selected venue
 publications = (
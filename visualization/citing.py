@@ -1,15 +1,19 @@
+import sys
 import pandas as pd
 import networkx as nx
 import matplotlib.pyplot as plt
 import random
 
-# Load the CSV files
-citations_df = pd.read_csv('../graph_database_setup/sampled_citations.csv')
-metadata_df = pd.read_csv('../graph_database_setup/sampled_citations_metadata_clean .csv')
+sys.path.append('..')
+from graph_database_setup.citation_graph import load_citation_graph
+from graph_database_setup.metadata_snapshot import load_metadata_snapshot
+
+# Load the citation graph and the metadata (binary snapshots, built from the CSVs on first use)
+citation_graph = load_citation_graph('../graph_database_setup/sampled_citations.csv')
+metadata_df = load_metadata_snapshot('../graph_database_setup/sampled_citations_metadata_clean.csv').to_pandas(
+    ['id', 'title', 'pub_year'])
 
 # Normalize IDs to ensure consistent lookup
-citations_df['cited'] = citations_df['cited'].str.strip()
-citations_df['citing'] = citations_df['citing'].str.strip()
 metadata_df['id'] = metadata_df['id'].str.strip()
 
 # Extract the first part of the metadata IDs
@@ -24,8 +28,10 @@ cited_id = "omid:br/06701357266"
 cited_title = id_to_title.get(cited_id, cited_id)  # Get the title or fallback to ID
 cited_year = id_to_year.get(cited_id, None)  # Get the pub_year or None if missing
 
-# Filter rows for citations of the specified ID
-filtered_citations = citations_df[citations_df['cited'] == cited_id].copy()
+# Look up the publications citing the specified ID in the reverse (cited-by) index
+cited_node = citation_graph.id_of(cited_id)
+citing_ids = citation_graph.cited_by(cited_node) if cited_node >= 0 else []
+filtered_citations = pd.DataFrame({'citing': citation_graph.omids_of(citing_ids)})
 
 # Map citing IDs to their titles and publication years
 filtered_citations['citing_title'] = filtered_citations['citing'].map(id_to_title)
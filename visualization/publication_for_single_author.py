@@ -1,31 +1,28 @@
-import pandas as pd
+import sys
 import networkx as nx
 import matplotlib.pyplot as plt
 from matplotlib.colors import ListedColormap
 import mplcursors
 
-# Load the CSV file
-df = pd.read_csv('../graph_database_setup/sampled_citations_metadata_clean .csv')
+sys.path.append('..')
+from graph_database_setup.metadata_snapshot import load_metadata_snapshot
+
+# Load the metadata snapshot (memory-mapped, built from the CSV on first use)
+metadata = load_metadata_snapshot('../graph_database_setup/sampled_citations_metadata_clean.csv')
 
 var1 = 'volume'
 var2 = 'author'
 
-# Convert var1 column to numeric, coercing errors to NaN
-df[var1] = pd.to_numeric(df[var1], errors='coerce')
+# Filter for a single author (e.g., "Zhao") using the pre-split author lists
+selected_author = "Zhao"
+filtered_df = metadata.to_pandas(['title', var1])[metadata.contains(var2, selected_author)]
 
 # Drop rows with NaN values in var1
-df = df.dropna(subset=[var1])
-
-# Split authors into lists and fill NaN values
-df[var2] = df[var2].fillna('').apply(lambda x: x.split(', ') if isinstance(x, str) else [])
-
-# Filter for a single author (e.g., "Zhao")
-selected_author = "Zhao"
-filtered_df = df[df[var2].apply(lambda authors: selected_author in authors)]
+filtered_df = filtered_df.dropna(subset=[var1])
 
 # Get all publications and their citation volumes for the selected author
-publications = filtered_df.explode(var2).groupby(['title', var2])[var1].sum().reset_index()
-publications = publications[publications[var2] == selected_author]
+publications = filtered_df.groupby('title')[var1].sum().reset_index()
+publications[var2] = selected_author
 
 # Create graph
 G = nx.Graph()
@@ -1,34 +1,32 @@
-import pandas as pd
+import sys
 import networkx as nx
 import matplotlib.pyplot as plt
 import mplcursors
 
-# Load the CSV file
-df = pd.read_csv('../graph_database_setup/sampled_citations_metadata_clean.csv')
+sys.path.append('..')
+from graph_database_setup.metadata_snapshot import load_metadata_snapshot
+
+# Load the metadata snapshot (memory-mapped, built from the CSV on first use)
+metadata = load_metadata_snapshot('../graph_database_setup/sampled_citations_metadata_clean.csv')
 
 var1 = 'volume'
 var2 = 'pub_year'
 var3 = 'author'
 
-# Convert var1 and var2 columns to numeric, handling errors
-df[var1] = pd.to_numeric(df[var1], errors='coerce')
-df[var2] = pd.to_numeric(df[var2], errors='coerce')
+# One row per (publication, author); authors are stored pre-split and var1/var2 as numbers
+df = metadata.explode(var3, [var1, var2])
 
 # Drop rows with NaN values in var1 or var2
 df.dropna(subset=[var1, var2], inplace=True)
 
-# Split authors into lists and handle missing values
-df[var3] = df[var3].fillna('').apply(lambda x: x.split(', ') if isinstance(x, str) else [])
-
-# Explode authors into separate rows and calculate total volume per author
-author_citations = df.explode(var3).groupby(var3)[var1].sum().nlargest(10)
+# Calculate total volume per author
+author_citations = df.groupby(var3, observed=True)[var1].sum().nlargest(10)
 top_authors = author_citations.index.tolist()
 
 # Filter for top 10 authors and get their first publication year
-filtered_df = df[df[var3].apply(lambda authors: any(author in top_authors for author in authors))]
 first_pub_years = (
-    filtered_df.explode(var3)
-    .groupby(var3)[var2]
+    df[df[var3].isin(top_authors)]
+    .groupby(var3, observed=True)[var2]
     .min()
     .loc[top_authors]
 )
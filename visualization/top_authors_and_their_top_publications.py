@@ -1,35 +1,38 @@
-import pandas as pd
+import sys
 import networkx as nx
 import matplotlib.pyplot as plt
 from matplotlib.colors import ListedColormap
 import mplcursors
 
-# Load the CSV file
-df = pd.read_csv('../graph_database_setup/sampled_citations_metadata_clean.csv')
+sys.path.append('..')
+from graph_database_setup.metadata_snapshot import load_metadata_snapshot
+
+# Load the metadata snapshot (memory-mapped, built from the CSV on first use)
+metadata = load_metadata_snapshot('../graph_database_setup/sampled_citations_metadata_clean.csv')
 
 var1 = 'volume'
 var2 = 'author'
 
-# Convert var1 column to numeric, coercing errors to NaN
-df[var1] = pd.to_numeric(df[var1], errors='coerce')
+# One row per (publication, author); authors are stored pre-split and var1 as a number
+df = metadata.explode(var2, ['title', var1])
 
 # Drop rows with NaN values in var1
 df = df.dropna(subset=[var1])
 
-# Split authors into lists and fill NaN values
-df[var2] = df[var2].fillna('').apply(lambda x: x.split(', ') if isinstance(x, str) else [])
-
 # Calculate total citations per author
-author_citations = df.explode(var2).groupby(var2)[var1].sum().nlargest(5)
+author_citations = df.groupby(var2, observed=True)[var1].sum().nlargest(5)
 top_authors = author_citations.index.tolist()
 
 # Filter for top 5 authors
-filtered_df = df[df[var2].apply(lambda authors: any(author in top_authors for author in authors))]
+filtered_df = df[df[var2].isin(top_authors)].astype({var2: str})
 
 # Get top 10 most cited publications for each author
-top_publications = filtered_df.explode(var2).groupby(['title', var2])[var1].sum().reset_index()
-top_publications = top_publications[top_publications[var2].isin(top_authors)]
-top_publications = top_publications.groupby(var2).apply(lambda x: x.nlargest(10, var1)).reset_index(drop=True)
+top_publications = filtered_df.groupby(['title', var2])[var1].sum().reset_index()
+top_publications = (
+    top_publications.sort_values([var2, var1], ascending=[True, False], kind='stable')
+    .groupby(var2).head(10)
+    .reset_index(drop=True)
+)
 
 # Create graph
 G = nx.Graph()